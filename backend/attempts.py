@@ -0,0 +1,121 @@
+"""
+Quiz attempts: server-side scoring and pre-aggregated analytics.
+
+Submitted answers are scored against the stored `correct_answer`s, which are
+never sent to quiz takers before they submit. Each attempt is kept in
+`quiz_attempts`, and one upserted `$inc` on the quiz's `quiz_stats` document
+updates every counter the analytics need (attempts, score sum, and per
+question the answered / correct / per-option counts). Reading a quiz's
+statistics is then a single document lookup, however many attempts it has.
+
+Counter layout of a `quiz_stats` document:
+
+    {"quiz_id": ..., "attempts": 12, "score_sum": 87,
+     "questions": {"0": {"answered": 12, "correct": 9, "options": {"1": 9, "2": 3}}, ...}}
+
+Questions and options are keyed by their index; quizzes cannot be edited, so
+the indexes stay meaningful.
+"""
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from mongo import utcnow
+
+
+def score_attempt(questions: List[Dict[str, Any]], answers: List[Optional[int]]) -> List[Dict[str, Any]]:
+    """Per-question results of answers (one option index or None per question)"""
+    if len(answers) != len(questions):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Expected {len(questions)} answers, got {len(answers)}"
+        )
+
+    results = []
+    for index, (question, selected) in enumerate(zip(questions, answers)):
+        if selected is not None and not 0 <= selected < len(question["options"]):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Answer to question {index} is not one of its options"
+            )
+        results.append({
+            "selected": selected,
+            "correct_answer": question["correct_answer"],
+            "correct": selected == question["correct_answer"],
+            "explanation": question.get("explanation"),
+        })
+    return results
+
+
+def stats_increments(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """The $inc document adding one scored attempt to a quiz_stats document"""
+    increments = {"attempts": 1, "score_sum": sum(r["correct"] for r in results)}
+    for index, result in enumerate(results):
+        if result["selected"] is None:
+            continue
+        increments[f"questions.{index}.answered"] = 1
+        increments[f"questions.{index}.correct"] = int(result["correct"])
+        increments[f"questions.{index}.options.{result['selected']}"] = 1
+    return increments
+
+
+async def record_attempt(
+    database: AsyncIOMotorDatabase,
+    quiz: Dict[str, Any],
+    user_id: str,
+    answers: List[Optional[int]],
+    duration_seconds: Optional[int] = None
+) -> Dict[str, Any]:
+    """Score answers to quiz, store the attempt and update the quiz's counters"""
+    results = score_attempt(quiz["questions"], answers)
+    now = utcnow()
+    attempt_doc = {
+        "id": str(uuid.uuid4()),
+        "quiz_id": quiz["id"],
+        "user_id": user_id,
+        "score": sum(r["correct"] for r in results),
+        "total": len(results),
+        "duration_seconds": duration_seconds,
+        "results": results,
+        "created_at": now,
+    }
+    await database.quiz_attempts.insert_one(attempt_doc)
+    await database.quiz_stats.update_one(
+        {"quiz_id": quiz["id"]},
+        {"$inc": stats_increments(results), "$set": {"updated_at": now}},
+        upsert=True
+    )
+    await database.quizzes.update_one({"id": quiz["id"]}, {"$inc": {"attempts": 1}})
+    attempt_doc.pop("_id", None)
+    return attempt_doc
+
+
+def build_statistics(quiz: Dict[str, Any], stats_doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """QuizStatistics fields from a quiz and its counters (None before the first attempt)"""
+    stats_doc = stats_doc or {}
+    attempts = stats_doc.get("attempts", 0)
+    counters = stats_doc.get("questions", {})
+    total = len(quiz["questions"])
+
+    questions = []
+    for index, question in enumerate(quiz["questions"]):
+        counter = counters.get(str(index), {})
+        answered = counter.get("answered", 0)
+        options = counter.get("options", {})
+        questions.append({
+            "answered": answered,
+            "correct": counter.get("correct", 0),
+            "correct_rate": round(counter.get("correct", 0) / answered, 4) if answered else 0.0,
+            "option_counts": [options.get(str(option), 0) for option in range(len(question["options"]))],
+        })
+
+    average_score = stats_doc.get("score_sum", 0) / attempts if attempts else 0.0
+    return {
+        "quiz_id": quiz["id"],
+        "attempts": attempts,
+        "average_score": round(average_score, 2),
+        "average_percent": round(average_score / total * 100, 1) if total else 0.0,
+        "questions": questions,
+    }
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
@@ -8,14 +9,59 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
 
 from models import User, TokenData
+from cache import CacheBackend, InMemoryCacheBackend, RedisCacheBackend, TTLCache
 
 # Security
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated-user cache: validated User objects keyed by id, so hot routes
+# skip the users lookup. USER_CACHE_URL (redis://...) shares entries and
+# invalidations across workers; otherwise each worker keeps its own copy and
+# other workers may serve a changed profile for up to USER_CACHE_TTL seconds.
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+USER_CACHE_URL = os.environ.get("USER_CACHE_URL")
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+
+# bcrypt cost factor; hashes made with another cost are rehashed on the next login
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
+# For routes open to anonymous users
+optional_security = HTTPBearer(auto_error=False)
+
+
+class UserCache:
+    """TTL/LRU cache of authenticated users in front of db.users"""
+
+    def __init__(self, backend: CacheBackend, ttl: int = USER_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def get(self, user_id: str) -> Optional[User]:
+        value = await self.backend.get(f"user:{user_id}")
+        if value is None or isinstance(value, User):
+            return value
+        return User.model_validate(value)
+
+    async def set(self, user: User) -> None:
+        value = user if self.backend.stores_objects else user.model_dump(mode="json")
+        await self.backend.set(f"user:{user.id}", value, self.ttl)
+
+    async def invalidate(self, user_id: str) -> None:
+        """Drop a user after their profile or role changed"""
+        await self.backend.delete(f"user:{user_id}")
+
+
+user_cache = UserCache(
+    RedisCacheBackend(USER_CACHE_URL) if USER_CACHE_URL else InMemoryCacheBackend(max_size=USER_CACHE_SIZE)
+)
+
+# Decoded token subjects, kept until the token expires
+token_cache = TTLCache(max_size=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -42,7 +88,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_access_token(token: str) -> TokenData:
-    """Decode a JWT access token"""
+    """Decode a JWT access token (memoized per token until it expires)"""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -51,7 +101,10 @@ def decode_access_token(token: str) -> TokenData:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
-        return TokenData(user_id=user_id)
+        token_data = TokenData(user_id=user_id)
+        if "exp" in payload:
+            token_cache.set(token, token_data, ttl=payload["exp"] - time.time())
+        return token_data
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -67,6 +120,10 @@ async def get_current_user(
     token = credentials.credentials
     token_data = decode_access_token(token)
     
+    user = await user_cache.get(token_data.user_id)
+    if user is not None:
+        return user
+    
     # Get user from database
     user_doc = await db.users.find_one({"id": token_data.user_id}, {"_id": 0})
     if user_doc is None:
@@ -75,13 +132,9 @@ async def get_current_user(
             detail="User not found",
         )
     
-    # Convert datetime strings back to datetime objects
-    if isinstance(user_doc.get('created_at'), str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-    if isinstance(user_doc.get('updated_at'), str):
-        user_doc['updated_at'] = datetime.fromisoformat(user_doc['updated_at'])
-    
-    return User(**user_doc)
+    user = User(**user_doc)
+    await user_cache.set(user)
+    return user
 
 
 async def get_current_user_optional(
@@ -0,0 +1,88 @@
+"""
+Response compression benchmark for the list endpoints.
+
+Requests each endpoint from a running API with every content encoding and
+reports bytes on the wire, server latency (median / p95, measured on the
+client) and the transfer time those bytes take at a given bandwidth:
+
+    python benchmark.py --base-url http://localhost:8001/api [--runs 20] [--bandwidth 10]
+
+On a local run latency mostly shows the compression cost; the transfer
+column is where the savings are for clients on mobile or campus networks.
+"""
+import argparse
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import requests
+
+from compression import brotli
+
+LIST_ENDPOINTS = [
+    "/resources?limit=100",
+    "/discussions?limit=100",
+    "/quizzes?limit=100",
+    "/flashcards?limit=100",
+    "/feed?limit=100",
+    "/subjects",
+    "/statistics",
+]
+
+ENCODINGS = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+
+
+def measure(session: requests.Session, url: str, encoding: str, runs: int) -> Tuple[int, List[float], str]:
+    """(bytes on the wire, latencies in ms, encoding served) of runs GETs of url"""
+    size = 0
+    served = "identity"
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = session.get(url, headers={"Accept-Encoding": encoding}, stream=True, timeout=30)
+        body = response.raw.read(decode_content=False)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        # Bodies under COMPRESSION_MIN_SIZE come back as identity whatever was asked
+        served = response.headers.get("content-encoding", "identity")
+        size = len(body)
+    return size, latencies, served
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(base_url: str, runs: int, bandwidth_mbps: float) -> Dict[str, Dict[str, Tuple[int, List[float], str]]]:
+    session = requests.Session()
+    results: Dict[str, Dict[str, Tuple[int, List[float], str]]] = {}
+    for endpoint in LIST_ENDPOINTS:
+        url = f"{base_url}{endpoint}"
+        # Warm-up request: caches, connection and lazy imports are not part of the measure
+        session.get(url, timeout=30)
+        results[endpoint] = {encoding: measure(session, url, encoding, runs) for encoding in ENCODINGS}
+
+    print(f"{runs} runs per encoding, transfer time at {bandwidth_mbps:g} Mbit/s\n")
+    print(f"{'endpoint':<26}{'encoding':<10}{'bytes':>10}{'saved':>8}{'median ms':>11}{'p95 ms':>9}{'transfer ms':>13}")
+    for endpoint, by_encoding in results.items():
+        identity_size = by_encoding["identity"][0]
+        for encoding, (size, latencies, served) in by_encoding.items():
+            saved = f"{100 - size * 100 / identity_size:.0f}%" if identity_size else "-"
+            transfer = size * 8 / (bandwidth_mbps * 1000)
+            label = encoding if served == encoding else f"{encoding}*"
+            print(
+                f"{endpoint:<26}{label:<10}{size:>10}{saved:>8}"
+                f"{statistics.median(latencies):>11.2f}{percentile(latencies, 0.95):>9.2f}{transfer:>13.1f}"
+            )
+    print("\n* sent uncompressed: below the compression threshold")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response compression on the list endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8001/api", help="API base URL")
+    parser.add_argument("--runs", type=int, default=20, help="requests per endpoint and encoding")
+    parser.add_argument("--bandwidth", type=float, default=10.0, help="client bandwidth in Mbit/s for the transfer column")
+    args = parser.parse_args()
+    run(args.base_url, args.runs, args.bandwidth)
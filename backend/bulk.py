@@ -0,0 +1,174 @@
+"""
+Bulk create endpoints.
+
+A bulk body is a JSON array of create payloads, or an NDJSON stream (one
+payload per line, `Content-Type: application/x-ndjson`) which is parsed as it
+arrives. Bodies are capped at BULK_MAX_BYTES and BULK_MAX_ITEMS. Every item
+is validated in one pass; invalid items are reported by their index and the
+valid ones are written with a single `insert_many`. With `ordered=true`
+nothing after the first failed item is written, whether it failed validation
+or the insert, and the items after it are reported as not inserted.
+"""
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Request, status
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+from subjects import subject_catalog
+
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", "1000"))
+BULK_MAX_BYTES = int(os.environ.get("BULK_MAX_BYTES", str(10 * 1024 * 1024)))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Marks an NDJSON line that is not valid JSON, reported with the validation errors
+_INVALID_JSON = object()
+
+
+def _too_many() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Too many items (max {BULK_MAX_ITEMS})"
+    )
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Body too large (max {BULK_MAX_BYTES} bytes)"
+    )
+
+
+async def _body_chunks(request: Request) -> AsyncIterator[bytes]:
+    """The request body, aborted with 413 once it exceeds BULK_MAX_BYTES"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > BULK_MAX_BYTES:
+        raise _too_large()
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > BULK_MAX_BYTES:
+            raise _too_large()
+        yield chunk
+
+
+async def _read_ndjson(request: Request) -> List[Any]:
+    items: List[Any] = []
+    buffer = b""
+
+    def take(line: bytes) -> None:
+        if not line.strip():
+            return
+        if len(items) >= BULK_MAX_ITEMS:
+            raise _too_many()
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            items.append(_INVALID_JSON)
+
+    async for chunk in _body_chunks(request):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            take(line)
+    take(buffer)
+    return items
+
+
+async def read_items(request: Request) -> List[Any]:
+    """Raw items of a bulk request body (JSON array or NDJSON)"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        items = await _read_ndjson(request)
+    else:
+        body = b"".join([chunk async for chunk in _body_chunks(request)])
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array or NDJSON")
+        if len(items) > BULK_MAX_ITEMS:
+            raise _too_many()
+
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No items to create")
+    return items
+
+
+def _error_detail(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def validate_items(
+    items: List[Any], model: Type[BaseModel]
+) -> Tuple[List[Tuple[int, BaseModel]], List[Dict[str, Any]]]:
+    """(index, payload) of the valid items and {index, detail} of the others"""
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        if item is _INVALID_JSON:
+            errors.append({"index": index, "detail": "Invalid JSON"})
+            continue
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as exc:
+            errors.append({"index": index, "detail": _error_detail(exc)})
+    return valid, errors
+
+
+async def bulk_subjects(
+    database: AsyncIOMotorDatabase, valid: List[Tuple[int, BaseModel]]
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Subject of every subject_id in the batch (None when unknown), each looked up once"""
+    subject_ids = {payload.subject_id for _, payload in valid}
+    return {subject_id: await subject_catalog.get(database, subject_id) for subject_id in subject_ids}
+
+
+def _not_inserted(index: int) -> Dict[str, Any]:
+    return {"index": index, "detail": "Not inserted: an earlier item failed"}
+
+
+async def insert_items(
+    collection: AsyncIOMotorCollection, docs: List[Tuple[int, Dict[str, Any]]], ordered: bool,
+    rejected: Sequence[Dict[str, Any]] = ()
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """insert_many of (index, doc); returns the inserted pairs and {index, detail} of the rest"""
+    skipped: List[Dict[str, Any]] = []
+    # rejected: items that never became docs (validation, unknown subject); ordered stops there too
+    if ordered and rejected:
+        first_rejected = min(error["index"] for error in rejected)
+        skipped = [_not_inserted(index) for index, _ in docs if index > first_rejected]
+        docs = [(index, doc) for index, doc in docs if index < first_rejected]
+    if not docs:
+        return [], skipped
+    try:
+        await collection.insert_many([doc for _, doc in docs], ordered=ordered)
+    except BulkWriteError as exc:
+        failed = {error["index"]: error.get("errmsg", "Write failed") for error in exc.details.get("writeErrors", [])}
+        inserted, errors = [], skipped
+        stopped = False
+        for position, (index, doc) in enumerate(docs):
+            if position in failed:
+                errors.append({"index": index, "detail": failed[position]})
+                stopped = ordered
+            elif stopped:
+                errors.append(_not_inserted(index))
+            else:
+                inserted.append((index, doc))
+        return inserted, errors
+    return docs, skipped
+
+
+def bulk_result(inserted: List[Tuple[int, Dict[str, Any]]], errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "created": len(inserted),
+        "items": [{"index": index, "id": doc["id"]} for index, doc in inserted],
+        "errors": sorted(errors, key=lambda error: error["index"]),
+    }
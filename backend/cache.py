@@ -0,0 +1,111 @@
+"""
+Small caching primitives.
+
+`TTLCache` is a bounded in-process LRU with per-entry expiry. Cache backends
+wrap it behind an async interface so a shared store (Redis) can be plugged in
+when several workers must see the same entries and invalidations.
+"""
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency, only needed for the shared backend
+    aioredis = None
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after a per-entry TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Any) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class CacheBackend(ABC):
+    """Async key/value store holding JSON-compatible values"""
+
+    # True when values are kept as live Python objects (no serialization)
+    stores_objects = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """The value stored under key, or None when missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store value under key for ttl seconds"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Drop key; missing keys are ignored"""
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Per-process backend; also the stand-in for the shared backend in tests"""
+
+    stores_objects = True
+
+    def __init__(self, max_size: int = 10000):
+        self._cache = TTLCache(max_size=max_size, ttl=60)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend shared by every worker; invalidations are visible everywhere"""
+
+    def __init__(self, url: str, prefix: str = "univloop:"):
+        if aioredis is None:
+            raise RuntimeError("The shared cache backend requires the 'redis' package")
+        self._redis = aioredis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._redis.set(self._prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self._prefix + key)
@@ -0,0 +1,284 @@
+"""
+Response compression and static asset serving.
+
+CompressionMiddleware encodes responses with brotli or gzip, whichever the
+client accepts (brotli preferred), when they are of a compressible type and
+at least COMPRESSION_MIN_SIZE bytes: below about one packet compression saves
+nothing on the wire and still costs CPU. Complete bodies are compressed in
+one call, in a thread when large (zlib and brotli release the GIL); streamed
+bodies are compressed chunk by chunk. The ETag of a compressed response is
+made weak, as its bytes differ from the identity encoding; conditional
+requests in this app compare ETags weakly.
+
+PrecompressedStaticFiles serves the `.br` / `.gz` siblings written next to
+build assets by
+
+    python compression.py ../frontend/build
+
+so static files cost no compression work per request, and marks
+fingerprinted files (`main.3f2a9c1e.js`) as immutable. Unknown paths without
+a file extension are client-side routes: they get index.html, so deep links
+into the single-page app load it instead of a 404.
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional dependency, responses are gzip-encoded without it
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+# Fast brotli levels suit per-request compression; precompressed assets use the maximum
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+# Bodies at least this large are compressed off the event loop
+COMPRESSION_THREAD_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/css", "text/plain", "text/csv", "text/xml", "text/javascript",
+    "application/json", "application/javascript", "application/xml",
+    "application/x-ndjson", "application/manifest+json", "image/svg+xml",
+)
+# Extensions precompressed by the CLI
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".mjs", ".json", ".map", ".svg", ".txt", ".xml", ".ico")
+
+# Build tools put a content hash in the file name: main.3f2a9c1e.js, 453.1a2b3c4d.chunk.css
+FINGERPRINT_PATTERN = re.compile(r"\.[0-9a-f]{8,}\.")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """"br", "gzip" or None (identity) for an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    wildcard = weights.get("*", 0.0)
+    candidates = [("br", weights.get("br", wildcard))] if brotli is not None else []
+    candidates.append(("gzip", weights.get("gzip", wildcard)))
+    # Highest q wins; on a tie the first candidate (brotli) does
+    encoding, weight = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if weight > 0 else None
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """body in a single brotli or gzip member (gzip output carries no timestamp, so it is reproducible)"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(body, GZIP_LEVEL if level is None else level, mtime=0)
+
+
+class _StreamEncoder:
+    def __init__(self, encoding: str):
+        self._brotli = encoding == "br"
+        self._encoder = brotli.Compressor(quality=BROTLI_QUALITY) if self._brotli else zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def update(self, chunk: bytes) -> bytes:
+        return self._encoder.process(chunk) if self._brotli else self._encoder.compress(chunk)
+
+    def finish(self) -> bytes:
+        return self._encoder.finish() if self._brotli else self._encoder.flush()
+
+
+def _weak_etag(value: bytes) -> bytes:
+    return value if value.startswith(b"W/") else b"W/" + value
+
+
+class CompressionMiddleware:
+    """brotli / gzip encoding of compressible responses of at least minimum_size bytes"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(_header(scope, b"accept-encoding")) if scope["method"] != "HEAD" else None
+        start: Optional[Dict[str, Any]] = None
+        encoder: Optional[_StreamEncoder] = None
+        passthrough = False
+
+        def headers_for(body: Optional[bytes]) -> List[Tuple[bytes, bytes]]:
+            # body None: streamed, so no Content-Length
+            headers = [
+                (key, _weak_etag(value) if key.lower() == b"etag" else value)
+                for key, value in start["headers"] if key.lower() != b"content-length"
+            ]
+            headers.append((b"content-encoding", encoding.encode()))
+            if body is not None:
+                headers.append((b"content-length", str(len(body)).encode()))
+            return headers
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+                if not is_compressible(headers.get(b"content-type", "")):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Caches must key compressible responses on Accept-Encoding, compressed here or not
+                if "accept-encoding" not in headers.get(b"vary", "").lower():
+                    message = {**message, "headers": [*message.get("headers", []), (b"vary", b"Accept-Encoding")]}
+                length = headers.get(b"content-length")
+                if (encoding is None
+                        or message["status"] < 200 or message["status"] in (204, 206, 304)
+                        or b"content-encoding" in headers
+                        or b"content-range" in headers
+                        or b"accept-ranges" in headers
+                        or "no-transform" in headers.get(b"cache-control", "")
+                        or (length is not None and length.isdigit() and int(length) < self.minimum_size)):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+
+            if message["type"] == "http.response.pathsend":
+                body = await asyncio.to_thread(Path(message["path"]).read_bytes)
+                message = {"type": "http.response.body", "body": body}
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body:
+                    # Complete body in one message: the common case for API responses
+                    if len(body) < self.minimum_size:
+                        await send(start)
+                        await send(message)
+                        return
+                    if len(body) >= COMPRESSION_THREAD_SIZE:
+                        compressed = await asyncio.to_thread(compress, body, encoding)
+                    else:
+                        compressed = compress(body, encoding)
+                    await send({**start, "headers": headers_for(compressed)})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                encoder = _StreamEncoder(encoding)
+                await send({**start, "headers": headers_for(None)})
+
+            chunk = encoder.update(body)
+            if not more_body:
+                chunk += encoder.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# ============================================================================
+# Static files
+# ============================================================================
+
+def is_client_route(path: str) -> bool:
+    """Whether a path not found on disk is one of the single-page app's routes"""
+    parts = Path(path).parts
+    return not Path(path).suffix and (not parts or parts[0] != "api")
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving precompressed `.br` / `.gz` siblings, with immutable caching of fingerprinted files"""
+
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            response = await super().get_response(path, scope)
+        except HTTPException as error:
+            if error.status_code != 404 or not self.html or not is_client_route(path):
+                raise
+            # index.html is not fingerprinted, so the fallback is served with no-cache
+            return await self.get_response("index.html", scope)
+        if not isinstance(response, FileResponse):
+            return response
+
+        source = Path(response.path)
+        cache_control = IMMUTABLE_CACHE_CONTROL if FINGERPRINT_PATTERN.search(source.name) else "no-cache"
+        response.headers["cache-control"] = cache_control
+        if response.status_code != 200 or not is_compressible(response.media_type or ""):
+            return response
+
+        response.headers["vary"] = "Accept-Encoding"
+        encoding = negotiate(_header(scope, b"accept-encoding"))
+        suffix = {"br": ".br", "gzip": ".gz"}.get(encoding)
+        variant = source.with_name(source.name + suffix) if suffix else None
+        if variant is None or not variant.is_file():
+            return response
+        return FileResponse(
+            variant,
+            media_type=response.media_type,
+            headers={"content-encoding": encoding, "vary": "Accept-Encoding", "cache-control": cache_control}
+        )
+
+
+def precompress(directory: Path) -> Tuple[int, int, int]:
+    """Write .gz (and .br) siblings of the compressible files under directory; (files, bytes in, bytes out)"""
+    encodings = [("gzip", ".gz", 9)] + ([("br", ".br", 11)] if brotli is not None else [])
+    files = total_in = total_out = 0
+    for source in directory.rglob("*"):
+        if not source.is_file() or source.suffix not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        if source.stat().st_size < COMPRESSION_MIN_SIZE:
+            continue
+        body = source.read_bytes()
+        for encoding, suffix, level in encodings:
+            target = source.with_name(source.name + suffix)
+            if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+                continue
+            compressed = compress(body, encoding, level)
+            if len(compressed) >= len(body):
+                continue
+            target.write_bytes(compressed)
+            files += 1
+            total_in += len(body)
+            total_out += len(compressed)
+    return files, total_in, total_out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompress static build assets (.gz, and .br when brotli is installed)")
+    parser.add_argument("directory", type=Path, help="build output directory, e.g. ../frontend/build")
+    args = parser.parse_args()
+    files, size_in, size_out = precompress(args.directory)
+    print(f"✅ Precompressed {files} files ({size_in} → {size_out} bytes)")
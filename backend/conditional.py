@@ -0,0 +1,182 @@
+"""
+Conditional GET (ETag / Last-Modified).
+
+Writers bump a per-collection version in `collection_versions`. Read routes
+derive their validators from those versions (or a document's `updated_at`)
+and answer a matching `If-None-Match` / `If-Modified-Since` with 304 before
+running their query. Versions are cached for a couple of seconds, so a
+revalidation usually costs no database round-trip at all.
+
+`ETagMiddleware` covers every other JSON GET by hashing the response body:
+the payload is still built, but an unchanged one is not sent again.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from cache import TTLCache
+from mongo import utcnow
+
+VERSION_CACHE_TTL = float(os.environ.get("VERSION_CACHE_TTL", "2"))
+VERSIONS_COLLECTION = "collection_versions"
+
+
+class CollectionVersions:
+    """Version counters bumped on every write to a collection"""
+
+    def __init__(self, ttl: float = VERSION_CACHE_TTL):
+        # Bumps from this process are seen immediately, other workers' within ttl
+        self._cache = TTLCache(max_size=256, ttl=ttl)
+
+    async def bump(self, database: AsyncIOMotorDatabase, *collections: str) -> None:
+        for collection in collections:
+            doc = await database[VERSIONS_COLLECTION].find_one_and_update(
+                {"collection": collection},
+                {"$inc": {"version": 1}, "$set": {"updated_at": utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self._cache.set(collection, (doc["version"], doc["updated_at"]))
+
+    async def get(
+        self, database: AsyncIOMotorDatabase, collections: Iterable[str]
+    ) -> Dict[str, Tuple[int, Optional[datetime]]]:
+        collections = list(collections)
+        versions = {c: self._cache.get(c) for c in collections}
+        stale = [c for c, v in versions.items() if v is None]
+        if stale:
+            docs = await database[VERSIONS_COLLECTION].find({"collection": {"$in": stale}}).to_list(None)
+            found = {d["collection"]: (d["version"], d["updated_at"]) for d in docs}
+            for collection in stale:
+                versions[collection] = found.get(collection, (0, None))
+                self._cache.set(collection, versions[collection])
+        return versions
+
+
+collection_versions = CollectionVersions()
+
+
+def make_etag(*parts: Any, weak: bool = False) -> str:
+    """Quoted entity tag hashing the given JSON-compatible parts"""
+    digest = hashlib.sha1(json.dumps(parts, default=str, separators=(",", ":")).encode()).hexdigest()
+    return f'{"W/" if weak else ""}"{digest}"'
+
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Whether the client's cached copy matches the current validators (RFC 7232)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, and If-None-Match wins over If-Modified-Since
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque(etag) in {_opaque(tag.strip()) for tag in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    # no-cache: the browser may store the response but must revalidate every time
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def check_validators(
+    request: Request, response: Response, etag: str, last_modified: Optional[datetime]
+) -> Optional[Response]:
+    """A 304 when the client's copy is current; otherwise put the validators on response"""
+    headers = _validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+async def check_collections(
+    request: Request, response: Response, database: AsyncIOMotorDatabase, *collections: str
+) -> Optional[Response]:
+    """check_validators for a payload built from whole collections, keyed on their versions"""
+    versions = await collection_versions.get(database, collections)
+    etag = make_etag(request.url.path, request.url.query, sorted((c, v[0]) for c, v in versions.items()))
+    dates = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    return check_validators(request, response, etag, max(dates) if dates else None)
+
+
+class ETagMiddleware:
+    """Strong ETag from the body of JSON GET responses that set no validators themselves"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        body: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                if (message["status"] != 200 or b"etag" in headers
+                        or not headers.get(b"content-type", b"").startswith(b"application/json")):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+
+            body.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            content = b"".join(body)
+            etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+            if_none_match = _request_header(scope, b"if-none-match")
+            headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+            headers.append((b"etag", etag.encode()))
+            if if_none_match is not None and (
+                if_none_match.strip() == "*"
+                or etag in {_opaque(tag.strip()) for tag in if_none_match.split(",")}
+            ):
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            headers.append((b"content-length", str(len(content)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": content})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _request_header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
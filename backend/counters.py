@@ -0,0 +1,113 @@
+"""
+Materialized per-user counters (resources_count, discussions_count, comments_count).
+
+Handlers keep the counters on the user document up to date with atomic $inc;
+the reconciliation job rebuilds them from aggregation pipelines, along with
+the resources' like counts (likes.py). Run it with:
+
+    python counters.py
+
+Users created before the counters existed have no counter fields, which $inc
+would start from 0: the `user_counters` migration (`python migrations.py
+user_counters`) runs the same recount once when the counters are deployed.
+"""
+import asyncio
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from jobs import job_handler
+from likes import reconcile_like_counts
+from mongo import create_client
+
+USER_COUNTER_FIELDS = ("resources_count", "discussions_count", "comments_count")
+RECONCILE_BATCH_SIZE = 1000
+
+
+async def increment_user_counter(database: AsyncIOMotorDatabase, user_id: str, field: str, amount: int = 1) -> None:
+    """Atomically adjust one counter on a user document"""
+    await database.users.update_one({"id": user_id}, {"$inc": {field: amount}})
+
+
+async def decrement_comment_counts(database: AsyncIOMotorDatabase, comments: Iterable[dict]) -> None:
+    """Take deleted comments off their authors' comments_count and their discussions' comment_count"""
+    comments = list(comments)
+    per_author = Counter(c["author_id"] for c in comments if c.get("author_id"))
+    if per_author:
+        await database.users.bulk_write([
+            UpdateOne({"id": author_id}, {"$inc": {"comments_count": -count}})
+            for author_id, count in per_author.items()
+        ], ordered=False)
+    per_discussion = Counter(c["discussion_id"] for c in comments if c.get("discussion_id"))
+    if per_discussion:
+        await database.discussions.bulk_write([
+            UpdateOne({"id": discussion_id}, {"$inc": {"comment_count": -count}})
+            for discussion_id, count in per_discussion.items()
+        ], ordered=False)
+
+
+async def _count_by(database: AsyncIOMotorDatabase, collection: str, pipeline: List[dict]) -> Dict[str, int]:
+    results = await database[collection].aggregate(pipeline).to_list(None)
+    return {r["_id"]: r["count"] for r in results if r["_id"] is not None}
+
+
+async def reconcile_user_counters(database: AsyncIOMotorDatabase, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """Recompute every user's counters from source collections; returns the number of users fixed"""
+    resources = await _count_by(database, "resources", [
+        {"$group": {"_id": "$author_id", "count": {"$sum": 1}}}
+    ])
+    discussions = await _count_by(database, "discussions", [
+        {"$group": {"_id": "$author_id", "count": {"$sum": 1}}}
+    ])
+    comments = await _count_by(database, "comments", [
+        {"$group": {"_id": "$author_id", "count": {"$sum": 1}}}
+    ])
+
+    fixed = 0
+    batch = []
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in USER_COUNTER_FIELDS}}
+    async for user in database.users.find({}, projection):
+        expected = {
+            "resources_count": resources.get(user["id"], 0),
+            "discussions_count": discussions.get(user["id"], 0),
+            "comments_count": comments.get(user["id"], 0)
+        }
+        if any(user.get(field) != value for field, value in expected.items()):
+            batch.append(UpdateOne({"id": user["id"]}, {"$set": expected}))
+        if len(batch) >= batch_size:
+            await database.users.bulk_write(batch, ordered=False)
+            fixed += len(batch)
+            batch = []
+
+    if batch:
+        await database.users.bulk_write(batch, ordered=False)
+        fixed += len(batch)
+    return fixed
+
+
+@job_handler("reconcile_user_counters")
+async def reconcile_user_counters_job(database: AsyncIOMotorDatabase, job: dict) -> None:
+    await reconcile_user_counters(database)
+    await reconcile_like_counts(database)
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    database = client[os.environ.get('DB_NAME', 'univloop_db')]
+
+    fixed = await reconcile_user_counters(database)
+    print(f"✅ Reconciled counters ({fixed} users updated)")
+    fixed = await reconcile_like_counts(database)
+    print(f"✅ Reconciled like counts ({fixed} resources updated)")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,192 @@
+"""
+Home feed from precomputed per-audience timelines.
+
+Creating a resource, discussion, quiz or flashcard set appends a small entry
+(type, id, created_at) to the timeline of every audience it belongs to:
+global, the author's faculty / department / year, and its subject. A
+discussion restricted to one group only goes to that group's timeline. Each
+timeline is a single `timelines` document whose `items` array is kept sorted
+newest first and capped at FEED_TIMELINE_SIZE by the `$push` itself.
+
+Reading a feed fetches the reader's timelines in one query, merges them in
+memory on (created_at, id) with the usual keyset cursor, and hydrates the
+page with one `$in` query per content type. The cost depends on the page and
+timeline sizes, not on how much content exists.
+"""
+import asyncio
+import heapq
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from models import User
+from mongo import utcnow
+from notifications import audience_for, user_audiences
+from pagination import KEYSET_SORT, decode_cursor, encode_cursor
+
+FEED_TIMELINE_SIZE = int(os.environ.get("FEED_TIMELINE_SIZE", "500"))
+
+TIMELINES_COLLECTION = "timelines"
+
+# Entry type -> collection it is hydrated from
+FEED_COLLECTIONS = {
+    "resource": "resources",
+    "discussion": "discussions",
+    "quiz": "quizzes",
+    "flashcard": "flashcards",
+}
+
+
+def timeline_keys(
+    audiences: List[str], subject_id: Optional[str] = None, group_audience: Optional[str] = None
+) -> List[str]:
+    """Timelines for one piece of content (group_audience: a restricted discussion's group)"""
+    if group_audience is not None and group_audience != "global":
+        return [group_audience]
+    keys = list(audiences)
+    if subject_id:
+        keys.append(f"subject:{subject_id}")
+    return keys
+
+
+def timeline_entry(doc_type: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": doc_type, "id": doc["id"], "created_at": doc["created_at"]}
+
+
+async def append_to_timelines(database: AsyncIOMotorDatabase, additions: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Add entries to timelines ({key: entries}) in one round-trip"""
+    if not additions:
+        return
+    await database[TIMELINES_COLLECTION].bulk_write([
+        UpdateOne(
+            {"key": key},
+            {
+                "$push": {"items": {
+                    "$each": entries,
+                    "$sort": {"created_at": -1, "id": -1},
+                    "$slice": FEED_TIMELINE_SIZE
+                }},
+                "$set": {"updated_at": utcnow()}
+            },
+            upsert=True
+        )
+        for key, entries in additions.items()
+    ], ordered=False)
+
+
+async def publish_to_timelines(
+    database: AsyncIOMotorDatabase,
+    author: User,
+    doc_type: str,
+    docs: List[Dict[str, Any]],
+    group_type: str = "global"
+) -> None:
+    """Append newly created docs by author to every timeline they belong to"""
+    audiences = user_audiences(author)
+    group = audience_for(author, group_type) if group_type != "global" else None
+    additions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for doc in docs:
+        for key in timeline_keys(audiences, doc.get("subject_id"), group):
+            additions[key].append(timeline_entry(doc_type, doc))
+    await append_to_timelines(database, additions)
+
+
+async def remove_from_timelines(database: AsyncIOMotorDatabase, doc_id: str) -> None:
+    await database[TIMELINES_COLLECTION].update_many({"items.id": doc_id}, {"$pull": {"items": {"id": doc_id}}})
+
+
+def merge_timelines(
+    timelines: List[List[Dict[str, Any]]], cursor: Optional[str], limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of the newest-first union of timelines, without duplicates"""
+    after = decode_cursor(cursor) if cursor else None
+    page: List[Dict[str, Any]] = []
+    seen = set()
+    merged = heapq.merge(*timelines, key=lambda e: (e["created_at"], e["id"]), reverse=True)
+    for entry in merged:
+        if after is not None and (entry["created_at"], entry["id"]) >= after:
+            continue
+        if entry["id"] in seen:
+            continue
+        seen.add(entry["id"])
+        page.append(entry)
+        if len(page) > limit:
+            break
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1])
+    return page, None
+
+
+async def hydrate(
+    database: AsyncIOMotorDatabase, entries: List[Dict[str, Any]], projections: Dict[str, Dict[str, Any]]
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """(type, document) for each entry still in the database, in entry order"""
+    ids_by_type: Dict[str, List[str]] = defaultdict(list)
+    for entry in entries:
+        ids_by_type[entry["type"]].append(entry["id"])
+
+    types = list(ids_by_type)
+    results = await asyncio.gather(*(
+        database[FEED_COLLECTIONS[doc_type]].find(
+            {"id": {"$in": ids_by_type[doc_type]}}, projections[doc_type]
+        ).to_list(None)
+        for doc_type in types
+    ))
+    docs = {(doc_type, doc["id"]): doc for doc_type, found in zip(types, results) for doc in found}
+    return [
+        (entry["type"], docs[(entry["type"], entry["id"])])
+        for entry in entries if (entry["type"], entry["id"]) in docs
+    ]
+
+
+async def read_feed(
+    database: AsyncIOMotorDatabase,
+    keys: List[str],
+    cursor: Optional[str],
+    limit: int,
+    projections: Dict[str, Dict[str, Any]]
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], Optional[str]]:
+    """A page of the merged timelines, hydrated"""
+    docs = await database[TIMELINES_COLLECTION].find(
+        {"key": {"$in": keys}}, {"_id": 0, "items": 1}
+    ).to_list(None)
+    entries, next_cursor = merge_timelines([doc.get("items", []) for doc in docs], cursor, limit)
+    return await hydrate(database, entries, projections), next_cursor
+
+
+async def rebuild_timelines(database: AsyncIOMotorDatabase, scan_limit: int) -> Dict[str, int]:
+    """Recompute every timeline from the newest scan_limit documents of each content type"""
+    timelines: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for doc_type, collection in FEED_COLLECTIONS.items():
+        docs = await database[collection].find(
+            {}, {"_id": 0, "id": 1, "created_at": 1, "author_id": 1, "subject_id": 1, "group_type": 1}
+        ).sort(KEYSET_SORT).limit(scan_limit).to_list(None)
+        author_ids = list({doc["author_id"] for doc in docs})
+        authors = {
+            user["id"]: User.model_construct(**user)
+            for user in await database.users.find(
+                {"id": {"$in": author_ids}}, {"_id": 0, "id": 1, "department": 1, "faculty": 1, "year_of_study": 1}
+            ).to_list(None)
+        }
+        for doc in docs:
+            author = authors.get(doc["author_id"])
+            audiences = user_audiences(author) if author else ["global"]
+            group_type = doc.get("group_type", "global")
+            group = audience_for(author, group_type) if author and group_type != "global" else None
+            for key in timeline_keys(audiences, doc.get("subject_id"), group):
+                timelines[key].append(timeline_entry(doc_type, doc))
+
+    if timelines:
+        now = utcnow()
+        operations = []
+        for key, entries in timelines.items():
+            entries.sort(key=lambda e: (e["created_at"], e["id"]), reverse=True)
+            operations.append(UpdateOne(
+                {"key": key}, {"$set": {"items": entries[:FEED_TIMELINE_SIZE], "updated_at": now}}, upsert=True
+            ))
+        await database[TIMELINES_COLLECTION].bulk_write(operations, ordered=False)
+    return {"timelines": len(timelines), "entries": sum(min(len(e), FEED_TIMELINE_SIZE) for e in timelines.values())}
@@ -0,0 +1,261 @@
+"""
+Declarative index registry for every MongoDB collection.
+
+Indexes are applied at startup and can be applied (and checked) from the
+command line:
+
+    python indexes.py           # create missing indexes
+    python indexes.py --check   # also explain() each route query and report plan regressions
+"""
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from mongo import create_client
+from search import SEARCH_TOMBSTONE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "subjects": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("name", ASCENDING)]),
+    ],
+    "resources": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("subject_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("file_url", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    "resource_likes": [
+        IndexModel([("resource_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+    ],
+    "discussions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("subject_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("group_type", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        # Group pages filter on the author's group, usually along with group_type
+        IndexModel([("author_department", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("author_faculty", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("author_year", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    "comments": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("discussion_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("author_id", ASCENDING)]),
+    ],
+    "quizzes": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("subject_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING)]),
+    ],
+    "quiz_attempts": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("quiz_id", ASCENDING), ("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "quiz_stats": [
+        IndexModel([("quiz_id", ASCENDING)], unique=True),
+    ],
+    "flashcards": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("subject_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING)]),
+    ],
+    "flashcard_reviews": [
+        IndexModel([("user_id", ASCENDING), ("card_key", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("due_at", ASCENDING)]),
+    ],
+    "blobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("unreferenced_at", ASCENDING)]),
+    ],
+    "timelines": [
+        IndexModel([("key", ASCENDING)], unique=True),
+        IndexModel([("items.id", ASCENDING)]),
+    ],
+    "notifications": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "events": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("audience", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "event_receipts": [
+        IndexModel([("user_id", ASCENDING), ("event_id", ASCENDING)], unique=True),
+    ],
+    "notification_cursors": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "stream_tickets": [
+        IndexModel([("ticket", ASCENDING)], unique=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "search_tombstones": [
+        IndexModel([("deleted_at", ASCENDING)], expireAfterSeconds=SEARCH_TOMBSTONE_TTL),
+    ],
+    "collection_versions": [
+        IndexModel([("collection", ASCENDING)], unique=True),
+    ],
+    "outbox": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)]),
+    ],
+}
+
+
+# Keyset order of every list route (see pagination.py)
+FEED_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+# Representative query shape of each route: (name, collection, filter, sort)
+QUERY_PLANS: List[Tuple[str, str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = [
+    ("user by id", "users", {"id": "x"}, None),
+    ("user by email (register/login)", "users", {"email": "x@example.com"}, None),
+    ("subject by id", "subjects", {"id": "x"}, None),
+    ("subject by name", "subjects", {"name": "x"}, None),
+    ("resource by id", "resources", {"id": "x"}, None),
+    ("resources feed", "resources", {}, FEED_SORT),
+    ("resources by subject", "resources", {"subject_id": "x"}, FEED_SORT),
+    ("resources by author", "resources", {"author_id": "x"}, FEED_SORT),
+    ("resources feed, page 2", "resources", {"$or": [
+        {"created_at": {"$lt": "x"}}, {"created_at": "x", "id": {"$lt": "y"}}
+    ]}, FEED_SORT),
+    ("resources of an uploaded file", "resources", {"file_url": "/api/files/x"}, None),
+    ("blob by hash", "blobs", {"id": "x"}, None),
+    ("collectable blobs", "blobs", {"refs": {"$lte": 0}, "unreferenced_at": {"$lt": "x"}}, None),
+    ("likes of a user on a page", "resource_likes", {"resource_id": {"$in": ["a", "b"]}, "user_id": "x"}, None),
+    ("discussion by id", "discussions", {"id": "x"}, None),
+    ("discussions feed", "discussions", {}, FEED_SORT),
+    ("discussions by subject", "discussions", {"subject_id": "x"}, FEED_SORT),
+    ("discussions by group", "discussions", {"group_type": "global"}, FEED_SORT),
+    ("discussions of a department", "discussions", {"group_type": "department", "author_department": "x"}, FEED_SORT),
+    ("discussions of a faculty", "discussions", {"group_type": "faculty", "author_faculty": "x"}, FEED_SORT),
+    ("discussions of a year", "discussions", {"group_type": "year", "author_year": "x"}, FEED_SORT),
+    ("discussion thread", "comments", {"discussion_id": "x"}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("quiz by id", "quizzes", {"id": "x"}, None),
+    ("quizzes by subject", "quizzes", {"subject_id": "x"}, FEED_SORT),
+    ("attempts of a user at a quiz", "quiz_attempts", {"quiz_id": "x", "user_id": "y"}, FEED_SORT),
+    ("quiz statistics", "quiz_stats", {"quiz_id": "x"}, None),
+    ("flashcard by id", "flashcards", {"id": "x"}, None),
+    ("flashcards by subject", "flashcards", {"subject_id": "x"}, FEED_SORT),
+    ("due cards", "flashcard_reviews", {"user_id": "x", "due_at": {"$lte": "y"}}, [("due_at", ASCENDING)]),
+    ("cards of a review batch", "flashcard_reviews", {"user_id": "x", "card_key": {"$in": ["a", "b"]}}, None),
+    ("feed timelines", "timelines", {"key": {"$in": ["global", "faculty:x"]}}, None),
+    ("timelines holding an item", "timelines", {"items.id": "x"}, None),
+    ("notifications for user", "notifications", {"user_id": "x"}, FEED_SORT),
+    ("events for audiences", "events", {"audience": {"$in": ["global", "faculty:x"]}}, FEED_SORT),
+    ("event receipts for user", "event_receipts", {"user_id": "x", "event_id": {"$in": ["a", "b"]}}, None),
+    ("notification cursor", "notification_cursors", {"user_id": "x"}, None),
+    ("stream ticket", "stream_tickets", {"ticket": "x", "expires_at": {"$gt": "y"}}, None),
+    ("resources changed since the last search sync", "resources", {"updated_at": {"$gte": "x"}}, None),
+    ("discussions changed since the last search sync", "discussions", {"updated_at": {"$gte": "x"}}, None),
+    ("search tombstones since the last sync", "search_tombstones", {"deleted_at": {"$gte": "x"}}, None),
+    ("outbox claim", "outbox", {"status": "pending", "run_at": {"$lte": "x"}}, [("run_at", ASCENDING)]),
+]
+
+# Plan stages that mean the query is not (fully) served by an index
+REGRESSION_STAGES = {"COLLSCAN", "SORT"}
+
+
+async def ensure_indexes(database: AsyncIOMotorDatabase) -> List[str]:
+    """Create every registered index that does not exist yet; returns the names built"""
+    built = []
+    for collection, models in INDEXES.items():
+        existing = await database[collection].index_information()
+        for model in models:
+            name = model.document["name"]
+            if name in existing:
+                continue
+            try:
+                await database[collection].create_indexes([model])
+            except OperationFailure as exc:
+                logger.error("Could not build index %s.%s: %s", collection, name, exc)
+                continue
+            logger.info("Built index %s.%s", collection, name)
+            built.append(f"{collection}.{name}")
+    return built
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of an explain() plan tree"""
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return [stage for stage in stages if stage]
+
+
+async def explain_query(
+    database: AsyncIOMotorDatabase,
+    collection: str,
+    query: Dict[str, Any],
+    sort: Optional[List[Tuple[str, int]]] = None
+) -> List[str]:
+    """Stages of the winning plan for a route query"""
+    cursor = database[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    explanation = await cursor.limit(1).explain()
+    return _plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+
+async def check_query_plans(database: AsyncIOMotorDatabase) -> List[Tuple[str, List[str]]]:
+    """Explain every registered route query; returns (name, stages) for plans not served by an index"""
+    regressions = []
+    for name, collection, query, sort in QUERY_PLANS:
+        stages = await explain_query(database, collection, query, sort)
+        if REGRESSION_STAGES.intersection(stages):
+            logger.warning("Query plan regression for %s: %s", name, " <- ".join(stages))
+            regressions.append((name, stages))
+    return regressions
+
+
+async def main(check: bool = False):
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    database = client[os.environ.get('DB_NAME', 'univloop_db')]
+
+    built = await ensure_indexes(database)
+    print(f"✅ Indexes up to date ({len(built)} built)")
+    for name in built:
+        print(f"   + {name}")
+
+    if check:
+        regressions = await check_query_plans(database)
+        if regressions:
+            print(f"❌ {len(regressions)} queries not served by an index:")
+            for name, stages in regressions:
+                print(f"   • {name}: {' <- '.join(stages)}")
+        else:
+            print(f"✅ All {len(QUERY_PLANS)} route queries are served by an index")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the MongoDB index registry")
+    parser.add_argument("--check", action="store_true", help="explain() route queries and report plan regressions")
+    args = parser.parse_args()
+    asyncio.run(main(check=args.check))
@@ -2,13 +2,14 @@
 Script to initialize the database with default subjects
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime, timezone
 import uuid
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 
+from conditional import collection_versions
+from mongo import create_client, utcnow
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -19,7 +20,7 @@ db_name = os.environ.get('DB_NAME', 'univloop_db')
 
 async def init_subjects():
     """Initialize default subjects"""
-    client = AsyncIOMotorClient(mongo_url)
+    client = create_client(mongo_url)
     db = client[db_name]
     
     # Check if subjects already exist
@@ -38,7 +39,7 @@ async def init_subjects():
             "color": "#3B82F6",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
@@ -48,7 +49,7 @@ async def init_subjects():
             "color": "#EF4444",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
@@ -58,7 +59,7 @@ async def init_subjects():
             "color": "#10B981",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
@@ -68,7 +69,7 @@ async def init_subjects():
             "color": "#8B5CF6",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
@@ -78,7 +79,7 @@ async def init_subjects():
             "color": "#06B6D4",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
@@ -88,7 +89,7 @@ async def init_subjects():
             "color": "#F59E0B",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
@@ -98,7 +99,7 @@ async def init_subjects():
             "color": "#6366F1",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
@@ -108,11 +109,12 @@ async def init_subjects():
             "color": "#EC4899",
             "is_custom": False,
             "created_by": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         }
     ]
     
     await db.subjects.insert_many(default_subjects)
+    await collection_versions.bump(db, "subjects")
     print(f"✅ Initialized {len(default_subjects)} default subjects")
     
     client.close()
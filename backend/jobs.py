@@ -0,0 +1,167 @@
+"""
+Durable background job queue backed by a MongoDB outbox collection.
+
+Request handlers enqueue a job document next to the primary write and return
+immediately; worker coroutines started with the app claim pending jobs, run the
+registered handler and retry failures with exponential backoff.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from mongo import utcnow
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "outbox"
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "300"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", "2"))
+
+JobHandler = Callable[[AsyncIOMotorDatabase, Dict[str, Any]], Awaitable[None]]
+
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+# Wakes idle workers as soon as a job is enqueued in this process
+_wakeup = asyncio.Event()
+_workers: List[asyncio.Task] = []
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register a coroutine as the handler for a job kind"""
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+async def enqueue_job(database: AsyncIOMotorDatabase, kind: str, payload: Dict[str, Any]) -> str:
+    """Write a pending job to the outbox and wake the local workers"""
+    now = utcnow()
+    job_doc = {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "payload": payload,
+        "status": "pending",
+        "attempts": 0,
+        "progress": {},
+        "last_error": None,
+        "run_at": now,
+        "locked_until": None,
+        "created_at": now,
+        "updated_at": now
+    }
+    await database[OUTBOX_COLLECTION].insert_one(job_doc)
+    _wakeup.set()
+    return job_doc["id"]
+
+
+async def save_progress(database: AsyncIOMotorDatabase, job: Dict[str, Any], progress: Dict[str, Any]) -> None:
+    """Checkpoint a running job so a retry resumes where it stopped"""
+    job["progress"] = progress
+    await database[OUTBOX_COLLECTION].update_one(
+        {"id": job["id"]},
+        {"$set": {
+            "progress": progress,
+            "locked_until": utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+        }}
+    )
+
+
+async def claim_job(database: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+    """Atomically lease the oldest runnable job (pending, or running with an expired lease)"""
+    now = utcnow()
+    return await database[OUTBOX_COLLECTION].find_one_and_update(
+        {"$or": [
+            {"status": "pending", "run_at": {"$lte": now}},
+            {"status": "running", "locked_until": {"$lt": now}}
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def run_job(database: AsyncIOMotorDatabase, job: Dict[str, Any]) -> None:
+    """Run a claimed job and record its outcome"""
+    outbox = database[OUTBOX_COLLECTION]
+    handler = JOB_HANDLERS.get(job["kind"])
+
+    try:
+        if handler is None:
+            raise RuntimeError(f"No handler registered for job kind '{job['kind']}'")
+        await handler(database, job)
+    except Exception as exc:
+        now = utcnow()
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            logger.error("Job %s (%s) failed permanently: %s", job["id"], job["kind"], exc)
+            update = {"status": "failed"}
+        else:
+            delay = JOB_RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1))
+            logger.warning("Job %s (%s) failed, retrying in %.0fs: %s", job["id"], job["kind"], delay, exc)
+            update = {"status": "pending", "run_at": now + timedelta(seconds=delay)}
+        update.update({"last_error": str(exc), "locked_until": None, "updated_at": now})
+        await outbox.update_one({"id": job["id"]}, {"$set": update})
+        return
+
+    await outbox.update_one(
+        {"id": job["id"]},
+        {"$set": {
+            "status": "done",
+            "locked_until": None,
+            "updated_at": utcnow()
+        }}
+    )
+
+
+async def _worker_loop(database: AsyncIOMotorDatabase, name: str) -> None:
+    """Claim and run jobs until cancelled"""
+    while True:
+        # Clear before claiming so a job enqueued meanwhile still wakes us up
+        _wakeup.clear()
+        try:
+            job = await claim_job(database)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Worker %s could not claim a job", name)
+            job = None
+
+        if job is not None:
+            await run_job(database, job)
+            continue
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(database: AsyncIOMotorDatabase, count: int = JOB_WORKERS) -> None:
+    """Start the background worker coroutines on the running loop"""
+    for i in range(count):
+        _workers.append(asyncio.create_task(_worker_loop(database, f"job-worker-{i}")))
+    logger.info("Started %d job workers", count)
+
+
+async def stop_workers() -> None:
+    """Cancel the worker coroutines; interrupted jobs are re-claimed once their lease expires"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
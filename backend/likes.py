@@ -0,0 +1,102 @@
+"""
+Resource likes.
+
+Each like is one `resource_likes` document, unique on (resource_id, user_id),
+so liking twice or unliking twice is a no-op decided by the database rather
+than by a read-then-write in Python. The resource's `likes` field is a
+denormalized counter moved by exactly one `$inc` per like actually inserted
+or deleted, which keeps it exact under concurrent clicks. The like and the
+`$inc` are two writes, so a crash between them can leave the counter off by
+one; `reconcile_like_counts`, run by the counter reconciliation job
+(counters.py), recomputes it from the collection. "Did I like these" for a
+page of resources is one indexed query.
+"""
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from mongo import utcnow
+
+# Resource fields the like routes need back from the counter update
+RESOURCE_FIELDS = {"_id": 0, "id": 1, "likes": 1, "author_id": 1, "title": 1}
+
+
+async def _bump(database: AsyncIOMotorDatabase, resource_id: str, amount: int) -> Optional[Dict[str, Any]]:
+    return await database.resources.find_one_and_update(
+        {"id": resource_id}, {"$inc": {"likes": amount}},
+        projection=RESOURCE_FIELDS, return_document=ReturnDocument.AFTER
+    )
+
+
+async def add_like(
+    database: AsyncIOMotorDatabase, resource_id: str, user_id: str
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """(resource, whether a like was added); resource is None when it does not exist"""
+    try:
+        await database.resource_likes.insert_one(
+            {"resource_id": resource_id, "user_id": user_id, "created_at": utcnow()}
+        )
+    except DuplicateKeyError:
+        return await database.resources.find_one({"id": resource_id}, RESOURCE_FIELDS), False
+
+    resource = await _bump(database, resource_id, 1)
+    if resource is None:
+        await database.resource_likes.delete_one({"resource_id": resource_id, "user_id": user_id})
+    return resource, resource is not None
+
+
+async def remove_like(
+    database: AsyncIOMotorDatabase, resource_id: str, user_id: str
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """(resource, whether a like was removed); resource is None when it does not exist"""
+    result = await database.resource_likes.delete_one({"resource_id": resource_id, "user_id": user_id})
+    if not result.deleted_count:
+        return await database.resources.find_one({"id": resource_id}, RESOURCE_FIELDS), False
+    return await _bump(database, resource_id, -1), True
+
+
+async def toggle_like(
+    database: AsyncIOMotorDatabase, resource_id: str, user_id: str
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """(resource, liked now): likes the resource, or unlikes it if already liked"""
+    resource, added = await add_like(database, resource_id, user_id)
+    if resource is None or added:
+        return resource, added
+    resource, _ = await remove_like(database, resource_id, user_id)
+    return resource, False
+
+
+async def liked_ids(database: AsyncIOMotorDatabase, user_id: str, resource_ids: Iterable[str]) -> Set[str]:
+    """Which of resource_ids the user has liked"""
+    resource_ids = list(resource_ids)
+    if not resource_ids:
+        return set()
+    docs = await database.resource_likes.find(
+        {"resource_id": {"$in": resource_ids}, "user_id": user_id}, {"_id": 0, "resource_id": 1}
+    ).to_list(None)
+    return {doc["resource_id"] for doc in docs}
+
+
+async def reconcile_like_counts(database: AsyncIOMotorDatabase, batch_size: int = 1000) -> int:
+    """Recompute every resource's likes from resource_likes; returns the number of resources fixed"""
+    counts = await database.resource_likes.aggregate([
+        {"$group": {"_id": "$resource_id", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    likes = {c["_id"]: c["count"] for c in counts}
+
+    fixed = 0
+    batch = []
+    async for resource in database.resources.find({}, {"_id": 0, "id": 1, "likes": 1}):
+        expected = likes.get(resource["id"], 0)
+        if resource.get("likes") != expected:
+            batch.append(UpdateOne({"id": resource["id"]}, {"$set": {"likes": expected}}))
+        if len(batch) >= batch_size:
+            await database.resources.bulk_write(batch, ordered=False)
+            fixed += len(batch)
+            batch = []
+    if batch:
+        await database.resources.bulk_write(batch, ordered=False)
+        fixed += len(batch)
+    return fixed
@@ -0,0 +1,287 @@
+"""
+Online data migrations.
+
+Each migration converts existing documents in small batches and can run while
+the API is serving traffic; it is safe to interrupt and re-run.
+
+    python migrations.py --list
+    python migrations.py dates_to_bson [--batch-size 500]
+    python migrations.py split_discussion_comments [--batch-size 500]
+    python migrations.py summary_counts [--batch-size 500]
+    python migrations.py resource_likes [--batch-size 500]
+    python migrations.py feed_timelines
+    python migrations.py blob_refs [--batch-size 500]
+    python migrations.py user_counters [--batch-size 500]
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from counters import reconcile_user_counters
+from feed import FEED_TIMELINE_SIZE, rebuild_timelines
+from mongo import create_client, utcnow
+from uploads import FILE_URL_PATTERN, blob_id
+
+Migration = Callable[[AsyncIOMotorDatabase, int], Awaitable[Dict[str, int]]]
+
+MIGRATIONS: Dict[str, Migration] = {}
+
+
+def migration(name: str) -> Callable[[Migration], Migration]:
+    """Register a migration under a CLI name"""
+    def decorator(func: Migration) -> Migration:
+        MIGRATIONS[name] = func
+        return func
+    return decorator
+
+
+# Top-level timestamp fields of every collection written before dates were native
+DATE_FIELDS: Dict[str, List[str]] = {
+    "users": ["created_at", "updated_at"],
+    "subjects": ["created_at"],
+    "resources": ["created_at", "updated_at"],
+    "discussions": ["created_at", "updated_at", "last_comment_at"],
+    "comments": ["created_at"],
+    "quizzes": ["created_at", "updated_at"],
+    "flashcards": ["created_at", "updated_at"],
+    "notifications": ["created_at"],
+    "events": ["created_at"],
+    "notification_cursors": ["seen_at"],
+    "outbox": ["run_at", "locked_until", "created_at", "updated_at"],
+}
+
+
+def parse_date(value: str) -> datetime:
+    """Parse a stored ISO-8601 string as an aware UTC datetime"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _date_updates(doc: Dict[str, Any], fields: List[str]) -> List[UpdateOne]:
+    """Updates converting one document's string timestamps, including embedded comments"""
+    updates = []
+    converted = {field: parse_date(doc[field]) for field in fields if isinstance(doc.get(field), str)}
+    if converted:
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": converted}))
+
+    # Address comments by id so comments pushed meanwhile are left untouched
+    for comment in doc.get("comments", []):
+        if isinstance(comment.get("created_at"), str):
+            updates.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"comments.$[c].created_at": parse_date(comment["created_at"])}},
+                array_filters=[{"c.id": comment["id"]}]
+            ))
+    return updates
+
+
+@migration("dates_to_bson")
+async def migrate_dates_to_bson(database: AsyncIOMotorDatabase, batch_size: int) -> Dict[str, int]:
+    """Convert ISO-8601 string timestamps to native BSON dates"""
+    converted: Dict[str, int] = {}
+    for collection, fields in DATE_FIELDS.items():
+        string_fields = list(fields)
+        if collection == "discussions":
+            string_fields.append("comments.created_at")
+        query = {"$or": [{field: {"$type": "string"}} for field in string_fields]}
+        projection = {field: 1 for field in fields}
+        if collection == "discussions":
+            projection["comments"] = 1
+
+        converted[collection] = 0
+        while True:
+            # Converted documents stop matching, so each batch picks up where the last stopped
+            docs = await database[collection].find(query, projection).limit(batch_size).to_list(None)
+            if not docs:
+                break
+            updates = [update for doc in docs for update in _date_updates(doc, fields)]
+            await database[collection].bulk_write(updates, ordered=False)
+            converted[collection] += len(docs)
+    return converted
+
+
+def _split_comments(doc: Dict[str, Any]) -> Tuple[List[UpdateOne], UpdateOne]:
+    """Comment upserts and the discussion update moving one embedded array out"""
+    comments = []
+    for comment in doc["comments"]:
+        created_at = comment.get("created_at")
+        if isinstance(created_at, str):
+            created_at = parse_date(created_at)
+        comments.append({**comment, "discussion_id": doc["id"], "created_at": created_at})
+
+    # Upsert by id so a re-run after an interruption does not duplicate comments
+    inserts = [UpdateOne({"id": c["id"]}, {"$setOnInsert": c}, upsert=True) for c in comments]
+
+    # $inc/$max rather than $set: comments added by the new code meanwhile are already counted
+    update = {"$unset": {"comments": ""}, "$inc": {"comment_count": len(comments)}}
+    if comments:
+        update["$max"] = {"last_comment_at": max(c["created_at"] for c in comments)}
+    discussion = UpdateOne({"_id": doc["_id"], "comments": {"$exists": True}}, update)
+    return inserts, discussion
+
+
+@migration("split_discussion_comments")
+async def migrate_split_discussion_comments(database: AsyncIOMotorDatabase, batch_size: int) -> Dict[str, int]:
+    """Move embedded discussion comments to the comments collection"""
+    moved = {"discussions": 0, "comments": 0}
+    while True:
+        # Split discussions lose their array, so each batch picks up where the last stopped
+        docs = await database.discussions.find(
+            {"comments": {"$exists": True}}, {"id": 1, "comments": 1}
+        ).limit(batch_size).to_list(None)
+        if not docs:
+            break
+        inserts, updates = [], []
+        for doc in docs:
+            comment_inserts, discussion_update = _split_comments(doc)
+            inserts.extend(comment_inserts)
+            updates.append(discussion_update)
+        # Comments first: an interrupted batch is simply redone
+        if inserts:
+            await database.comments.bulk_write(inserts, ordered=False)
+        await database.discussions.bulk_write(updates, ordered=False)
+        moved["discussions"] += len(docs)
+        moved["comments"] += len(inserts)
+    return moved
+
+
+# Collection -> (denormalized count field, array it counts)
+SUMMARY_COUNTS = {
+    "quizzes": ("question_count", "questions"),
+    "flashcards": ("card_count", "cards"),
+}
+
+
+@migration("summary_counts")
+async def migrate_summary_counts(database: AsyncIOMotorDatabase, batch_size: int) -> Dict[str, int]:
+    """Store question_count / card_count on quizzes and flashcard sets for list summaries"""
+    counted: Dict[str, int] = {}
+    for collection, (count_field, array_field) in SUMMARY_COUNTS.items():
+        counted[collection] = 0
+        query = {count_field: {"$exists": False}}
+        while True:
+            docs = await database[collection].find(query, {array_field: 1}).limit(batch_size).to_list(None)
+            if not docs:
+                break
+            await database[collection].bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {count_field: len(doc.get(array_field) or [])}})
+                for doc in docs
+            ], ordered=False)
+            counted[collection] += len(docs)
+    return counted
+
+
+@migration("resource_likes")
+async def migrate_resource_likes(database: AsyncIOMotorDatabase, batch_size: int) -> Dict[str, int]:
+    """Move resources.liked_by arrays to the resource_likes collection"""
+    moved = {"resources": 0, "resource_likes": 0}
+    while True:
+        docs = await database.resources.find(
+            {"liked_by": {"$exists": True}}, {"id": 1, "liked_by": 1, "updated_at": 1}
+        ).limit(batch_size).to_list(None)
+        if not docs:
+            break
+        # Upserts: likes made through the new code meanwhile are kept, not duplicated
+        inserts = [
+            UpdateOne(
+                {"resource_id": doc["id"], "user_id": user_id},
+                {"$setOnInsert": {"resource_id": doc["id"], "user_id": user_id, "created_at": doc.get("updated_at")}},
+                upsert=True
+            )
+            for doc in docs for user_id in set(doc.get("liked_by") or [])
+        ]
+        if inserts:
+            await database.resource_likes.bulk_write(inserts, ordered=False)
+
+        # The counter is recomputed from the collection, which now holds every like
+        counts = await database.resource_likes.aggregate([
+            {"$match": {"resource_id": {"$in": [doc["id"] for doc in docs]}}},
+            {"$group": {"_id": "$resource_id", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        likes = {c["_id"]: c["count"] for c in counts}
+        await database.resources.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"likes": likes.get(doc["id"], 0)}, "$unset": {"liked_by": ""}})
+            for doc in docs
+        ], ordered=False)
+        moved["resources"] += len(docs)
+        moved["resource_likes"] += len(inserts)
+    return moved
+
+
+@migration("feed_timelines")
+async def migrate_feed_timelines(database: AsyncIOMotorDatabase, batch_size: int) -> Dict[str, int]:
+    """Build the per-audience feed timelines from existing content"""
+    # Timelines are capped, so the newest documents fill all but the quietest timelines
+    return await rebuild_timelines(database, scan_limit=FEED_TIMELINE_SIZE * 20)
+
+
+@migration("blob_refs")
+async def migrate_blob_refs(database: AsyncIOMotorDatabase, batch_size: int) -> Dict[str, int]:
+    """Recount how many resources reference each uploaded blob"""
+    counts = await database.resources.aggregate([
+        {"$match": {"file_url": {"$regex": FILE_URL_PATTERN.pattern}}},
+        {"$group": {"_id": "$file_url", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    refs = {blob_id(c["_id"]): c["count"] for c in counts}
+
+    counted = {"blobs": 0, "unreferenced": 0}
+    now = utcnow()
+    last_id = ""
+    while True:
+        blobs = await database.blobs.find(
+            {"id": {"$gt": last_id}}, {"_id": 0, "id": 1, "unreferenced_at": 1}
+        ).sort("id", 1).limit(batch_size).to_list(None)
+        if not blobs:
+            break
+        updates = []
+        for blob in blobs:
+            count = refs.get(blob["id"], 0)
+            unreferenced_at = None if count else (blob.get("unreferenced_at") or now)
+            updates.append(UpdateOne({"id": blob["id"]}, {"$set": {"refs": count, "unreferenced_at": unreferenced_at}}))
+            counted["unreferenced"] += not count
+        await database.blobs.bulk_write(updates, ordered=False)
+        counted["blobs"] += len(blobs)
+        last_id = blobs[-1]["id"]
+    return counted
+
+
+@migration("user_counters")
+async def migrate_user_counters(database: AsyncIOMotorDatabase, batch_size: int) -> Dict[str, int]:
+    """Initialize resources_count / discussions_count / comments_count on existing users"""
+    return {"users": await reconcile_user_counters(database, batch_size)}
+
+
+async def main(name: str, batch_size: int):
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    database = client[os.environ.get('DB_NAME', 'univloop_db')]
+
+    results = await MIGRATIONS[name](database, batch_size)
+    print(f"✅ Migration {name} complete")
+    for collection, count in results.items():
+        print(f"   {collection}: {count} documents")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an online data migration")
+    parser.add_argument("name", nargs="?", choices=sorted(MIGRATIONS))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--list", action="store_true", help="list available migrations")
+    args = parser.parse_args()
+
+    if args.list or not args.name:
+        for name, func in sorted(MIGRATIONS.items()):
+            print(f"{name}: {func.__doc__}")
+    else:
+        asyncio.run(main(args.name, args.batch_size))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional
+from typing import Generic, List, Optional, TypeVar, Union
 from datetime import datetime
 from enum import Enum
 
@@ -140,11 +140,46 @@ class Resource(BaseModel):
     thumbnail_url: Optional[str] = None
     likes: int = 0
     views: int = 0
-    liked_by: List[str] = []
     created_at: datetime
     updated_at: datetime
 
 
+# Resource as shown in lists, with whether the caller liked it
+class ResourceSummary(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    title: str
+    description: Optional[str] = None
+    subject_id: str
+    author_id: str
+    author_name: str
+    author_avatar: Optional[str] = None
+    type: ResourceType
+    file_url: str
+    thumbnail_url: Optional[str] = None
+    likes: int = 0
+    views: int = 0
+    liked_by_me: bool = False
+    created_at: datetime
+    updated_at: datetime
+
+
+class UploadCheck(BaseModel):
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$")
+    size: int = Field(..., gt=0)
+
+
+class UploadResult(BaseModel):
+    sha256: str
+    size: int
+    content_type: str
+    filename: Optional[str] = None
+    file_url: str
+    thumbnail_url: Optional[str] = None  # set once the thumbnail is rendered
+    existed: bool = False  # the same content was already stored
+
+
 # Discussion Models
 class DiscussionCreate(BaseModel):
     title: str
@@ -167,6 +202,7 @@ class Comment(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
     id: str
+    discussion_id: str
     author_id: str
     author_name: str
     author_avatar: Optional[str] = None
@@ -189,7 +225,8 @@ class Discussion(BaseModel):
     author_faculty: Optional[str] = None
     author_year: Optional[str] = None
     group_type: str = "global"
-    comments: List[Comment] = []
+    comment_count: int = 0
+    last_comment_at: Optional[datetime] = None
     views: int = 0
     solved: bool = False
     created_at: datetime
@@ -227,6 +264,50 @@ class Quiz(BaseModel):
     author_id: str
     author_name: str
     questions: List[QuizQuestion]
+    question_count: int = 0
+    duration: int
+    difficulty: str
+    attempts: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+
+# Question as shown to quiz takers: answers are only revealed by an attempt
+class QuizQuestionPublic(BaseModel):
+    question: str
+    options: List[str]
+
+
+# Quiz as shown to quiz takers
+class QuizPublic(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    title: str
+    subject_id: str
+    subject_name: Optional[str] = None
+    author_id: str
+    author_name: str
+    questions: List[QuizQuestionPublic]
+    question_count: int = 0
+    duration: int
+    difficulty: str
+    attempts: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+
+# Quiz as shown in lists: no questions, only their count
+class QuizSummary(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    title: str
+    subject_id: str
+    subject_name: Optional[str] = None
+    author_id: str
+    author_name: str
+    question_count: int = 0
     duration: int
     difficulty: str
     attempts: int = 0
@@ -234,6 +315,47 @@ class Quiz(BaseModel):
     updated_at: datetime
 
 
+# Quiz Attempt Models
+class QuizAttemptCreate(BaseModel):
+    answers: List[Optional[int]]  # selected option per question, None when skipped
+    duration_seconds: Optional[int] = Field(None, ge=0)
+
+
+class QuestionResult(BaseModel):
+    selected: Optional[int] = None
+    correct_answer: int
+    correct: bool
+    explanation: Optional[str] = None
+
+
+class QuizAttempt(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    quiz_id: str
+    user_id: str
+    score: int
+    total: int
+    duration_seconds: Optional[int] = None
+    results: List[QuestionResult]
+    created_at: datetime
+
+
+class QuestionStatistics(BaseModel):
+    answered: int = 0
+    correct: int = 0
+    correct_rate: float = 0.0
+    option_counts: List[int] = []
+
+
+class QuizStatistics(BaseModel):
+    quiz_id: str
+    attempts: int = 0
+    average_score: float = 0.0
+    average_percent: float = 0.0
+    questions: List[QuestionStatistics] = []
+
+
 # Flashcard Models
 class FlashcardItem(BaseModel):
     front: str
@@ -261,11 +383,55 @@ class Flashcard(BaseModel):
     author_id: str
     author_name: str
     cards: List[FlashcardItem]
+    card_count: int = 0
     views: int = 0
     created_at: datetime
     updated_at: datetime
 
 
+# Flashcard set as shown in lists: no cards, only their count
+class FlashcardSummary(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    title: str
+    subject_id: str
+    subject_name: Optional[str] = None
+    author_id: str
+    author_name: str
+    card_count: int = 0
+    views: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+
+# Spaced Repetition Models
+class CardReview(BaseModel):
+    flashcard_id: str
+    card_index: int = Field(..., ge=0)
+    grade: int = Field(..., ge=0, le=5)  # 0 = blackout ... 5 = perfect recall
+
+
+class CardReviewBatch(BaseModel):
+    reviews: List[CardReview] = Field(..., min_length=1, max_length=500)
+
+
+class ScheduledCard(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    flashcard_id: str
+    flashcard_title: str
+    card_index: int
+    front: str
+    back: str
+    ease: float
+    interval: int  # days
+    repetitions: int = 0
+    lapses: int = 0
+    due_at: datetime
+    last_reviewed_at: Optional[datetime] = None
+
+
 # Notification Models
 class NotificationCreate(BaseModel):
     user_id: str
@@ -288,6 +454,57 @@ class Notification(BaseModel):
     created_at: datetime
 
 
+# Pagination Models
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+# Search Models
+class SearchResult(BaseModel):
+    type: str  # resource, discussion
+    id: str
+    title: str
+    excerpt: Optional[str] = None
+    subject_id: Optional[str] = None
+    author_name: Optional[str] = None
+    score: float
+    created_at: datetime
+
+
+class SearchResults(BaseModel):
+    query: str
+    total: int
+    results: List[SearchResult]
+    next_skip: Optional[int] = None
+
+
+# Feed Models
+class FeedItem(BaseModel):
+    type: str  # resource, discussion, quiz or flashcard
+    item: Union[ResourceSummary, Discussion, QuizSummary, FlashcardSummary]
+
+
+# Bulk Create Models
+class BulkItem(BaseModel):
+    index: int
+    id: str
+
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkResult(BaseModel):
+    created: int
+    items: List[BulkItem]
+    errors: List[BulkItemError]
+
+
 # Statistics Models
 class Statistics(BaseModel):
     total_users: int
@@ -0,0 +1,21 @@
+"""
+MongoDB client factory and timestamp codec.
+
+Timestamps are stored as native BSON dates. The client is configured to
+decode them as timezone-aware UTC datetimes, so handlers never convert
+strings and range queries, sorting and TTL indexes work on real dates.
+"""
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+def create_client(mongo_url: str, **kwargs) -> AsyncIOMotorClient:
+    """Motor client decoding BSON dates to aware UTC datetimes"""
+    return AsyncIOMotorClient(mongo_url, tz_aware=True, tzinfo=timezone.utc, **kwargs)
+
+
+def utcnow() -> datetime:
+    """Current UTC time at BSON precision (milliseconds), so stored and returned values match"""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
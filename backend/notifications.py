@@ -0,0 +1,388 @@
+"""
+Hybrid notification model.
+
+Broadcast events ("Nouvelle ressource", "Nouveau quiz", ...) are written once to
+the `events` stream, keyed by audience (global, faculty, department, year), and
+merged into each user's feed on read. Targeted notifications (like, comment)
+stay one row per recipient in `notifications`.
+
+Read state for events is derived from a per-user "last seen" cursor
+(`notification_cursors`) plus per-event receipts for events newer than it.
+
+New rows are also pushed to open `/notifications/stream` connections through an
+in-process hub. Each pushed item carries its keyset cursor as the SSE id, so a
+reconnecting client replays whatever it missed from the database. EventSource
+cannot send an Authorization header, and a JWT in the URL would end up in
+access logs and browser history: clients exchange their token for a
+single-use stream ticket, valid STREAM_TICKET_TTL seconds, and open the
+stream with that.
+"""
+import asyncio
+import hashlib
+import os
+import secrets
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from models import Notification, User
+from mongo import utcnow
+from pagination import KEYSET_SORT, THREAD_SORT, apply_cursor, encode_cursor
+
+# Upper bound on event pages scanned per request when receipts hide events
+MAX_EVENT_SCAN_ROUNDS = 5
+
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", "25"))
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "100"))
+# Most items replayed to a reconnecting stream; older gaps are left to the list route
+STREAM_REPLAY_LIMIT = 100
+STREAM_TICKET_TTL = int(os.environ.get("STREAM_TICKET_TTL", "60"))
+
+
+class Subscription:
+    """One open stream's queue of raw notification and event documents"""
+
+    def __init__(self, keys: List[str], queue_size: int):
+        self.keys = keys
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def push(self, doc: Dict[str, Any]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            # A stalled client: stop feeding it; it resumes from its last id on reconnect
+            self.overflowed = True
+
+
+class NotificationHub:
+    """In-process pub/sub from notification writers to open streams"""
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, user: User) -> Subscription:
+        subscription = Subscription([f"user:{user.id}"] + user_audiences(user), self.queue_size)
+        for key in subscription.keys:
+            self._subscribers[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for key in subscription.keys:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def publish(self, key: str, doc: Dict[str, Any]) -> None:
+        for subscription in list(self._subscribers.get(key, ())):
+            subscription.push(doc)
+
+
+notification_hub = NotificationHub()
+
+
+def audience_for(author: User, group_type: str = "global") -> str:
+    """Audience key an author's post is broadcast to"""
+    if group_type == "department" and author.department:
+        return f"department:{author.department}"
+    if group_type == "faculty" and author.faculty:
+        return f"faculty:{author.faculty}"
+    if group_type == "year" and author.year_of_study:
+        return f"year:{author.year_of_study}"
+    return "global"
+
+
+def user_audiences(user: User) -> List[str]:
+    """All audience keys a user receives events from"""
+    audiences = ["global"]
+    if user.department:
+        audiences.append(f"department:{user.department}")
+    if user.faculty:
+        audiences.append(f"faculty:{user.faculty}")
+    if user.year_of_study:
+        audiences.append(f"year:{user.year_of_study}")
+    return audiences
+
+
+async def publish_event(
+    database: AsyncIOMotorDatabase,
+    author: User,
+    type: str,
+    title: str,
+    message: str,
+    link: Optional[str] = None,
+    group_type: str = "global"
+) -> Dict[str, Any]:
+    """Store a broadcast event once for its whole audience"""
+    event_doc = {
+        "id": str(uuid.uuid4()),
+        "audience": audience_for(author, group_type),
+        "actor_id": author.id,
+        "type": type,
+        "title": title,
+        "message": message,
+        "link": link,
+        "created_at": utcnow()
+    }
+    await database.events.insert_one(event_doc)
+    notification_hub.publish(event_doc["audience"], event_doc)
+    return event_doc
+
+
+async def notify_user(
+    database: AsyncIOMotorDatabase,
+    user_id: str,
+    type: str,
+    title: str,
+    message: str,
+    link: Optional[str] = None
+) -> Dict[str, Any]:
+    """Store a targeted notification for a single recipient"""
+    notif = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "type": type,
+        "title": title,
+        "message": message,
+        "link": link,
+        "read": False,
+        "created_at": utcnow()
+    }
+    await database.notifications.insert_one(notif)
+    notification_hub.publish(f"user:{user_id}", notif)
+    return notif
+
+
+async def get_seen_cursor(database: AsyncIOMotorDatabase, user_id: str) -> Optional[datetime]:
+    """Timestamp up to which the user has seen every event"""
+    cursor_doc = await database.notification_cursors.find_one({"user_id": user_id}, {"_id": 0, "seen_at": 1})
+    return cursor_doc["seen_at"] if cursor_doc else None
+
+
+def _events_query(user: User) -> Dict[str, Any]:
+    """Events visible to a user: their audiences, not their own, not older than their account"""
+    return {
+        "audience": {"$in": user_audiences(user)},
+        "actor_id": {"$ne": user.id},
+        "created_at": {"$gt": user.created_at}
+    }
+
+
+async def _find_event(database: AsyncIOMotorDatabase, user: User, event_id: str) -> Optional[Dict[str, Any]]:
+    query = _events_query(user)
+    query["id"] = event_id
+    return await database.events.find_one(query, {"_id": 0, "id": 1})
+
+
+async def list_notifications(
+    database: AsyncIOMotorDatabase,
+    user: User,
+    limit: int,
+    cursor: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Merge the user's targeted notifications with their audience events, newest first, after cursor"""
+    targeted = await database.notifications.find(
+        apply_cursor({"user_id": user.id}, cursor),
+        {"_id": 0}
+    ).sort(KEYSET_SORT).limit(limit).to_list(None)
+
+    seen_at = await get_seen_cursor(database, user.id)
+    events: List[Dict[str, Any]] = []
+
+    # Receipts can hide dismissed events, so keep paging until the page is full
+    for _ in range(MAX_EVENT_SCAN_ROUNDS):
+        query = apply_cursor(_events_query(user), cursor)
+        batch = await database.events.find(query, {"_id": 0}).sort(KEYSET_SORT).limit(limit).to_list(None)
+        if not batch:
+            break
+
+        receipts = await database.event_receipts.find(
+            {"user_id": user.id, "event_id": {"$in": [e["id"] for e in batch]}},
+            {"_id": 0}
+        ).to_list(None)
+        receipts_by_event = {r["event_id"]: r for r in receipts}
+
+        for event in batch:
+            receipt = receipts_by_event.get(event["id"], {})
+            if receipt.get("dismissed"):
+                continue
+            read = receipt.get("read", False) or (seen_at is not None and event["created_at"] <= seen_at)
+            events.append(_event_for_user(event, user, read))
+
+        if len(events) >= limit or len(batch) < limit:
+            break
+        cursor = encode_cursor(batch[-1])
+
+    merged = sorted(targeted + events, key=lambda n: (n["created_at"], n["id"]), reverse=True)
+    return merged[:limit]
+
+
+async def list_notifications_since(
+    database: AsyncIOMotorDatabase,
+    user: User,
+    cursor: str,
+    limit: int
+) -> List[Dict[str, Any]]:
+    """Notifications newer than cursor, oldest first (stream replay)"""
+    targeted = await database.notifications.find(
+        apply_cursor({"user_id": user.id}, cursor, ascending=True),
+        {"_id": 0}
+    ).sort(THREAD_SORT).limit(limit).to_list(None)
+
+    batch = await database.events.find(
+        apply_cursor(_events_query(user), cursor, ascending=True),
+        {"_id": 0}
+    ).sort(THREAD_SORT).limit(limit).to_list(None)
+    seen_at = await get_seen_cursor(database, user.id)
+    receipts = await database.event_receipts.find(
+        {"user_id": user.id, "event_id": {"$in": [e["id"] for e in batch]}},
+        {"_id": 0}
+    ).to_list(None)
+    receipts_by_event = {r["event_id"]: r for r in receipts}
+
+    events = []
+    for event in batch:
+        receipt = receipts_by_event.get(event["id"], {})
+        if not receipt.get("dismissed"):
+            read = receipt.get("read", False) or (seen_at is not None and event["created_at"] <= seen_at)
+            events.append(_event_for_user(event, user, read))
+
+    merged = sorted(targeted + events, key=lambda n: (n["created_at"], n["id"]))
+    return merged[:limit]
+
+
+def _event_for_user(event: Dict[str, Any], user: User, read: bool) -> Dict[str, Any]:
+    """A broadcast event in the shape of one user's notification"""
+    return {
+        "id": event["id"],
+        "user_id": user.id,
+        "type": event["type"],
+        "title": event["title"],
+        "message": event["message"],
+        "link": event.get("link"),
+        "read": read,
+        "created_at": event["created_at"]
+    }
+
+
+def _ticket_key(ticket: str) -> str:
+    # Only a hash is stored: a database read does not hand out usable tickets
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+async def create_stream_ticket(database: AsyncIOMotorDatabase, user: User) -> str:
+    """Short-lived, single-use ticket opening one notification stream for user"""
+    ticket = secrets.token_urlsafe(32)
+    await database.stream_tickets.insert_one({
+        "ticket": _ticket_key(ticket),
+        "user_id": user.id,
+        "expires_at": utcnow() + timedelta(seconds=STREAM_TICKET_TTL)
+    })
+    return ticket
+
+
+async def redeem_stream_ticket(database: AsyncIOMotorDatabase, ticket: str) -> Optional[str]:
+    """Id of the user a valid ticket was issued to; the ticket is used up"""
+    doc = await database.stream_tickets.find_one_and_delete(
+        {"ticket": _ticket_key(ticket), "expires_at": {"$gt": utcnow()}}
+    )
+    return doc["user_id"] if doc else None
+
+
+def _sse(notification: Dict[str, Any]) -> str:
+    data = Notification(**notification).model_dump_json()
+    return f"id: {encode_cursor(notification)}\nevent: notification\ndata: {data}\n\n"
+
+
+async def notification_stream(
+    database: AsyncIOMotorDatabase,
+    user: User,
+    last_event_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Server-sent events for a user's new notifications, replaying any after last_event_id"""
+    # Subscribe before replaying so nothing written in between is missed
+    subscription = notification_hub.subscribe(user)
+    try:
+        # Tell EventSource to wait a few seconds before reconnecting
+        yield "retry: 5000\n\n"
+        replayed: Set[str] = set()
+        if last_event_id:
+            for notification in await list_notifications_since(database, user, last_event_id, STREAM_REPLAY_LIMIT):
+                replayed.add(notification["id"])
+                yield _sse(notification)
+
+        while not subscription.overflowed or not subscription.queue.empty():
+            try:
+                doc = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": ping\n\n"
+                continue
+            if doc["id"] in replayed:
+                continue
+            if "audience" in doc:
+                if doc["actor_id"] == user.id:
+                    continue
+                doc = _event_for_user(doc, user, read=False)
+            yield _sse(doc)
+    finally:
+        notification_hub.unsubscribe(subscription)
+
+
+async def mark_read(database: AsyncIOMotorDatabase, user: User, notification_id: str) -> bool:
+    """Mark a targeted notification or a broadcast event as read for the user"""
+    result = await database.notifications.update_one(
+        {"id": notification_id, "user_id": user.id},
+        {"$set": {"read": True}}
+    )
+    if result.matched_count:
+        return True
+
+    if not await _find_event(database, user, notification_id):
+        return False
+    await database.event_receipts.update_one(
+        {"user_id": user.id, "event_id": notification_id},
+        {"$set": {"read": True}},
+        upsert=True
+    )
+    return True
+
+
+async def mark_all_read(database: AsyncIOMotorDatabase, user: User) -> None:
+    """Advance the user's event cursor to now and mark targeted notifications read"""
+    now = utcnow()
+    await database.notification_cursors.update_one(
+        {"user_id": user.id},
+        {"$set": {"seen_at": now}},
+        upsert=True
+    )
+    await database.notifications.update_many(
+        {"user_id": user.id, "read": False},
+        {"$set": {"read": True}}
+    )
+    # Read receipts are implied by the cursor from now on; dismissals must stay
+    await database.event_receipts.delete_many({"user_id": user.id, "dismissed": {"$ne": True}})
+
+
+async def dismiss(database: AsyncIOMotorDatabase, user: User, notification_id: str) -> bool:
+    """Delete a targeted notification or hide a broadcast event for the user"""
+    result = await database.notifications.delete_one({"id": notification_id, "user_id": user.id})
+    if result.deleted_count:
+        return True
+
+    if not await _find_event(database, user, notification_id):
+        return False
+    await database.event_receipts.update_one(
+        {"user_id": user.id, "event_id": notification_id},
+        {"$set": {"dismissed": True}},
+        upsert=True
+    )
+    return True
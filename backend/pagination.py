@@ -0,0 +1,67 @@
+"""
+Keyset (cursor) pagination on (created_at, id).
+
+List routes sort newest first on (created_at, id) and hand out an opaque
+`next_cursor` that encodes the last item's sort key. The next page is a range
+query starting strictly after that key, so any page costs the same index seek
+as the first one.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+KEYSET_SORT = [("created_at", -1), ("id", -1)]
+# Oldest first, for threads read top to bottom (comments)
+THREAD_SORT = [("created_at", 1), ("id", 1)]
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just after doc in (created_at, id) order"""
+    raw = json.dumps([doc["created_at"].isoformat(), doc["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Sort key (created_at, id) encoded in a cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(created_at, str) or not isinstance(doc_id, str):
+            raise ValueError("cursor must encode two strings")
+        return datetime.fromisoformat(created_at), doc_id
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_filter(cursor: Optional[str], ascending: bool = False) -> Dict[str, Any]:
+    """Range condition selecting documents strictly after the cursor"""
+    if not cursor:
+        return {}
+    created_at, doc_id = decode_cursor(cursor)
+    op = "$gt" if ascending else "$lt"
+    return {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: doc_id}}
+    ]}
+
+
+def apply_cursor(query: Dict[str, Any], cursor: Optional[str], ascending: bool = False) -> Dict[str, Any]:
+    """Combine a route's filter with the keyset range condition"""
+    condition = keyset_filter(cursor, ascending)
+    if not condition:
+        return query
+    if not query:
+        return condition
+    return {"$and": [query, condition]}
+
+
+def paginate(docs: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim a limit + 1 fetch to one page and compute its next cursor"""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
@@ -0,0 +1,102 @@
+"""
+Password hashing off the event loop.
+
+bcrypt costs 100-300 ms of CPU per call by design. Running it inline in an
+async handler blocks every other request on the worker, so hashing and
+verification run on a small dedicated thread pool (bcrypt releases the GIL).
+At most PASSWORD_MAX_PENDING calls may be queued or running; beyond that the
+request is refused with 503 rather than piling up behind a login storm.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from auth import pwd_context
+
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", "2"))
+PASSWORD_MAX_PENDING = int(os.environ.get("PASSWORD_MAX_PENDING", "64"))
+
+
+class PasswordPool:
+    """Bounded thread pool for bcrypt calls, with queueing metrics"""
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._running = 0
+        self._running_lock = threading.Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, retry shortly",
+                headers={"Retry-After": "1"}
+            )
+
+        self._pending += 1
+        submitted = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        def call():
+            timings["started"] = time.perf_counter()
+            with self._running_lock:
+                self._running += 1
+            try:
+                return func(*args)
+            finally:
+                with self._running_lock:
+                    self._running -= 1
+                timings["finished"] = time.perf_counter()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            self._pending -= 1
+            if "started" in timings:
+                wait = timings["started"] - submitted
+                self._completed += 1
+                self._wait_seconds += wait
+                self._run_seconds += timings["finished"] - timings["started"]
+                self._max_wait_seconds = max(self._max_wait_seconds, wait)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Check a password; the second value is a new hash when the stored one uses outdated settings"""
+        return await self._submit(pwd_context.verify_and_update, password, hashed)
+
+    def metrics(self) -> Dict[str, Any]:
+        completed = self._completed or 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "running": self._running,
+            "queued": self._pending - self._running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(self._wait_seconds / completed * 1000, 2),
+            "max_wait_ms": round(self._max_wait_seconds * 1000, 2),
+            "avg_run_ms": round(self._run_seconds / completed * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,115 @@
+"""
+Fast path for list responses.
+
+List routes return plain Mongo documents; letting FastAPI validate each one
+against its response model and re-encode it costs more than the query itself
+on large pages. Instead a `ModelShape` derived from the model projects exactly
+the model's fields from Mongo, fills in defaults for absent ones, and the page
+is encoded once with orjson. The output has the same fields, order and value
+encoding as `Model(**doc).model_dump_json()` (see tests/test_responses.py),
+without validating documents the API wrote itself.
+"""
+import copy
+import json
+import typing
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional dependency, the standard encoder is used without it
+    orjson = None
+
+
+def _nested_model(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """(model, is_list) when a field holds a nested model or a list of them"""
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        return _nested_model(args[0])
+    if typing.get_origin(annotation) in (list, List) and args:
+        model, _ = _nested_model(args[0])
+        return model, model is not None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+
+class ModelShape:
+    """Field layout of a response model: its Mongo projection and default filling"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields = []
+        for name, info in model.model_fields.items():
+            nested, is_list = _nested_model(info.annotation)
+            self.fields.append((name, info, ModelShape(nested) if nested else None, is_list))
+        self.projection = {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+    def only(self, fields: Optional[str]) -> "ModelShape":
+        """This shape restricted to a comma-separated sparse fieldset (id is always included)"""
+        if not fields:
+            return self
+        names = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = names - set(self.model.model_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        names.add("id")
+        shape = copy.copy(self)
+        shape.fields = [field for field in self.fields if field[0] in names]
+        # created_at is fetched regardless: the keyset cursor is built from it
+        shape.projection = {"_id": 0, "created_at": 1, **{name: 1 for name in names}}
+        return shape
+
+    def dump(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """The model's fields from doc, in model order, defaults filled in"""
+        out = {}
+        for name, info, nested, is_list in self.fields:
+            if name in doc:
+                value = doc[name]
+            elif info.is_required():
+                # Malformed document: let the model report it properly
+                return self.model(**doc).model_dump(mode="json")
+            else:
+                value = info.get_default(call_default_factory=True)
+            if nested is not None and value is not None:
+                value = [nested.dump(v) for v in value] if is_list else nested.dump(value)
+            out[name] = value
+        return out
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson, datetimes in the same form as Pydantic"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def page_response(
+    shape: ModelShape,
+    docs: List[Dict[str, Any]],
+    next_cursor: Optional[str],
+    response: Optional[Response] = None
+) -> FastJSONResponse:
+    """A Page of docs, keeping headers (e.g. validators) already set on the route's response"""
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    return FastJSONResponse(
+        {"items": [shape.dump(doc) for doc in docs], "next_cursor": next_cursor},
+        headers=headers
+    )
@@ -0,0 +1,135 @@
+"""
+Spaced-repetition scheduling of flashcards (SM-2).
+
+Each user has one `flashcard_reviews` document per card they study, holding
+the card's ease, interval and due date, plus a copy of the card's text so the
+due queue is served from that collection alone via its (user_id, due_at)
+index. Studying a set creates the documents, due immediately. A review
+session is graded in one request: the states of every card in the batch are
+read with one query and written back with one unordered bulk_write,
+whatever the batch size.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from mongo import utcnow
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# Grades below this (0-5 scale) are lapses: the card starts over
+PASSING_GRADE = 3
+
+
+def card_key(flashcard_id: str, card_index: int) -> str:
+    return f"{flashcard_id}:{card_index}"
+
+
+def schedule(state: Dict[str, Any], grade: int, now: datetime) -> Dict[str, Any]:
+    """Scheduling fields of a card after a review graded 0-5 (SM-2)"""
+    ease = state.get("ease", INITIAL_EASE)
+    interval = state.get("interval", 0)
+    repetitions = state.get("repetitions", 0)
+    lapses = state.get("lapses", 0)
+
+    if grade < PASSING_GRADE:
+        repetitions = 0
+        interval = 1
+        lapses += 1
+    else:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = max(1, round(interval * ease))
+        repetitions += 1
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+
+    return {
+        "ease": round(ease, 4),
+        "interval": interval,
+        "repetitions": repetitions,
+        "lapses": lapses,
+        "due_at": now + timedelta(days=interval),
+        "last_reviewed_at": now,
+    }
+
+
+def _card_doc(user_id: str, flashcard: Dict[str, Any], index: int, now: datetime) -> Dict[str, Any]:
+    card = flashcard["cards"][index]
+    return {
+        "user_id": user_id,
+        "card_key": card_key(flashcard["id"], index),
+        "flashcard_id": flashcard["id"],
+        "flashcard_title": flashcard["title"],
+        "card_index": index,
+        "front": card["front"],
+        "back": card["back"],
+        "ease": INITIAL_EASE,
+        "interval": 0,
+        "repetitions": 0,
+        "lapses": 0,
+        "due_at": now,
+        "last_reviewed_at": None,
+        "created_at": now,
+    }
+
+
+async def enroll(database: AsyncIOMotorDatabase, user_id: str, flashcard: Dict[str, Any]) -> int:
+    """Schedule every card of a set for user (cards already scheduled are kept); returns the number added"""
+    if not flashcard["cards"]:
+        return 0
+    now = utcnow()
+    result = await database.flashcard_reviews.bulk_write([
+        UpdateOne(
+            {"user_id": user_id, "card_key": card_key(flashcard["id"], index)},
+            {"$setOnInsert": _card_doc(user_id, flashcard, index, now)},
+            upsert=True
+        )
+        for index in range(len(flashcard["cards"]))
+    ], ordered=False)
+    return result.upserted_count
+
+
+async def due_cards(database: AsyncIOMotorDatabase, user_id: str, limit: int) -> List[Dict[str, Any]]:
+    """The user's cards due now, most overdue first"""
+    return await database.flashcard_reviews.find(
+        {"user_id": user_id, "due_at": {"$lte": utcnow()}}, {"_id": 0}
+    ).sort("due_at", 1).limit(limit).to_list(None)
+
+
+async def grade_reviews(
+    database: AsyncIOMotorDatabase, user_id: str, reviews: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Apply a batch of {flashcard_id, card_index, grade} in order; returns the updated cards"""
+    keys = list(dict.fromkeys(card_key(r["flashcard_id"], r["card_index"]) for r in reviews))
+    docs = await database.flashcard_reviews.find(
+        {"user_id": user_id, "card_key": {"$in": keys}}, {"_id": 0}
+    ).to_list(None)
+    states = {doc["card_key"]: doc for doc in docs}
+
+    missing = [key for key in keys if key not in states]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cards not scheduled for review: {', '.join(missing[:10])}"
+        )
+
+    now = utcnow()
+    changed = {}
+    for review in reviews:
+        key = card_key(review["flashcard_id"], review["card_index"])
+        # A card graded twice in one session is rescheduled from its latest state
+        states[key].update(schedule(states[key], review["grade"], now))
+        changed[key] = states[key]
+
+    fields = ("ease", "interval", "repetitions", "lapses", "due_at", "last_reviewed_at")
+    await database.flashcard_reviews.bulk_write([
+        UpdateOne({"user_id": user_id, "card_key": key}, {"$set": {f: doc[f] for f in fields}})
+        for key, doc in changed.items()
+    ], ordered=False)
+    return list(changed.values())
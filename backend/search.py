@@ -0,0 +1,256 @@
+"""
+In-process full-text search over resources and discussions.
+
+An inverted index with French-aware tokenization (accent folding, stop words,
+plural stripping) and BM25 ranking. It is built from MongoDB at startup, kept
+up to date by the write handlers of this process, and periodically synced with
+documents updated by other workers (an indexed `updated_at` range). Deletes
+leave a short-lived tombstone in `search_tombstones` so the other workers drop
+the document on their next sync. Scoring walks the postings of the query terms
+rather than the whole corpus; deeper pages cost more, as each page ranks
+offset + limit hits.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import os
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from mongo import utcnow
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SYNC_INTERVAL = float(os.environ.get("SEARCH_SYNC_INTERVAL", "30"))
+# Tombstones only have to outlive a sync interval; a day covers workers that were paused
+SEARCH_TOMBSTONE_TTL = int(os.environ.get("SEARCH_TOMBSTONE_TTL", str(24 * 3600)))
+TOMBSTONES_COLLECTION = "search_tombstones"
+# Cap on ids handed to list endpoints when they filter with `search=`
+SEARCH_MAX_MATCHES = 1000
+# Cap on vocabulary terms a trailing prefix can expand to
+MAX_PREFIX_EXPANSIONS = 50
+
+STOP_WORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "elle", "en", "et", "eux",
+    "il", "ils", "je", "la", "le", "les", "leur", "lui", "ma", "mais", "me", "meme", "mes", "moi",
+    "mon", "ne", "nos", "notre", "nous", "on", "ou", "par", "pas", "pour", "qu", "que", "qui",
+    "sa", "se", "ses", "son", "sur", "ta", "te", "tes", "toi", "ton", "tu", "un", "une", "vos",
+    "votre", "vous", "c", "d", "j", "l", "m", "n", "s", "t", "y", "est", "sont", "ete", "etre",
+    "the", "of", "and", "to", "in", "is", "for", "on", "an",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Field weights: a title match counts more than a body match
+TITLE_WEIGHT = 2
+BODY_WEIGHT = 1
+
+SEARCH_FIELDS = {
+    "resource": ("resources", "description"),
+    "discussion": ("discussions", "content"),
+}
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents ("Économie" -> "economie")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def stem(token: str) -> str:
+    """Light French stemming: drop plural endings"""
+    if len(token) > 4 and token.endswith("aux"):
+        return token[:-3] + "al"
+    if len(token) > 3 and token[-1] in "sx":
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into folded, stemmed terms without stop words"""
+    if not text:
+        return []
+    return [stem(token) for token in TOKEN_RE.findall(fold(text)) if token not in STOP_WORDS]
+
+
+class IndexedDocument(NamedTuple):
+    doc_type: str
+    doc_id: str
+    length: int
+    terms: Tuple[str, ...]
+    subject_id: Optional[str]
+
+
+class SearchIndex:
+    """Inverted index with incremental add/remove and BM25 scoring"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.documents: Dict[str, IndexedDocument] = {}
+        self.total_length = 0
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @staticmethod
+    def key(doc_type: str, doc_id: str) -> str:
+        return f"{doc_type}:{doc_id}"
+
+    def add(self, doc_type: str, doc_id: str, title: Optional[str], body: Optional[str],
+            subject_id: Optional[str] = None) -> None:
+        """Index (or re-index) a document"""
+        key = self.key(doc_type, doc_id)
+        if key in self.documents:
+            self.remove(doc_type, doc_id)
+
+        frequencies: Dict[str, int] = {}
+        for weight, text in ((TITLE_WEIGHT, title), (BODY_WEIGHT, body)):
+            for term in tokenize(text):
+                frequencies[term] = frequencies.get(term, 0) + weight
+
+        length = sum(frequencies.values())
+        for term, tf in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._vocabulary_dirty = True
+            postings[key] = tf
+
+        self.documents[key] = IndexedDocument(doc_type, doc_id, length, tuple(frequencies), subject_id)
+        self.total_length += length
+
+    def remove(self, doc_type: str, doc_id: str) -> None:
+        """Drop a document from the index"""
+        document = self.documents.pop(self.key(doc_type, doc_id), None)
+        if document is None:
+            return
+        key = self.key(doc_type, doc_id)
+        for term in document.terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[term]
+                self._vocabulary_dirty = True
+        self.total_length -= document.length
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        expansions = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expansions.append(term)
+        return expansions
+
+    def _query_terms(self, query: str) -> List[str]:
+        terms = tokenize(query)
+        raw = TOKEN_RE.findall(fold(query))
+        # Search-as-you-type: the last word may be incomplete ("math" -> "mathematique")
+        if raw and len(raw[-1]) >= 3 and raw[-1] not in STOP_WORDS and not query.endswith(" "):
+            terms += self._expand_prefix(raw[-1])
+        return list(dict.fromkeys(terms))
+
+    def search(self, query: str, doc_types: Optional[Iterable[str]] = None,
+               subject_id: Optional[str] = None, offset: int = 0,
+               limit: int = 20) -> Tuple[int, List[Tuple[float, str, str]]]:
+        """Rank matching documents; returns (total matches, [(score, doc_type, doc_id)]) for the page"""
+        if not self.documents:
+            return 0, []
+
+        allowed: Optional[Set[str]] = set(doc_types) if doc_types else None
+        n_docs = len(self.documents)
+        avg_length = (self.total_length / n_docs) or 1
+        scores: Dict[str, float] = {}
+
+        for term in self._query_terms(query):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, tf in postings.items():
+                document = self.documents[key]
+                if allowed is not None and document.doc_type not in allowed:
+                    continue
+                if subject_id is not None and document.subject_id != subject_id:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * document.length / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])[offset:]
+        return len(scores), [
+            (score, self.documents[key].doc_type, self.documents[key].doc_id) for key, score in top
+        ]
+
+    def matching_ids(self, query: str, doc_type: str, limit: int = SEARCH_MAX_MATCHES) -> List[str]:
+        """Ids of the best matches of one type, for filtering list endpoints"""
+        _, hits = self.search(query, doc_types=[doc_type], limit=limit)
+        return [doc_id for _, _, doc_id in hits]
+
+
+search_index = SearchIndex()
+_last_sync: Optional[datetime] = None
+
+
+def index_document(doc_type: str, doc: Dict[str, Any]) -> None:
+    """Index a resource or discussion document"""
+    _, body_field = SEARCH_FIELDS[doc_type]
+    search_index.add(doc_type, doc["id"], doc.get("title"), doc.get(body_field), doc.get("subject_id"))
+
+
+async def unindex_document(database: AsyncIOMotorDatabase, doc_type: str, doc_id: str) -> None:
+    """Drop a deleted document here, and leave a tombstone for the other workers' indexes"""
+    search_index.remove(doc_type, doc_id)
+    await database[TOMBSTONES_COLLECTION].insert_one(
+        {"doc_type": doc_type, "doc_id": doc_id, "deleted_at": utcnow()}
+    )
+
+
+async def sync_search_index(database: AsyncIOMotorDatabase) -> int:
+    """Apply documents written and deleted since the last sync (index everything on the first run)"""
+    global _last_sync
+    started_at = utcnow()
+    query = {"updated_at": {"$gte": _last_sync}} if _last_sync else {}
+
+    count = 0
+    for doc_type, (collection, body_field) in SEARCH_FIELDS.items():
+        projection = {"_id": 0, "id": 1, "title": 1, body_field: 1, "subject_id": 1}
+        async for doc in database[collection].find(query, projection):
+            index_document(doc_type, doc)
+            count += 1
+
+    # After the upserts: a document deleted after it was read above is still dropped
+    if _last_sync:
+        tombstones = database[TOMBSTONES_COLLECTION].find(
+            {"deleted_at": {"$gte": _last_sync}}, {"_id": 0, "doc_type": 1, "doc_id": 1}
+        )
+        async for tombstone in tombstones:
+            search_index.remove(tombstone["doc_type"], tombstone["doc_id"])
+            count += 1
+
+    _last_sync = started_at
+    return count
+
+
+async def search_sync_loop(database: AsyncIOMotorDatabase) -> None:
+    """Periodically pick up documents written by other workers"""
+    while True:
+        await asyncio.sleep(SEARCH_SYNC_INTERVAL)
+        try:
+            await sync_search_index(database)
+        except Exception:
+            logger.exception("Search index sync failed")
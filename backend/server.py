@@ -1,30 +1,60 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
+import asyncio
 import logging
 from pathlib import Path
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone
 
 from models import (
-    User, UserCreate, UserLogin, UserUpdate, UserProfile,
+    User, UserCreate, UserLogin, UserUpdate, UserProfile, UserRole,
     Subject, SubjectCreate,
-    Resource, ResourceCreate, ResourceUpdate,
+    Resource, ResourceSummary, ResourceCreate, ResourceUpdate, UploadCheck, UploadResult,
     Discussion, DiscussionCreate, DiscussionUpdate, CommentCreate, Comment,
-    Quiz, QuizCreate, QuizUpdate,
-    Flashcard, FlashcardCreate, FlashcardUpdate,
+    Quiz, QuizPublic, QuizSummary, QuizCreate, QuizUpdate,
+    QuizAttempt, QuizAttemptCreate, QuizStatistics,
+    Flashcard, FlashcardSummary, FlashcardCreate, FlashcardUpdate,
+    CardReviewBatch, ScheduledCard,
     Notification, NotificationCreate,
+    SearchResult, SearchResults, Page, BulkResult, FeedItem,
     Statistics, Token
 )
 from auth import (
-    get_password_hash, verify_password, create_access_token,
-    get_current_user, get_current_user_optional, security
+    create_access_token,
+    get_current_user, get_current_user_optional, security, optional_security, user_cache
 )
 from fastapi.security import HTTPAuthorizationCredentials
+from mongo import create_client, utcnow
+from jobs import enqueue_job, start_workers, stop_workers
+from counters import increment_user_counter, decrement_comment_counts
+from indexes import ensure_indexes
+from pagination import KEYSET_SORT, THREAD_SORT, apply_cursor, decode_cursor, paginate
+from search import search_index, index_document, unindex_document, sync_search_index, search_sync_loop, SEARCH_FIELDS
+from views import view_counter
+from stats import statistics_service
+from subjects import subject_catalog
+from passwords import password_pool
+from attempts import record_attempt, build_statistics
+from reviews import enroll, due_cards, grade_reviews
+from likes import add_like, remove_like, toggle_like, liked_ids
+from feed import publish_to_timelines, remove_from_timelines, read_feed
+from uploads import (
+    SHA256_PATTERN, blob_id, store_upload, find_upload, file_response, blob_path, thumbnail_path,
+    missing_blobs, retain_blobs, release_blobs, blob_gc_loop, shutdown_thumbnail_pool
+)
+from compression import CompressionMiddleware, PrecompressedStaticFiles
+from bulk import read_items, validate_items, bulk_subjects, insert_items, bulk_result
+from responses import FastJSONResponse, ModelShape, page_response
+from conditional import ETagMiddleware, collection_versions, check_collections, check_validators, make_etag
+from notifications import (
+    user_audiences, publish_event, notify_user, list_notifications, notification_stream, mark_read, mark_all_read, dismiss,
+    create_stream_ticket, redeem_stream_ticket, STREAM_TICKET_TTL
+)
 
 
 ROOT_DIR = Path(__file__).parent
@@ -32,7 +62,7 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_client(mongo_url)
 db = client[os.environ.get('DB_NAME', 'univloop_db')]
 
 # Create the main app
@@ -41,6 +71,33 @@ app = FastAPI(title="UnivLoop API")
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# List routes project and encode these directly (see responses.py)
+RESOURCE_SHAPE = ModelShape(ResourceSummary)
+DISCUSSION_SHAPE = ModelShape(Discussion)
+COMMENT_SHAPE = ModelShape(Comment)
+QUIZ_SHAPE = ModelShape(QuizSummary)
+FLASHCARD_SHAPE = ModelShape(FlashcardSummary)
+ATTEMPT_SHAPE = ModelShape(QuizAttempt)
+SCHEDULED_CARD_SHAPE = ModelShape(ScheduledCard)
+
+# Feed entries are hydrated with the list shapes of their type (see feed.py)
+FEED_SHAPES = {
+    "resource": RESOURCE_SHAPE,
+    "discussion": DISCUSSION_SHAPE,
+    "quiz": QUIZ_SHAPE,
+    "flashcard": FLASHCARD_SHAPE,
+}
+FEED_PROJECTIONS = {
+    doc_type: {k: v for k, v in shape.projection.items() if k != "liked_by_me"}
+    for doc_type, shape in FEED_SHAPES.items()
+}
+
+# Sparse fieldset parameter of the list routes
+FIELDS_QUERY = Query(None, description="Comma-separated fields to return (id is always included)")
+
+# Insert mode of the bulk create routes (see bulk.py)
+BULK_ORDERED_QUERY = Query(False, description="Stop at the first item that fails validation or insert")
+
 
 # Dependency to get database
 async def get_db() -> AsyncIOMotorDatabase:
@@ -56,6 +113,14 @@ async def get_current_user_dep(
     return await get_current_user(credentials, database)
 
 
+async def get_optional_user_dep(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+) -> Optional[User]:
+    """Dependency to get the authenticated user, or None for anonymous requests"""
+    return await get_current_user_optional(credentials, database)
+
+
 # ============================================================================
 # AUTHENTICATION ROUTES
 # ============================================================================
@@ -73,7 +138,7 @@ async def register(user_data: UserCreate, database: AsyncIOMotorDatabase = Depen
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_pool.hash(user_data.password)
     
     user_doc = {
         "id": user_id,
@@ -87,11 +152,16 @@ async def register(user_data: UserCreate, database: AsyncIOMotorDatabase = Depen
         "avatar": user_data.avatar,
         "role": "student",
         "reputation": 0,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "resources_count": 0,
+        "discussions_count": 0,
+        "comments_count": 0,
+        "created_at": utcnow(),
+        "updated_at": utcnow()
     }
     
     await database.users.insert_one(user_doc)
+    await collection_versions.bump(database, "users")
+    statistics_service.adjust("users")
     
     # Create access token
     access_token = create_access_token(data={"sub": user_id})
@@ -104,12 +174,22 @@ async def login(credentials: UserLogin, database: AsyncIOMotorDatabase = Depends
     """Login user"""
     # Find user
     user_doc = await database.users.find_one({"email": credentials.email})
-    if not user_doc or not verify_password(credentials.password, user_doc["password"]):
+    valid, new_hash = False, None
+    if user_doc:
+        valid, new_hash = await password_pool.verify_and_update(credentials.password, user_doc["password"])
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
+    # Stored hash uses an outdated cost factor: replace it now that we know the password
+    if new_hash:
+        await database.users.update_one(
+            {"id": user_doc["id"], "password": user_doc["password"]},
+            {"$set": {"password": new_hash}}
+        )
+    
     # Create access token
     access_token = create_access_token(data={"sub": user_doc["id"]})
     
@@ -134,30 +214,11 @@ async def logout():
 
 @api_router.get("/users/{user_id}", response_model=UserProfile)
 async def get_user(user_id: str, database: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get user profile by ID"""
+    """Get user profile by ID (statistics come from counters on the user document)"""
     user_doc = await database.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Convert datetime strings
-    if isinstance(user_doc.get('created_at'), str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-    
-    # Get user statistics
-    resources_count = await database.resources.count_documents({"author_id": user_id})
-    discussions_count = await database.discussions.count_documents({"author_id": user_id})
-    
-    # Count comments by user
-    discussions = await database.discussions.find({}).to_list(None)
-    comments_count = sum(
-        len([c for c in d.get('comments', []) if c.get('author_id') == user_id])
-        for d in discussions
-    )
-    
-    user_doc['resources_count'] = resources_count
-    user_doc['discussions_count'] = discussions_count
-    user_doc['comments_count'] = comments_count
-    
     return UserProfile(**user_doc)
 
 
@@ -174,7 +235,7 @@ async def update_user(
     
     # Update user
     update_data = {k: v for k, v in user_update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utcnow()
     
     result = await database.users.update_one(
         {"id": user_id},
@@ -183,16 +244,11 @@ async def update_user(
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await user_cache.invalidate(user_id)
     
     # Get updated user
     user_doc = await database.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
     
-    # Convert datetime strings
-    if isinstance(user_doc.get('created_at'), str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-    if isinstance(user_doc.get('updated_at'), str):
-        user_doc['updated_at'] = datetime.fromisoformat(user_doc['updated_at'])
-    
     return User(**user_doc)
 
 
@@ -201,14 +257,13 @@ async def update_user(
 # ============================================================================
 
 @api_router.get("/subjects", response_model=List[Subject])
-async def get_subjects(database: AsyncIOMotorDatabase = Depends(get_db)):
+async def get_subjects(request: Request, response: Response, database: AsyncIOMotorDatabase = Depends(get_db)):
     """Get all subjects"""
-    subjects = await database.subjects.find({}, {"_id": 0}).to_list(None)
-    
-    # Convert datetime strings
-    for subject in subjects:
-        if isinstance(subject.get('created_at'), str):
-            subject['created_at'] = datetime.fromisoformat(subject['created_at'])
+    # Tagged with the catalog this worker serves, not the live version it may lag behind
+    etag, subjects = await subject_catalog.snapshot(database)
+    not_modified = check_validators(request, response, etag, None)
+    if not_modified:
+        return not_modified
     
     return subjects
 
@@ -233,25 +288,24 @@ async def create_subject(
         "color": subject_data.color,
         "is_custom": subject_data.is_custom,
         "created_by": current_user.id if subject_data.is_custom else None,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
     await database.subjects.insert_one(subject_doc)
+    subject_catalog.add(subject_doc)
+    await collection_versions.bump(database, "subjects")
+    statistics_service.adjust("subjects")
     
-    subject_doc['created_at'] = datetime.fromisoformat(subject_doc['created_at'])
     return Subject(**subject_doc)
 
 
 @api_router.get("/subjects/{subject_id}", response_model=Subject)
 async def get_subject(subject_id: str, database: AsyncIOMotorDatabase = Depends(get_db)):
     """Get subject by ID"""
-    subject_doc = await database.subjects.find_one({"id": subject_id}, {"_id": 0})
+    subject_doc = await subject_catalog.get(database, subject_id)
     if not subject_doc:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    if isinstance(subject_doc.get('created_at'), str):
-        subject_doc['created_at'] = datetime.fromisoformat(subject_doc['created_at'])
-    
     return Subject(**subject_doc)
 
 
@@ -259,36 +313,61 @@ async def get_subject(subject_id: str, database: AsyncIOMotorDatabase = Depends(
 # RESOURCE ROUTES
 # ============================================================================
 
-@api_router.get("/resources", response_model=List[Resource])
+@api_router.get("/resources", response_model=Page[ResourceSummary])
 async def get_resources(
     subject_id: Optional[str] = Query(None),
     author_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    limit: int = Query(50, le=100),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = FIELDS_QUERY,
+    current_user: Optional[User] = Depends(get_optional_user_dep),
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get all resources with optional filters"""
+    """Get resources with optional filters, newest first (paginate with next_cursor)"""
     query = {}
     if subject_id:
         query["subject_id"] = subject_id
     if author_id:
         query["author_id"] = author_id
     if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
+        query["id"] = {"$in": search_index.matching_ids(search, "resource")}
     
-    resources = await database.resources.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(None)
+    shape = RESOURCE_SHAPE.only(fields)
+    projection = dict(shape.projection)
+    want_liked = projection.pop("liked_by_me", None) is not None
     
-    # Convert datetime strings
-    for resource in resources:
-        if isinstance(resource.get('created_at'), str):
-            resource['created_at'] = datetime.fromisoformat(resource['created_at'])
-        if isinstance(resource.get('updated_at'), str):
-            resource['updated_at'] = datetime.fromisoformat(resource['updated_at'])
+    resources = await database.resources.find(
+        apply_cursor(query, cursor), projection
+    ).sort(KEYSET_SORT).limit(limit + 1).to_list(None)
+    resources, next_cursor = paginate(resources, limit)
+    if want_liked:
+        # One lookup for the whole page
+        liked = await liked_ids(database, current_user.id, (r["id"] for r in resources)) if current_user else set()
+        for resource in resources:
+            resource["liked_by_me"] = resource["id"] in liked
     
-    return resources
+    return page_response(shape, resources, next_cursor)
+
+
+def resource_document(resource_data: ResourceCreate, author: User) -> dict:
+    """New resource document"""
+    return {
+        "id": str(uuid.uuid4()),
+        "title": resource_data.title,
+        "description": resource_data.description,
+        "subject_id": resource_data.subject_id,
+        "author_id": author.id,
+        "author_name": author.name,
+        "author_avatar": author.avatar,
+        "type": resource_data.type,
+        "file_url": resource_data.file_url,
+        "thumbnail_url": resource_data.thumbnail_url,
+        "likes": 0,
+        "views": 0,
+        "created_at": utcnow(),
+        "updated_at": utcnow()
+    }
 
 
 @api_router.post("/resources", response_model=Resource, status_code=status.HTTP_201_CREATED)
@@ -299,72 +378,125 @@ async def create_resource(
 ):
     """Create a new resource"""
     # Verify subject exists
-    subject = await database.subjects.find_one({"id": resource_data.subject_id})
+    subject = await subject_catalog.get(database, resource_data.subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
+    if await missing_blobs(database, [resource_data.file_url]):
+        raise HTTPException(status_code=400, detail="Uploaded file not found, upload it again")
     
-    resource_doc = {
-        "id": str(uuid.uuid4()),
-        "title": resource_data.title,
-        "description": resource_data.description,
-        "subject_id": resource_data.subject_id,
-        "author_id": current_user.id,
-        "author_name": current_user.name,
-        "author_avatar": current_user.avatar,
-        "type": resource_data.type,
-        "file_url": resource_data.file_url,
-        "thumbnail_url": resource_data.thumbnail_url,
-        "likes": 0,
-        "views": 0,
-        "liked_by": [],
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
-    }
+    resource_doc = resource_document(resource_data, current_user)
     
     await database.resources.insert_one(resource_doc)
+    await collection_versions.bump(database, "resources")
+    statistics_service.adjust("resources")
+    index_document("resource", resource_doc)
+    await increment_user_counter(database, current_user.id, "resources_count")
+    await retain_blobs(database, [resource_doc["file_url"]])
+    await publish_to_timelines(database, current_user, "resource", [resource_doc])
+    
+    # Broadcast to all users (stored once, merged into each feed on read)
+    await publish_event(
+        database,
+        current_user,
+        type="resource",
+        title="Nouvelle ressource",
+        message=f"{current_user.name} a partagé: {resource_data.title}",
+        link="/resources"
+    )
     
-    # Create notification for followers (simplified - notify all users except author)
-    users = await database.users.find({"id": {"$ne": current_user.id}}, {"_id": 0, "id": 1}).to_list(None)
-    notifications = []
-    for user in users:
-        notif = {
-            "id": str(uuid.uuid4()),
-            "user_id": user["id"],
-            "type": "resource",
-            "title": "Nouvelle ressource",
-            "message": f"{current_user.name} a partagé: {resource_data.title}",
-            "link": f"/resources",
-            "read": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        notifications.append(notif)
-    
-    if notifications:
-        await database.notifications.insert_many(notifications)
-    
-    resource_doc['created_at'] = datetime.fromisoformat(resource_doc['created_at'])
-    resource_doc['updated_at'] = datetime.fromisoformat(resource_doc['updated_at'])
     return Resource(**resource_doc)
 
 
+@api_router.post("/resources/bulk", response_model=BulkResult)
+async def create_resources_bulk(
+    request: Request,
+    ordered: bool = BULK_ORDERED_QUERY,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Create resources from a JSON array or NDJSON stream of ResourceCreate"""
+    valid, errors = validate_items(await read_items(request), ResourceCreate)
+    subjects = await bulk_subjects(database, valid)
+    missing = await missing_blobs(database, (resource_data.file_url for _, resource_data in valid))
+    
+    docs = []
+    for index, resource_data in valid:
+        if subjects[resource_data.subject_id] is None:
+            errors.append({"index": index, "detail": "Subject not found"})
+            continue
+        if blob_id(resource_data.file_url) in missing:
+            errors.append({"index": index, "detail": "Uploaded file not found, upload it again"})
+            continue
+        docs.append((index, resource_document(resource_data, current_user)))
+    
+    inserted, insert_errors = await insert_items(database.resources, docs, ordered, errors)
+    if inserted:
+        await collection_versions.bump(database, "resources")
+        statistics_service.adjust("resources", len(inserted))
+        for _, resource_doc in inserted:
+            index_document("resource", resource_doc)
+        await increment_user_counter(database, current_user.id, "resources_count", len(inserted))
+        await retain_blobs(database, (doc["file_url"] for _, doc in inserted))
+        await publish_to_timelines(database, current_user, "resource", [doc for _, doc in inserted])
+        
+        # One event for the whole batch
+        await publish_event(
+            database,
+            current_user,
+            type="resource",
+            title="Nouvelles ressources",
+            message=f"{current_user.name} a partagé {len(inserted)} ressource(s)",
+            link="/resources"
+        )
+    
+    return bulk_result(inserted, errors + insert_errors)
+
+
+@api_router.post("/resources/upload", response_model=UploadResult, status_code=status.HTTP_201_CREATED)
+async def upload_resource_file(
+    request: Request,
+    filename: Optional[str] = Query(None, description="Original file name"),
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Upload a file as the raw request body (Content-Type: the file's type); use file_url in POST /resources"""
+    return await store_upload(database, request, filename, current_user.id)
+
+
+@api_router.post("/resources/upload/check", response_model=UploadResult)
+async def check_resource_upload(
+    upload: UploadCheck,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Look up a file by hash before uploading it; 404 means it has to be uploaded"""
+    result = await find_upload(database, upload.sha256, upload.size)
+    if result is None:
+        raise HTTPException(status_code=404, detail="File not uploaded yet")
+    return result
+
+
 @api_router.get("/resources/{resource_id}", response_model=Resource)
-async def get_resource(resource_id: str, database: AsyncIOMotorDatabase = Depends(get_db)):
+async def get_resource(
+    resource_id: str,
+    request: Request,
+    response: Response,
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
     """Get resource by ID and increment views"""
     resource_doc = await database.resources.find_one({"id": resource_id}, {"_id": 0})
     if not resource_doc:
         raise HTTPException(status_code=404, detail="Resource not found")
     
-    # Increment views
-    await database.resources.update_one(
-        {"id": resource_id},
-        {"$inc": {"views": 1}}
-    )
-    resource_doc['views'] = resource_doc.get('views', 0) + 1
+    # Buffered and flushed in batches; the response does not wait on the write
+    view_counter.record("resources", resource_id)
     
-    if isinstance(resource_doc.get('created_at'), str):
-        resource_doc['created_at'] = datetime.fromisoformat(resource_doc['created_at'])
-    if isinstance(resource_doc.get('updated_at'), str):
-        resource_doc['updated_at'] = datetime.fromisoformat(resource_doc['updated_at'])
+    # Weak: the view count moves on every read without changing the resource itself
+    etag = make_etag(resource_id, resource_doc["updated_at"], resource_doc.get("likes", 0), weak=True)
+    not_modified = check_validators(request, response, etag, resource_doc["updated_at"])
+    if not_modified:
+        return not_modified
+    resource_doc['views'] = resource_doc.get('views', 0) + view_counter.pending("resources", resource_id)
     
     return Resource(**resource_doc)
 
@@ -385,19 +517,16 @@ async def update_resource(
         raise HTTPException(status_code=403, detail="Not authorized to update this resource")
     
     update_data = {k: v for k, v in resource_update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utcnow()
     
     await database.resources.update_one(
         {"id": resource_id},
         {"$set": update_data}
     )
+    await collection_versions.bump(database, "resources")
     
     resource_doc = await database.resources.find_one({"id": resource_id}, {"_id": 0})
-    
-    if isinstance(resource_doc.get('created_at'), str):
-        resource_doc['created_at'] = datetime.fromisoformat(resource_doc['created_at'])
-    if isinstance(resource_doc.get('updated_at'), str):
-        resource_doc['updated_at'] = datetime.fromisoformat(resource_doc['updated_at'])
+    index_document("resource", resource_doc)
     
     return Resource(**resource_doc)
 
@@ -416,10 +545,42 @@ async def delete_resource(
     if resource_doc["author_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this resource")
     
-    await database.resources.delete_one({"id": resource_id})
+    result = await database.resources.delete_one({"id": resource_id})
+    await database.resource_likes.delete_many({"resource_id": resource_id})
+    await unindex_document(database, "resource", resource_id)
+    await remove_from_timelines(database, resource_id)
+    if result.deleted_count:
+        await collection_versions.bump(database, "resources")
+        statistics_service.adjust("resources", -1)
+        await increment_user_counter(database, current_user.id, "resources_count", -1)
+        await release_blobs(database, [resource_doc["file_url"]])
     return None
 
 
+async def like_response(
+    database: AsyncIOMotorDatabase, resource_doc: Optional[dict], liked: bool, changed: bool, current_user: User
+) -> dict:
+    """Shared tail of the like routes: 404, version bump and author notification"""
+    if resource_doc is None:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    
+    if changed:
+        await collection_versions.bump(database, "resources")
+    
+    # Create notification for author
+    if changed and liked and resource_doc["author_id"] != current_user.id:
+        await notify_user(
+            database,
+            resource_doc["author_id"],
+            type="like",
+            title="Nouveau like",
+            message=f"{current_user.name} a aimé votre ressource: {resource_doc['title']}",
+            link="/resources"
+        )
+    
+    return {"liked": liked, "likes": resource_doc.get("likes", 0)}
+
+
 @api_router.post("/resources/{resource_id}/like")
 async def like_resource(
     resource_id: str,
@@ -427,54 +588,37 @@ async def like_resource(
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Like or unlike a resource"""
-    resource_doc = await database.resources.find_one({"id": resource_id})
-    if not resource_doc:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    
-    liked_by = resource_doc.get("liked_by", [])
-    
-    if current_user.id in liked_by:
-        # Unlike
-        await database.resources.update_one(
-            {"id": resource_id},
-            {
-                "$pull": {"liked_by": current_user.id},
-                "$inc": {"likes": -1}
-            }
-        )
-        return {"liked": False, "likes": resource_doc.get("likes", 0) - 1}
-    else:
-        # Like
-        await database.resources.update_one(
-            {"id": resource_id},
-            {
-                "$push": {"liked_by": current_user.id},
-                "$inc": {"likes": 1}
-            }
-        )
-        
-        # Create notification for author
-        if resource_doc["author_id"] != current_user.id:
-            notif = {
-                "id": str(uuid.uuid4()),
-                "user_id": resource_doc["author_id"],
-                "type": "like",
-                "title": "Nouveau like",
-                "message": f"{current_user.name} a aimé votre ressource: {resource_doc['title']}",
-                "link": f"/resources",
-                "read": False,
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
-            await database.notifications.insert_one(notif)
-        
-        return {"liked": True, "likes": resource_doc.get("likes", 0) + 1}
+    resource_doc, liked = await toggle_like(database, resource_id, current_user.id)
+    return await like_response(database, resource_doc, liked, True, current_user)
+
+
+@api_router.put("/resources/{resource_id}/like")
+async def set_resource_like(
+    resource_id: str,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Like a resource (no-op if already liked)"""
+    resource_doc, added = await add_like(database, resource_id, current_user.id)
+    return await like_response(database, resource_doc, True, added, current_user)
+
+
+@api_router.delete("/resources/{resource_id}/like")
+async def unset_resource_like(
+    resource_id: str,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Unlike a resource (no-op if not liked)"""
+    resource_doc, removed = await remove_like(database, resource_id, current_user.id)
+    return await like_response(database, resource_doc, False, removed, current_user)
 
 
 # ============================================================================
 # DISCUSSION/COMMUNITY ROUTES
 # ============================================================================
 
-@api_router.get("/discussions", response_model=List[Discussion])
+@api_router.get("/discussions", response_model=Page[Discussion])
 async def get_discussions(
     subject_id: Optional[str] = Query(None),
     group_type: Optional[str] = Query(None),
@@ -482,10 +626,12 @@ async def get_discussions(
     faculty: Optional[str] = Query(None),
     year: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    limit: int = Query(50, le=100),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = FIELDS_QUERY,
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get all discussions with filters"""
+    """Get discussions with filters, newest first (paginate with next_cursor)"""
     query = {}
     
     if subject_id:
@@ -499,25 +645,15 @@ async def get_discussions(
     if year:
         query["author_year"] = year
     if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"content": {"$regex": search, "$options": "i"}}
-        ]
-    
-    discussions = await database.discussions.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(None)
-    
-    # Convert datetime strings
-    for discussion in discussions:
-        if isinstance(discussion.get('created_at'), str):
-            discussion['created_at'] = datetime.fromisoformat(discussion['created_at'])
-        if isinstance(discussion.get('updated_at'), str):
-            discussion['updated_at'] = datetime.fromisoformat(discussion['updated_at'])
-        
-        for comment in discussion.get('comments', []):
-            if isinstance(comment.get('created_at'), str):
-                comment['created_at'] = datetime.fromisoformat(comment['created_at'])
+        query["id"] = {"$in": search_index.matching_ids(search, "discussion")}
     
-    return discussions
+    shape = DISCUSSION_SHAPE.only(fields)
+    discussions = await database.discussions.find(
+        apply_cursor(query, cursor), shape.projection
+    ).sort(KEYSET_SORT).limit(limit + 1).to_list(None)
+    discussions, next_cursor = paginate(discussions, limit)
+    
+    return page_response(shape, discussions, next_cursor)
 
 
 @api_router.post("/discussions", response_model=Discussion, status_code=status.HTTP_201_CREATED)
@@ -529,7 +665,7 @@ async def create_discussion(
     """Create a new discussion"""
     subject_name = None
     if discussion_data.subject_id:
-        subject = await database.subjects.find_one({"id": discussion_data.subject_id})
+        subject = await subject_catalog.get(database, discussion_data.subject_id)
         if subject:
             subject_name = subject["name"]
     
@@ -546,69 +682,44 @@ async def create_discussion(
         "author_faculty": current_user.faculty,
         "author_year": current_user.year_of_study,
         "group_type": discussion_data.group_type,
-        "comments": [],
+        "comment_count": 0,
         "views": 0,
         "solved": False,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow(),
+        "updated_at": utcnow()
     }
     
     await database.discussions.insert_one(discussion_doc)
+    await collection_versions.bump(database, "discussions")
+    statistics_service.adjust("discussions")
+    index_document("discussion", discussion_doc)
+    await increment_user_counter(database, current_user.id, "discussions_count")
+    await publish_to_timelines(database, current_user, "discussion", [discussion_doc], discussion_data.group_type)
+    
+    # Broadcast to the discussion's group (stored once, merged into each feed on read)
+    await publish_event(
+        database,
+        current_user,
+        type="discussion",
+        title="Nouvelle discussion",
+        message=f"{current_user.name} a posté: {discussion_data.title}",
+        link="/community",
+        group_type=discussion_data.group_type
+    )
     
-    # Create notifications based on group_type
-    users_query = {"id": {"$ne": current_user.id}}
-    if discussion_data.group_type == "department" and current_user.department:
-        users_query["department"] = current_user.department
-    elif discussion_data.group_type == "faculty" and current_user.faculty:
-        users_query["faculty"] = current_user.faculty
-    elif discussion_data.group_type == "year" and current_user.year_of_study:
-        users_query["year_of_study"] = current_user.year_of_study
-    
-    users = await database.users.find(users_query, {"_id": 0, "id": 1}).to_list(None)
-    notifications = []
-    for user in users:
-        notif = {
-            "id": str(uuid.uuid4()),
-            "user_id": user["id"],
-            "type": "discussion",
-            "title": "Nouvelle discussion",
-            "message": f"{current_user.name} a posté: {discussion_data.title}",
-            "link": f"/community",
-            "read": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        notifications.append(notif)
-    
-    if notifications:
-        await database.notifications.insert_many(notifications)
-    
-    discussion_doc['created_at'] = datetime.fromisoformat(discussion_doc['created_at'])
-    discussion_doc['updated_at'] = datetime.fromisoformat(discussion_doc['updated_at'])
     return Discussion(**discussion_doc)
 
 
 @api_router.get("/discussions/{discussion_id}", response_model=Discussion)
 async def get_discussion(discussion_id: str, database: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get discussion by ID and increment views"""
-    discussion_doc = await database.discussions.find_one({"id": discussion_id}, {"_id": 0})
+    """Get discussion by ID and increment views (comments are loaded separately)"""
+    discussion_doc = await database.discussions.find_one({"id": discussion_id}, {"_id": 0, "comments": 0})
     if not discussion_doc:
         raise HTTPException(status_code=404, detail="Discussion not found")
     
-    # Increment views
-    await database.discussions.update_one(
-        {"id": discussion_id},
-        {"$inc": {"views": 1}}
-    )
-    discussion_doc['views'] = discussion_doc.get('views', 0) + 1
-    
-    if isinstance(discussion_doc.get('created_at'), str):
-        discussion_doc['created_at'] = datetime.fromisoformat(discussion_doc['created_at'])
-    if isinstance(discussion_doc.get('updated_at'), str):
-        discussion_doc['updated_at'] = datetime.fromisoformat(discussion_doc['updated_at'])
-    
-    for comment in discussion_doc.get('comments', []):
-        if isinstance(comment.get('created_at'), str):
-            comment['created_at'] = datetime.fromisoformat(comment['created_at'])
+    # Buffered and flushed in batches; the response does not wait on the write
+    view_counter.record("discussions", discussion_id)
+    discussion_doc['views'] = discussion_doc.get('views', 0) + view_counter.pending("discussions", discussion_id)
     
     return Discussion(**discussion_doc)
 
@@ -629,23 +740,16 @@ async def update_discussion(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     update_data = {k: v for k, v in discussion_update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utcnow()
     
     await database.discussions.update_one(
         {"id": discussion_id},
         {"$set": update_data}
     )
+    await collection_versions.bump(database, "discussions")
     
-    discussion_doc = await database.discussions.find_one({"id": discussion_id}, {"_id": 0})
-    
-    if isinstance(discussion_doc.get('created_at'), str):
-        discussion_doc['created_at'] = datetime.fromisoformat(discussion_doc['created_at'])
-    if isinstance(discussion_doc.get('updated_at'), str):
-        discussion_doc['updated_at'] = datetime.fromisoformat(discussion_doc['updated_at'])
-    
-    for comment in discussion_doc.get('comments', []):
-        if isinstance(comment.get('created_at'), str):
-            comment['created_at'] = datetime.fromisoformat(comment['created_at'])
+    discussion_doc = await database.discussions.find_one({"id": discussion_id}, {"_id": 0, "comments": 0})
+    index_document("discussion", discussion_doc)
     
     return Discussion(**discussion_doc)
 
@@ -664,10 +768,40 @@ async def delete_discussion(
     if discussion_doc["author_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    await database.discussions.delete_one({"id": discussion_id})
+    result = await database.discussions.delete_one({"id": discussion_id})
+    await unindex_document(database, "discussion", discussion_id)
+    await remove_from_timelines(database, discussion_id)
+    if result.deleted_count:
+        await collection_versions.bump(database, "discussions")
+        statistics_service.adjust("discussions", -1)
+        await increment_user_counter(database, current_user.id, "discussions_count", -1)
+        comments = await database.comments.find(
+            {"discussion_id": discussion_id}, {"_id": 0, "author_id": 1}
+        ).to_list(None)
+        await database.comments.delete_many({"discussion_id": discussion_id})
+        await decrement_comment_counts(database, comments)
     return None
 
 
+@api_router.get("/discussions/{discussion_id}/comments", response_model=Page[Comment])
+async def get_comments(
+    discussion_id: str,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get a discussion's comments, oldest first (paginate with next_cursor)"""
+    if not await database.discussions.find_one({"id": discussion_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Discussion not found")
+    
+    comments = await database.comments.find(
+        apply_cursor({"discussion_id": discussion_id}, cursor, ascending=True), COMMENT_SHAPE.projection
+    ).sort(THREAD_SORT).limit(limit + 1).to_list(None)
+    comments, next_cursor = paginate(comments, limit)
+    
+    return page_response(COMMENT_SHAPE, comments, next_cursor)
+
+
 @api_router.post("/discussions/{discussion_id}/comments", response_model=Comment, status_code=status.HTTP_201_CREATED)
 async def add_comment(
     discussion_id: str,
@@ -676,42 +810,45 @@ async def add_comment(
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Add a comment to a discussion"""
-    discussion_doc = await database.discussions.find_one({"id": discussion_id})
+    discussion_doc = await database.discussions.find_one(
+        {"id": discussion_id}, {"_id": 0, "author_id": 1, "title": 1}
+    )
     if not discussion_doc:
         raise HTTPException(status_code=404, detail="Discussion not found")
     
     comment = {
         "id": str(uuid.uuid4()),
+        "discussion_id": discussion_id,
         "author_id": current_user.id,
         "author_name": current_user.name,
         "author_avatar": current_user.avatar,
         "content": comment_data.content,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
+    await database.comments.insert_one(comment)
     await database.discussions.update_one(
         {"id": discussion_id},
         {
-            "$push": {"comments": comment},
-            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+            "$inc": {"comment_count": 1},
+            "$max": {"last_comment_at": comment["created_at"]},
+            "$set": {"updated_at": utcnow()}
         }
     )
+    await collection_versions.bump(database, "discussions")
+    await increment_user_counter(database, current_user.id, "comments_count")
     
     # Create notification for discussion author
     if discussion_doc["author_id"] != current_user.id:
-        notif = {
-            "id": str(uuid.uuid4()),
-            "user_id": discussion_doc["author_id"],
-            "type": "comment",
-            "title": "Nouveau commentaire",
-            "message": f"{current_user.name} a commenté votre discussion: {discussion_doc['title']}",
-            "link": f"/community",
-            "read": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await database.notifications.insert_one(notif)
+        await notify_user(
+            database,
+            discussion_doc["author_id"],
+            type="comment",
+            title="Nouveau commentaire",
+            message=f"{current_user.name} a commenté votre discussion: {discussion_doc['title']}",
+            link="/community"
+        )
     
-    comment['created_at'] = datetime.fromisoformat(comment['created_at'])
     return Comment(**comment)
 
 
@@ -719,132 +856,229 @@ async def add_comment(
 # QUIZ ROUTES
 # ============================================================================
 
-@api_router.get("/quizzes", response_model=List[Quiz])
+@api_router.get("/quizzes", response_model=Page[QuizSummary])
 async def get_quizzes(
+    request: Request,
+    response: Response,
     subject_id: Optional[str] = Query(None),
-    limit: int = Query(50, le=100),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = FIELDS_QUERY,
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get all quizzes"""
+    """Get quizzes, newest first (paginate with next_cursor)"""
+    not_modified = await check_collections(request, response, database, "quizzes")
+    if not_modified:
+        return not_modified
+    
     query = {}
     if subject_id:
         query["subject_id"] = subject_id
     
-    quizzes = await database.quizzes.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(None)
-    
-    for quiz in quizzes:
-        if isinstance(quiz.get('created_at'), str):
-            quiz['created_at'] = datetime.fromisoformat(quiz['created_at'])
-        if isinstance(quiz.get('updated_at'), str):
-            quiz['updated_at'] = datetime.fromisoformat(quiz['updated_at'])
+    shape = QUIZ_SHAPE.only(fields)
+    quizzes = await database.quizzes.find(
+        apply_cursor(query, cursor), shape.projection
+    ).sort(KEYSET_SORT).limit(limit + 1).to_list(None)
+    quizzes, next_cursor = paginate(quizzes, limit)
     
-    return quizzes
+    return page_response(shape, quizzes, next_cursor, response)
 
 
-@api_router.post("/quizzes", response_model=Quiz, status_code=status.HTTP_201_CREATED)
-async def create_quiz(
-    quiz_data: QuizCreate,
-    current_user: User = Depends(get_current_user_dep),
-    database: AsyncIOMotorDatabase = Depends(get_db)
-):
-    """Create a new quiz"""
-    subject = await database.subjects.find_one({"id": quiz_data.subject_id})
-    subject_name = subject["name"] if subject else None
-    
-    quiz_doc = {
+def quiz_document(quiz_data: QuizCreate, author: User, subject: Optional[dict]) -> dict:
+    """New quiz document"""
+    return {
         "id": str(uuid.uuid4()),
         "title": quiz_data.title,
         "subject_id": quiz_data.subject_id,
-        "subject_name": subject_name,
-        "author_id": current_user.id,
-        "author_name": current_user.name,
+        "subject_name": subject["name"] if subject else None,
+        "author_id": author.id,
+        "author_name": author.name,
         "questions": [q.model_dump() for q in quiz_data.questions],
+        "question_count": len(quiz_data.questions),
         "duration": quiz_data.duration,
         "difficulty": quiz_data.difficulty,
         "attempts": 0,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow(),
+        "updated_at": utcnow()
     }
+
+
+@api_router.post("/quizzes", response_model=Quiz, status_code=status.HTTP_201_CREATED)
+async def create_quiz(
+    quiz_data: QuizCreate,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Create a new quiz"""
+    subject = await subject_catalog.get(database, quiz_data.subject_id)
+    quiz_doc = quiz_document(quiz_data, current_user, subject)
     
     await database.quizzes.insert_one(quiz_doc)
+    await collection_versions.bump(database, "quizzes")
+    statistics_service.adjust("quizzes")
+    await publish_to_timelines(database, current_user, "quiz", [quiz_doc])
+    
+    # Broadcast to all users (stored once, merged into each feed on read)
+    await publish_event(
+        database,
+        current_user,
+        type="quiz",
+        title="Nouveau quiz",
+        message=f"{current_user.name} a créé un quiz: {quiz_data.title}",
+        link="/quiz"
+    )
     
-    # Notify users
-    users = await database.users.find({"id": {"$ne": current_user.id}}, {"_id": 0, "id": 1}).to_list(None)
-    notifications = []
-    for user in users:
-        notif = {
-            "id": str(uuid.uuid4()),
-            "user_id": user["id"],
-            "type": "quiz",
-            "title": "Nouveau quiz",
-            "message": f"{current_user.name} a créé un quiz: {quiz_data.title}",
-            "link": f"/quiz",
-            "read": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        notifications.append(notif)
-    
-    if notifications:
-        await database.notifications.insert_many(notifications)
-    
-    quiz_doc['created_at'] = datetime.fromisoformat(quiz_doc['created_at'])
-    quiz_doc['updated_at'] = datetime.fromisoformat(quiz_doc['updated_at'])
     return Quiz(**quiz_doc)
 
 
-@api_router.get("/quizzes/{quiz_id}", response_model=Quiz)
+@api_router.post("/quizzes/bulk", response_model=BulkResult)
+async def create_quizzes_bulk(
+    request: Request,
+    ordered: bool = BULK_ORDERED_QUERY,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Create quizzes from a JSON array or NDJSON stream of QuizCreate"""
+    valid, errors = validate_items(await read_items(request), QuizCreate)
+    subjects = await bulk_subjects(database, valid)
+    docs = [
+        (index, quiz_document(quiz_data, current_user, subjects[quiz_data.subject_id]))
+        for index, quiz_data in valid
+    ]
+    
+    inserted, insert_errors = await insert_items(database.quizzes, docs, ordered, errors)
+    if inserted:
+        await collection_versions.bump(database, "quizzes")
+        statistics_service.adjust("quizzes", len(inserted))
+        await publish_to_timelines(database, current_user, "quiz", [doc for _, doc in inserted])
+        
+        # One event for the whole batch
+        await publish_event(
+            database,
+            current_user,
+            type="quiz",
+            title="Nouveaux quiz",
+            message=f"{current_user.name} a créé {len(inserted)} quiz",
+            link="/quiz"
+        )
+    
+    return bulk_result(inserted, errors + insert_errors)
+
+
+@api_router.get("/quizzes/{quiz_id}", response_model=QuizPublic)
 async def get_quiz(quiz_id: str, database: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get quiz by ID"""
+    """Get quiz by ID (answers are only revealed by an attempt)"""
     quiz_doc = await database.quizzes.find_one({"id": quiz_id}, {"_id": 0})
     if not quiz_doc:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    if isinstance(quiz_doc.get('created_at'), str):
-        quiz_doc['created_at'] = datetime.fromisoformat(quiz_doc['created_at'])
-    if isinstance(quiz_doc.get('updated_at'), str):
-        quiz_doc['updated_at'] = datetime.fromisoformat(quiz_doc['updated_at'])
-    
-    return Quiz(**quiz_doc)
+    return QuizPublic(**quiz_doc)
 
 
-@api_router.post("/quizzes/{quiz_id}/attempt")
+@api_router.post("/quizzes/{quiz_id}/attempt", response_model=QuizAttempt, status_code=status.HTTP_201_CREATED)
 async def attempt_quiz(
+    quiz_id: str,
+    attempt_data: QuizAttemptCreate,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Submit answers to a quiz; returns the score with the correct answers"""
+    quiz_doc = await database.quizzes.find_one({"id": quiz_id}, {"_id": 0, "id": 1, "questions": 1})
+    if not quiz_doc:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    attempt_doc = await record_attempt(
+        database, quiz_doc, current_user.id, attempt_data.answers, attempt_data.duration_seconds
+    )
+    # No version bump: attempts are the busiest write, and invalidating every quiz ETag on each
+    # one would defeat conditional GETs. Attempt counts in cached lists refresh on the next quiz write.
+    return QuizAttempt(**attempt_doc)
+
+
+@api_router.get("/quizzes/{quiz_id}/attempts", response_model=Page[QuizAttempt])
+async def get_my_attempts(
+    quiz_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Current user's attempts at a quiz, newest first"""
+    query = {"quiz_id": quiz_id, "user_id": current_user.id}
+    attempts = await database.quiz_attempts.find(
+        apply_cursor(query, cursor), ATTEMPT_SHAPE.projection
+    ).sort(KEYSET_SORT).limit(limit + 1).to_list(None)
+    attempts, next_cursor = paginate(attempts, limit)
+    
+    return page_response(ATTEMPT_SHAPE, attempts, next_cursor)
+
+
+@api_router.get("/quizzes/{quiz_id}/stats", response_model=QuizStatistics)
+async def get_quiz_stats(
     quiz_id: str,
     current_user: User = Depends(get_current_user_dep),
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Record a quiz attempt"""
-    await database.quizzes.update_one(
-        {"id": quiz_id},
-        {"$inc": {"attempts": 1}}
+    """Per-question analytics of a quiz (author or admin)"""
+    quiz_doc = await database.quizzes.find_one(
+        {"id": quiz_id}, {"_id": 0, "id": 1, "author_id": 1, "questions.options": 1}
     )
-    return {"message": "Attempt recorded"}
+    if not quiz_doc:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if quiz_doc["author_id"] != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized to view these statistics")
+    
+    stats_doc = await database.quiz_stats.find_one({"quiz_id": quiz_id}, {"_id": 0})
+    return QuizStatistics(**build_statistics(quiz_doc, stats_doc))
 
 
 # ============================================================================
 # FLASHCARD ROUTES
 # ============================================================================
 
-@api_router.get("/flashcards", response_model=List[Flashcard])
+@api_router.get("/flashcards", response_model=Page[FlashcardSummary])
 async def get_flashcards(
+    request: Request,
+    response: Response,
     subject_id: Optional[str] = Query(None),
-    limit: int = Query(50, le=100),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = FIELDS_QUERY,
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get all flashcards"""
+    """Get flashcard sets, newest first (paginate with next_cursor)"""
+    not_modified = await check_collections(request, response, database, "flashcards")
+    if not_modified:
+        return not_modified
+    
     query = {}
     if subject_id:
         query["subject_id"] = subject_id
     
-    flashcards = await database.flashcards.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(None)
+    shape = FLASHCARD_SHAPE.only(fields)
+    flashcards = await database.flashcards.find(
+        apply_cursor(query, cursor), shape.projection
+    ).sort(KEYSET_SORT).limit(limit + 1).to_list(None)
+    flashcards, next_cursor = paginate(flashcards, limit)
     
-    for flashcard in flashcards:
-        if isinstance(flashcard.get('created_at'), str):
-            flashcard['created_at'] = datetime.fromisoformat(flashcard['created_at'])
-        if isinstance(flashcard.get('updated_at'), str):
-            flashcard['updated_at'] = datetime.fromisoformat(flashcard['updated_at'])
-    
-    return flashcards
+    return page_response(shape, flashcards, next_cursor, response)
+
+
+def flashcard_document(flashcard_data: FlashcardCreate, author: User, subject: Optional[dict]) -> dict:
+    """New flashcard set document"""
+    return {
+        "id": str(uuid.uuid4()),
+        "title": flashcard_data.title,
+        "subject_id": flashcard_data.subject_id,
+        "subject_name": subject["name"] if subject else None,
+        "author_id": author.id,
+        "author_name": author.name,
+        "cards": [card.model_dump() for card in flashcard_data.cards],
+        "card_count": len(flashcard_data.cards),
+        "views": 0,
+        "created_at": utcnow(),
+        "updated_at": utcnow()
+    }
 
 
 @api_router.post("/flashcards", response_model=Flashcard, status_code=status.HTTP_201_CREATED)
@@ -854,46 +1088,98 @@ async def create_flashcard(
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Create a new flashcard set"""
-    subject = await database.subjects.find_one({"id": flashcard_data.subject_id})
-    subject_name = subject["name"] if subject else None
-    
-    flashcard_doc = {
-        "id": str(uuid.uuid4()),
-        "title": flashcard_data.title,
-        "subject_id": flashcard_data.subject_id,
-        "subject_name": subject_name,
-        "author_id": current_user.id,
-        "author_name": current_user.name,
-        "cards": [card.model_dump() for card in flashcard_data.cards],
-        "views": 0,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
-    }
+    subject = await subject_catalog.get(database, flashcard_data.subject_id)
+    flashcard_doc = flashcard_document(flashcard_data, current_user, subject)
     
     await database.flashcards.insert_one(flashcard_doc)
+    await collection_versions.bump(database, "flashcards")
+    statistics_service.adjust("flashcards")
+    await publish_to_timelines(database, current_user, "flashcard", [flashcard_doc])
+    
+    # Broadcast to all users (stored once, merged into each feed on read)
+    await publish_event(
+        database,
+        current_user,
+        type="flashcard",
+        title="Nouvelles flashcards",
+        message=f"{current_user.name} a créé des flashcards: {flashcard_data.title}",
+        link="/flashcards"
+    )
     
-    # Notify users
-    users = await database.users.find({"id": {"$ne": current_user.id}}, {"_id": 0, "id": 1}).to_list(None)
-    notifications = []
-    for user in users:
-        notif = {
-            "id": str(uuid.uuid4()),
-            "user_id": user["id"],
-            "type": "flashcard",
-            "title": "Nouvelles flashcards",
-            "message": f"{current_user.name} a créé des flashcards: {flashcard_data.title}",
-            "link": f"/flashcards",
-            "read": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        notifications.append(notif)
+    return Flashcard(**flashcard_doc)
+
+
+@api_router.post("/flashcards/bulk", response_model=BulkResult)
+async def create_flashcards_bulk(
+    request: Request,
+    ordered: bool = BULK_ORDERED_QUERY,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Create flashcard sets from a JSON array or NDJSON stream of FlashcardCreate"""
+    valid, errors = validate_items(await read_items(request), FlashcardCreate)
+    subjects = await bulk_subjects(database, valid)
+    docs = [
+        (index, flashcard_document(flashcard_data, current_user, subjects[flashcard_data.subject_id]))
+        for index, flashcard_data in valid
+    ]
+    
+    inserted, insert_errors = await insert_items(database.flashcards, docs, ordered, errors)
+    if inserted:
+        await collection_versions.bump(database, "flashcards")
+        statistics_service.adjust("flashcards", len(inserted))
+        await publish_to_timelines(database, current_user, "flashcard", [doc for _, doc in inserted])
+        
+        # One event for the whole batch
+        await publish_event(
+            database,
+            current_user,
+            type="flashcard",
+            title="Nouvelles flashcards",
+            message=f"{current_user.name} a créé {len(inserted)} série(s) de flashcards",
+            link="/flashcards"
+        )
     
-    if notifications:
-        await database.notifications.insert_many(notifications)
+    return bulk_result(inserted, errors + insert_errors)
+
+
+@api_router.get("/flashcards/due", response_model=List[ScheduledCard])
+async def get_due_cards(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Current user's cards due for review across all sets, most overdue first"""
+    cards = await due_cards(database, current_user.id, limit)
+    return FastJSONResponse([SCHEDULED_CARD_SHAPE.dump(card) for card in cards])
+
+
+@api_router.post("/flashcards/reviews", response_model=List[ScheduledCard])
+async def review_cards(
+    batch: CardReviewBatch,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Grade a review session's cards in one batch; returns their new schedule"""
+    cards = await grade_reviews(database, current_user.id, [r.model_dump() for r in batch.reviews])
+    return FastJSONResponse([SCHEDULED_CARD_SHAPE.dump(card) for card in cards])
+
+
+@api_router.post("/flashcards/{flashcard_id}/study")
+async def study_flashcard(
+    flashcard_id: str,
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Add a set's cards to the current user's review schedule"""
+    flashcard_doc = await database.flashcards.find_one(
+        {"id": flashcard_id}, {"_id": 0, "id": 1, "title": 1, "cards": 1}
+    )
+    if not flashcard_doc:
+        raise HTTPException(status_code=404, detail="Flashcard not found")
     
-    flashcard_doc['created_at'] = datetime.fromisoformat(flashcard_doc['created_at'])
-    flashcard_doc['updated_at'] = datetime.fromisoformat(flashcard_doc['updated_at'])
-    return Flashcard(**flashcard_doc)
+    added = await enroll(database, current_user.id, flashcard_doc)
+    return {"message": "Cards scheduled", "added": added}
 
 
 @api_router.get("/flashcards/{flashcard_id}", response_model=Flashcard)
@@ -903,42 +1189,131 @@ async def get_flashcard(flashcard_id: str, database: AsyncIOMotorDatabase = Depe
     if not flashcard_doc:
         raise HTTPException(status_code=404, detail="Flashcard not found")
     
-    # Increment views
-    await database.flashcards.update_one(
-        {"id": flashcard_id},
-        {"$inc": {"views": 1}}
-    )
-    flashcard_doc['views'] = flashcard_doc.get('views', 0) + 1
-    
-    if isinstance(flashcard_doc.get('created_at'), str):
-        flashcard_doc['created_at'] = datetime.fromisoformat(flashcard_doc['created_at'])
-    if isinstance(flashcard_doc.get('updated_at'), str):
-        flashcard_doc['updated_at'] = datetime.fromisoformat(flashcard_doc['updated_at'])
+    # Buffered and flushed in batches; the response does not wait on the write
+    view_counter.record("flashcards", flashcard_id)
+    flashcard_doc['views'] = flashcard_doc.get('views', 0) + view_counter.pending("flashcards", flashcard_id)
     
     return Flashcard(**flashcard_doc)
 
 
+# ============================================================================
+# FILE ROUTES
+# ============================================================================
+
+@api_router.get("/files/{sha256}")
+async def get_file(sha256: str, request: Request, database: AsyncIOMotorDatabase = Depends(get_db)):
+    """Serve an uploaded file (supports Range requests)"""
+    blob = await database.blobs.find_one({"id": sha256}) if SHA256_PATTERN.match(sha256) else None
+    if blob is None or not blob_path(sha256).exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return file_response(request, blob_path(sha256), blob["content_type"], f'"{sha256}"', blob.get("filename"))
+
+
+@api_router.get("/files/{sha256}/thumbnail")
+async def get_thumbnail(sha256: str, request: Request):
+    """Serve the thumbnail of an uploaded file"""
+    if not SHA256_PATTERN.match(sha256) or not thumbnail_path(sha256).exists():
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    
+    return file_response(request, thumbnail_path(sha256), "image/jpeg", f'"{sha256}-thumbnail"')
+
+
+# ============================================================================
+# FEED ROUTES
+# ============================================================================
+
+@api_router.get("/feed", response_model=Page[FeedItem])
+async def get_feed(
+    audience: Optional[str] = Query(
+        None, description="Read one timeline, e.g. global, faculty:<name> or subject:<id>"
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: Optional[User] = Depends(get_optional_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Home feed: newest content from the caller's audiences (global when anonymous)"""
+    if audience:
+        keys = [audience]
+    else:
+        keys = user_audiences(current_user) if current_user else ["global"]
+    
+    items, next_cursor = await read_feed(database, keys, cursor, limit, FEED_PROJECTIONS)
+    
+    resource_ids = [doc["id"] for doc_type, doc in items if doc_type == "resource"]
+    liked = await liked_ids(database, current_user.id, resource_ids) if current_user else set()
+    for doc_type, doc in items:
+        if doc_type == "resource":
+            doc["liked_by_me"] = doc["id"] in liked
+    
+    return FastJSONResponse({
+        "items": [{"type": doc_type, "item": FEED_SHAPES[doc_type].dump(doc)} for doc_type, doc in items],
+        "next_cursor": next_cursor
+    })
+
+
 # ============================================================================
 # NOTIFICATION ROUTES
 # ============================================================================
 
-@api_router.get("/notifications", response_model=List[Notification])
+@api_router.get("/notifications", response_model=Page[Notification])
 async def get_notifications(
     current_user: User = Depends(get_current_user_dep),
-    limit: int = Query(50, le=100),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Get current user's notifications"""
-    notifications = await database.notifications.find(
-        {"user_id": current_user.id},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(limit).to_list(None)
-    
-    for notif in notifications:
-        if isinstance(notif.get('created_at'), str):
-            notif['created_at'] = datetime.fromisoformat(notif['created_at'])
+    """Get current user's notifications (targeted notifications merged with audience events)"""
+    notifications = await list_notifications(database, current_user, limit + 1, cursor)
+    notifications, next_cursor = paginate(notifications, limit)
     
-    return notifications
+    return {"items": notifications, "next_cursor": next_cursor}
+
+
+@api_router.post("/notifications/stream-ticket")
+async def create_notification_stream_ticket(
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Exchange the bearer token for a single-use ticket opening the notification stream"""
+    ticket = await create_stream_ticket(database, current_user)
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL}
+
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    ticket: str = Query(...),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    last_event_id_param: Optional[str] = Query(None, alias="last_event_id"),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Push new notifications as server-sent events, resuming after Last-Event-ID"""
+    # A reconnect with a fresh ticket is a new EventSource, which can only pass its position in the URL
+    last_event_id = last_event_id or last_event_id_param
+    user_id = await redeem_stream_ticket(database, ticket)
+    user_doc = await database.users.find_one({"id": user_id}, {"_id": 0}) if user_id else None
+    if user_doc is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired stream ticket")
+    current_user = User(**user_doc)
+    if last_event_id:
+        decode_cursor(last_event_id)
+    
+    return StreamingResponse(
+        notification_stream(database, current_user, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api_router.put("/notifications/read-all")
+async def mark_all_notifications_read(
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Mark every notification as read"""
+    await mark_all_read(database, current_user)
+    return {"message": "All notifications marked as read"}
 
 
 @api_router.put("/notifications/{notification_id}/read")
@@ -948,12 +1323,7 @@ async def mark_notification_read(
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Mark notification as read"""
-    result = await database.notifications.update_one(
-        {"id": notification_id, "user_id": current_user.id},
-        {"$set": {"read": True}}
-    )
-    
-    if result.matched_count == 0:
+    if not await mark_read(database, current_user, notification_id):
         raise HTTPException(status_code=404, detail="Notification not found")
     
     return {"message": "Notification marked as read"}
@@ -966,38 +1336,114 @@ async def delete_notification(
     database: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Delete a notification"""
-    result = await database.notifications.delete_one(
-        {"id": notification_id, "user_id": current_user.id}
-    )
-    
-    if result.deleted_count == 0:
+    if not await dismiss(database, current_user, notification_id):
         raise HTTPException(status_code=404, detail="Notification not found")
     
     return None
 
 
+# ============================================================================
+# SEARCH ROUTES
+# ============================================================================
+
+@api_router.get("/search", response_model=SearchResults)
+async def search_content(
+    q: str = Query(..., min_length=1),
+    type: Optional[str] = Query(None, pattern="^(resource|discussion)$"),
+    subject_id: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Full-text search over resources and discussions, ranked by relevance"""
+    total, hits = search_index.search(
+        q,
+        doc_types=[type] if type else None,
+        subject_id=subject_id,
+        offset=skip,
+        limit=limit
+    )
+    
+    # Hydrate the page with one $in query per collection
+    docs = {}
+    for doc_type, (collection, body_field) in SEARCH_FIELDS.items():
+        ids = [doc_id for _, hit_type, doc_id in hits if hit_type == doc_type]
+        if not ids:
+            continue
+        projection = {"_id": 0, "id": 1, "title": 1, body_field: 1, "subject_id": 1, "author_name": 1, "created_at": 1}
+        async for doc in database[collection].find({"id": {"$in": ids}}, projection):
+            doc["excerpt"] = (doc.pop(body_field, None) or "")[:200] or None
+            docs[(doc_type, doc["id"])] = doc
+    
+    results = []
+    for score, doc_type, doc_id in hits:
+        doc = docs.get((doc_type, doc_id))
+        if doc is None:
+            # Deleted by another worker since it was indexed
+            continue
+        results.append(SearchResult(type=doc_type, score=round(score, 4), **doc))
+    
+    return SearchResults(
+        query=q,
+        total=total,
+        results=results,
+        next_skip=skip + limit if skip + limit < total else None
+    )
+
+
 # ============================================================================
 # STATISTICS ROUTES
 # ============================================================================
 
 @api_router.get("/statistics", response_model=Statistics)
-async def get_statistics(database: AsyncIOMotorDatabase = Depends(get_db)):
+async def get_statistics(request: Request, response: Response, database: AsyncIOMotorDatabase = Depends(get_db)):
     """Get platform statistics"""
-    total_users = await database.users.count_documents({})
-    total_resources = await database.resources.count_documents({})
-    total_discussions = await database.discussions.count_documents({})
-    total_quizzes = await database.quizzes.count_documents({})
-    total_flashcards = await database.flashcards.count_documents({})
-    total_subjects = await database.subjects.count_documents({})
-    
-    return Statistics(
-        total_users=total_users,
-        total_resources=total_resources,
-        total_discussions=total_discussions,
-        total_quizzes=total_quizzes,
-        total_flashcards=total_flashcards,
-        total_subjects=total_subjects
-    )
+    # Tagged with the totals served: they lag the collection versions by up to a sync interval
+    etag, statistics = await statistics_service.snapshot(database)
+    not_modified = check_validators(request, response, etag, None)
+    if not_modified:
+        return not_modified
+    
+    return statistics
+
+
+# ============================================================================
+# ADMIN ROUTES
+# ============================================================================
+
+@api_router.post("/admin/reconcile-counters", status_code=status.HTTP_202_ACCEPTED)
+async def reconcile_counters(
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Queue a rebuild of every user's profile counters"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job_id = await enqueue_job(database, "reconcile_user_counters", {})
+    return {"message": "Reconciliation queued", "job_id": job_id}
+
+
+@api_router.post("/admin/collect-blobs", status_code=status.HTTP_202_ACCEPTED)
+async def collect_unreferenced_blobs(
+    current_user: User = Depends(get_current_user_dep),
+    database: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Queue deletion of uploaded files no resource references anymore"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job_id = await enqueue_job(database, "collect_blobs", {})
+    return {"message": "Blob collection queued", "job_id": job_id}
+
+
+@api_router.get("/admin/password-pool")
+async def get_password_pool_metrics(current_user: User = Depends(get_current_user_dep)):
+    """Queueing metrics of the password hashing pool"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return password_pool.metrics()
 
 
 # ============================================================================
@@ -1013,6 +1459,16 @@ async def health_check():
 # Include the router in the main app
 app.include_router(api_router)
 
+# Built frontend, when served by the API (run `python compression.py <dir>` after each build)
+STATIC_DIR = Path(os.environ.get('STATIC_DIR', ROOT_DIR.parent / 'frontend' / 'build'))
+if STATIC_DIR.is_dir():
+    app.mount("/", PrecompressedStaticFiles(directory=STATIC_DIR, html=True), name="static")
+
+app.add_middleware(ETagMiddleware)
+
+# Outside ETagMiddleware, so ETags are computed on the identity body
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1028,7 +1484,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Long-running tasks started with the app and cancelled on shutdown
+background_tasks: List[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def apply_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception:
+        logger.exception("Index bootstrap failed; run `python indexes.py` once MongoDB is reachable")
+
+
+@app.on_event("startup")
+async def load_subjects():
+    try:
+        count = await subject_catalog.load(db)
+        logger.info("Subjects catalog loaded (%d subjects)", count)
+    except Exception:
+        logger.exception("Subjects catalog load failed; it will be retried on first use")
+    background_tasks.append(asyncio.create_task(subject_catalog.run(db)))
+
+
+@app.on_event("startup")
+async def build_search_index():
+    try:
+        count = await sync_search_index(db)
+        logger.info("Search index built (%d documents)", count)
+    except Exception:
+        logger.exception("Search index build failed; it will be retried by the sync loop")
+    background_tasks.append(asyncio.create_task(search_sync_loop(db)))
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    start_workers(db)
+    background_tasks.append(asyncio.create_task(view_counter.run(db)))
+    background_tasks.append(asyncio.create_task(statistics_service.run(db)))
+    background_tasks.append(asyncio.create_task(blob_gc_loop(db)))
+
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await stop_workers()
+    await view_counter.flush(db)
+    password_pool.shutdown()
+    shutdown_thumbnail_pool()
     client.close()
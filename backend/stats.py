@@ -0,0 +1,85 @@
+"""
+Platform statistics kept in memory.
+
+The totals are loaded with `estimated_document_count` (collection metadata, no
+scan), adjusted by the create/delete handlers of this process and re-synced by
+a background task, so a request never counts anything. Writes made by other
+workers show up within STATISTICS_SYNC_INTERVAL seconds; a request that finds
+the totals older than STATISTICS_MAX_STALENESS (the sync task stalled or has
+not run yet) re-syncs inline before answering. The route's ETag hashes the
+totals it returns, so a client revalidating against a worker that has not
+synced yet is answered with that worker's totals rather than a 304.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from conditional import make_etag
+from models import Statistics
+
+logger = logging.getLogger(__name__)
+
+STATISTICS_SYNC_INTERVAL = float(os.environ.get("STATISTICS_SYNC_INTERVAL", "60"))
+STATISTICS_MAX_STALENESS = float(os.environ.get("STATISTICS_MAX_STALENESS", "300"))
+
+# Statistics field -> collection it counts
+STATISTICS_COLLECTIONS = {
+    "total_users": "users",
+    "total_resources": "resources",
+    "total_discussions": "discussions",
+    "total_quizzes": "quizzes",
+    "total_flashcards": "flashcards",
+    "total_subjects": "subjects",
+}
+
+
+class StatisticsService:
+    """Document counts per collection, adjusted incrementally between syncs"""
+
+    def __init__(self, max_staleness: float = STATISTICS_MAX_STALENESS):
+        self.max_staleness = max_staleness
+        self._counts: Dict[str, int] = {}
+        self._synced_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def adjust(self, collection: str, amount: int = 1) -> None:
+        """Apply a local create (+1) or delete (-1) until the next sync"""
+        if collection in self._counts:
+            self._counts[collection] = max(0, self._counts[collection] + amount)
+
+    async def sync(self, database: AsyncIOMotorDatabase) -> None:
+        """Reload every total from collection metadata"""
+        async with self._lock:
+            collections = list(STATISTICS_COLLECTIONS.values())
+            counts = await asyncio.gather(*(database[c].estimated_document_count() for c in collections))
+            self._counts = dict(zip(collections, counts))
+            self._synced_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        return self._synced_at is None or time.monotonic() - self._synced_at > self.max_staleness
+
+    async def get(self, database: AsyncIOMotorDatabase) -> Statistics:
+        if self.is_stale():
+            await self.sync(database)
+        return Statistics(**{field: self._counts.get(c, 0) for field, c in STATISTICS_COLLECTIONS.items()})
+
+    async def snapshot(self, database: AsyncIOMotorDatabase) -> Tuple[str, Statistics]:
+        """(ETag, totals) of the totals this process serves"""
+        statistics = await self.get(database)
+        return make_etag(statistics.model_dump()), statistics
+
+    async def run(self, database: AsyncIOMotorDatabase, interval: float = STATISTICS_SYNC_INTERVAL) -> None:
+        """Periodically pick up writes from other workers and correct drift"""
+        while True:
+            try:
+                await self.sync(database)
+            except Exception:
+                logger.exception("Statistics sync failed")
+            await asyncio.sleep(interval)
+
+
+statistics_service = StatisticsService()
@@ -0,0 +1,102 @@
+"""
+Process-wide cache of the subjects catalog.
+
+Subjects are a small, almost static collection, so the whole catalog is loaded
+at startup and lookups and the list route are served from memory. Subjects
+created by this process are added directly. Changes made elsewhere (another
+worker, init_db) are picked up from a MongoDB change stream, or, when the
+server does not support change streams (standalone mongod), by polling the
+`subjects` collection version every SUBJECTS_POLL_INTERVAL seconds. A lookup
+that misses falls back to the database, so a subject created moments ago on
+another worker is never rejected. The list route reloads the catalog first
+when the collection version has moved past the one it loaded, and tags its
+response with a hash of the catalog it actually serves, so a lagging worker
+can never hand out an old list under a new ETag.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from conditional import collection_versions, make_etag
+
+logger = logging.getLogger(__name__)
+
+SUBJECTS_POLL_INTERVAL = float(os.environ.get("SUBJECTS_POLL_INTERVAL", "30"))
+
+
+class SubjectCatalog:
+    """In-memory copy of the subjects collection, keyed by id"""
+
+    def __init__(self):
+        self._subjects: Dict[str, Dict[str, Any]] = {}
+        self._version: Optional[int] = None
+        self._etag: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._subjects)
+
+    async def load(self, database: AsyncIOMotorDatabase) -> int:
+        """Replace the cache with the current collection; returns the number of subjects"""
+        versions = await collection_versions.get(database, ["subjects"])
+        docs = await database.subjects.find({}, {"_id": 0}).to_list(None)
+        self._subjects = {doc["id"]: doc for doc in docs}
+        self._version = versions["subjects"][0]
+        self._etag = None
+        return len(docs)
+
+    def add(self, subject_doc: Dict[str, Any]) -> None:
+        self._subjects[subject_doc["id"]] = {k: v for k, v in subject_doc.items() if k != "_id"}
+        self._etag = None
+
+    async def snapshot(self, database: AsyncIOMotorDatabase) -> Tuple[str, List[Dict[str, Any]]]:
+        """(ETag, every subject), reloading first when the collection has changed since the last load"""
+        versions = await collection_versions.get(database, ["subjects"])
+        if self._version is None or versions["subjects"][0] != self._version:
+            await self.load(database)
+        subjects = list(self._subjects.values())
+        if self._etag is None:
+            self._etag = make_etag(subjects)
+        return self._etag, subjects
+
+    async def get(self, database: AsyncIOMotorDatabase, subject_id: str) -> Optional[Dict[str, Any]]:
+        """Subject by id from memory, falling back to the database on a miss"""
+        subject = self._subjects.get(subject_id)
+        if subject is None:
+            subject = await database.subjects.find_one({"id": subject_id}, {"_id": 0})
+            if subject is not None:
+                self.add(subject)
+        return subject
+
+    async def _watch(self, database: AsyncIOMotorDatabase) -> None:
+        async with database.subjects.watch() as stream:
+            # Anything written between the initial load and the stream opening
+            await self.load(database)
+            async for _ in stream:
+                await self.load(database)
+
+    async def _poll(self, database: AsyncIOMotorDatabase, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                versions = await collection_versions.get(database, ["subjects"])
+                if self._version is None or versions["subjects"][0] != self._version:
+                    await self.load(database)
+            except Exception:
+                logger.exception("Subjects catalog refresh failed")
+
+    async def run(self, database: AsyncIOMotorDatabase, interval: float = SUBJECTS_POLL_INTERVAL) -> None:
+        """Keep the cache in sync with writes from other processes"""
+        try:
+            await self._watch(database)
+        except OperationFailure as exc:
+            logger.info("Change streams unavailable (%s); polling subjects every %ss", exc, interval)
+        except (PyMongoError, NotImplementedError):
+            logger.exception("Subjects change stream failed; falling back to polling")
+        await self._poll(database, interval)
+
+
+subject_catalog = SubjectCatalog()
@@ -0,0 +1,557 @@
+"""
+Streaming file uploads.
+
+`POST /resources/upload` takes the file itself as the request body (its
+Content-Type set to the file's type). The body is streamed to a temporary
+file in UPLOAD_CHUNK_SIZE pieces while its SHA-256 is computed, so memory
+stays flat whatever the file size. The finished file is renamed to
+`blobs/<sha[:2]>/<sha>` under UPLOAD_DIR: identical uploads share one file,
+described by one `blobs` document.
+
+Each blob counts the resources whose file_url points at it (`refs`). A blob
+nobody references records when that started (`unreferenced_at`) and is
+deleted, file and thumbnail included, once BLOB_GC_GRACE_SECONDS have passed;
+the grace period leaves time to create the resource after uploading. The
+collector marks a blob `deleting` and moves its files aside before deleting
+the document; an upload or a new reference arriving meanwhile revives the
+blob, and the collector then puts the files back. A client that hashes the
+file first can ask `POST /resources/upload/check` whether the content is
+already stored and skip the transfer.
+
+Thumbnails (images, PDF first pages, video frames) are rendered by an outbox
+job in a small process pool, keeping CPU-heavy decoding off the event loop
+and out of the API process's GIL. Files are served with long-lived immutable
+caching (the URL is the content hash) and single-range requests, which video
+seeking relies on. They share the app's origin, so only INLINE_TYPES are
+rendered by the browser; anything else is sent as an attachment, and every
+file response is sandboxed and never content-sniffed.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+
+from conditional import collection_versions
+from jobs import enqueue_job, job_handler
+from mongo import utcnow
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency, image and PDF thumbnails are skipped without it
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # optional dependency, PDF thumbnails are skipped without it
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", Path(__file__).parent / "uploads"))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(250 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_SIZE = (480, 480)
+BLOB_GC_GRACE_SECONDS = int(os.environ.get("BLOB_GC_GRACE_SECONDS", str(24 * 3600)))
+BLOB_GC_INTERVAL = float(os.environ.get("BLOB_GC_INTERVAL", "3600"))
+BLOB_GC_BATCH_SIZE = int(os.environ.get("BLOB_GC_BATCH_SIZE", "500"))
+
+# Content types accepted for upload, by prefix
+UPLOAD_ALLOWED_TYPES = (
+    "application/pdf",
+    "image/",
+    "video/",
+    "audio/",
+    "text/",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.",
+    "application/vnd.ms-",
+    "application/vnd.oasis.opendocument.",
+    "application/zip",
+)
+# Types a browser would run script from, refused even when a prefix above matches
+UPLOAD_REJECTED_TYPES = ("text/html", "text/xml", "image/svg+xml", "application/xhtml+xml")
+
+# Types served inline with their own Content-Type; everything else is a download.
+# Media elements need the real type to play, and do not run script.
+INLINE_TYPES = ("application/pdf", "image/png", "image/jpeg", "image/webp", "text/plain")
+INLINE_TYPE_PREFIXES = ("video/", "audio/")
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+FILE_URL_PATTERN = re.compile(r"/api/files/([0-9a-f]{64})$")
+
+_thumbnail_pool: Optional[ProcessPoolExecutor] = None
+
+
+def blob_path(sha256: str) -> Path:
+    return UPLOAD_DIR / "blobs" / sha256[:2] / sha256
+
+
+def thumbnail_path(sha256: str) -> Path:
+    return UPLOAD_DIR / "thumbs" / sha256[:2] / f"{sha256}.jpg"
+
+
+def _trash_paths(sha256: str) -> Tuple[Tuple[Path, Path], ...]:
+    """(file, where the collector moves it) for a blob and its thumbnail"""
+    trash = UPLOAD_DIR / "trash"
+    return (blob_path(sha256), trash / sha256), (thumbnail_path(sha256), trash / f"{sha256}.jpg")
+
+
+def file_url(sha256: str) -> str:
+    return f"/api/files/{sha256}"
+
+
+def thumbnail_url(sha256: str) -> str:
+    return f"/api/files/{sha256}/thumbnail"
+
+
+def blob_id(url: Optional[str]) -> Optional[str]:
+    """Hash of the uploaded blob a file_url points at; None for external URLs"""
+    match = FILE_URL_PATTERN.search(url) if url else None
+    return match.group(1) if match else None
+
+
+def is_thumbnailable(content_type: str) -> bool:
+    return content_type.startswith(("image/", "video/")) or content_type == "application/pdf"
+
+
+def _write_chunk(handle: BinaryIO, hasher: "hashlib._Hash", chunk: bytes) -> None:
+    handle.write(chunk)
+    hasher.update(chunk)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large (max {UPLOAD_MAX_BYTES} bytes)"
+    )
+
+
+async def receive_file(request: Request) -> Tuple[str, int, Path]:
+    """Stream the request body to a temporary file; returns (sha256, size, temp path)"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES:
+        raise _too_large()
+
+    tmp_dir = UPLOAD_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_dir / str(uuid.uuid4())
+    hasher = hashlib.sha256()
+    size = 0
+    pending = bytearray()
+
+    handle = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise _too_large()
+            pending += chunk
+            if len(pending) >= UPLOAD_CHUNK_SIZE:
+                # Disk writes and hashing run in a thread, one chunk at a time
+                await asyncio.to_thread(_write_chunk, handle, hasher, bytes(pending))
+                pending.clear()
+        if pending:
+            await asyncio.to_thread(_write_chunk, handle, hasher, bytes(pending))
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        tmp_path.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(handle.close)
+
+    if size == 0:
+        tmp_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file")
+    return hasher.hexdigest(), size, tmp_path
+
+
+def _commit_file(tmp_path: Path, sha256: str) -> bool:
+    """Move a received file to its content address; False when that content was already stored"""
+    target = blob_path(sha256)
+    if target.exists():
+        tmp_path.unlink(missing_ok=True)
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, target)
+    return True
+
+
+async def store_upload(
+    database: AsyncIOMotorDatabase, request: Request, filename: Optional[str], user_id: str
+) -> Dict[str, Any]:
+    """Receive an uploaded file and record its blob; returns the UploadResult fields"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if not content_type.startswith(UPLOAD_ALLOWED_TYPES) or content_type in UPLOAD_REJECTED_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file type: {content_type or 'none'}"
+        )
+
+    sha256, size, tmp_path = await receive_file(request)
+
+    now = utcnow()
+    new_blob = {
+        "id": sha256,
+        "size": size,
+        "content_type": content_type,
+        "filename": os.path.basename(filename) if filename else None,
+        "uploaded_by": user_id,
+        "thumbnail": "pending" if is_thumbnailable(content_type) else "none",
+        "refs": 0,
+        "unreferenced_at": now,
+        "created_at": now
+    }
+    try:
+        # The document is claimed (or a blob being collected revived) before the file is
+        # committed, so a collection running meanwhile ends up keeping the file
+        previous = await database.blobs.find_one_and_update(
+            {"id": sha256}, {"$setOnInsert": new_blob, "$unset": {"deleting": ""}},
+            upsert=True, return_document=ReturnDocument.BEFORE
+        )
+        if previous is not None:
+            await _restart_grace_period(database, sha256)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(_commit_file, tmp_path, sha256)
+
+    if previous is None:
+        if new_blob["thumbnail"] == "pending":
+            await enqueue_job(database, "generate_thumbnail", {"sha256": sha256})
+        return upload_result(new_blob, existed=False)
+    return upload_result(previous, existed=True)
+
+
+async def find_upload(database: AsyncIOMotorDatabase, sha256: str, size: int) -> Optional[Dict[str, Any]]:
+    """UploadResult fields of already stored content, or None when it has to be uploaded"""
+    blob = await database.blobs.find_one({"id": sha256, "size": size, "deleting": {"$ne": True}})
+    if blob is None or not blob_path(sha256).exists():
+        return None
+    await _restart_grace_period(database, sha256)
+    return upload_result(blob, existed=True)
+
+
+def upload_result(blob: Dict[str, Any], existed: bool) -> Dict[str, Any]:
+    return {
+        "sha256": blob["id"],
+        "size": blob["size"],
+        "content_type": blob["content_type"],
+        "filename": blob.get("filename"),
+        "file_url": file_url(blob["id"]),
+        "thumbnail_url": thumbnail_url(blob["id"]) if blob["thumbnail"] == "ready" else None,
+        "existed": existed,
+    }
+
+
+async def _restart_grace_period(database: AsyncIOMotorDatabase, sha256: str) -> None:
+    # An unreferenced blob handed out again must not be collected before the resource is created
+    await database.blobs.update_one(
+        {"id": sha256, "refs": {"$lte": 0}}, {"$set": {"unreferenced_at": utcnow()}}
+    )
+
+
+# ============================================================================
+# Reference counting
+# ============================================================================
+
+async def _adjust_refs(database: AsyncIOMotorDatabase, file_urls: Iterable[Optional[str]], sign: int) -> None:
+    counts = Counter(sha for sha in map(blob_id, file_urls) if sha)
+    if not counts:
+        return
+    await database.blobs.bulk_write([
+        UpdateOne({"id": sha}, {"$inc": {"refs": sign * count}})
+        for sha, count in counts.items()
+    ], ordered=False)
+    if sign > 0:
+        await database.blobs.update_many(
+            {"id": {"$in": list(counts)}, "refs": {"$gt": 0}}, {"$set": {"unreferenced_at": None}}
+        )
+    else:
+        await database.blobs.update_many(
+            {"id": {"$in": list(counts)}, "refs": {"$lte": 0}, "unreferenced_at": None},
+            {"$set": {"unreferenced_at": utcnow()}}
+        )
+
+
+async def missing_blobs(database: AsyncIOMotorDatabase, file_urls: Iterable[Optional[str]]) -> Set[str]:
+    """Hashes of uploaded-file URLs whose blob does not exist (anymore)"""
+    shas = {sha for sha in map(blob_id, file_urls) if sha}
+    if not shas:
+        return set()
+    found = await database.blobs.find(
+        {"id": {"$in": list(shas)}, "deleting": {"$ne": True}}, {"_id": 0, "id": 1}
+    ).to_list(None)
+    return shas - {blob["id"] for blob in found}
+
+
+async def retain_blobs(database: AsyncIOMotorDatabase, file_urls: Iterable[Optional[str]]) -> None:
+    """Count new references to uploaded blobs (external URLs are ignored)"""
+    await _adjust_refs(database, file_urls, 1)
+
+
+async def release_blobs(database: AsyncIOMotorDatabase, file_urls: Iterable[Optional[str]]) -> None:
+    """Drop references to uploaded blobs; unreferenced ones become collectable after the grace period"""
+    await _adjust_refs(database, file_urls, -1)
+
+
+def _trash_files(sha256: str) -> None:
+    for path, trashed in _trash_paths(sha256):
+        trashed.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(path, trashed)
+        except FileNotFoundError:
+            pass
+
+
+def _restore_files(sha256: str) -> None:
+    # Same content either way: a file committed again by an upload meanwhile wins
+    for path, trashed in _trash_paths(sha256):
+        if not trashed.exists():
+            continue
+        if path.exists():
+            trashed.unlink(missing_ok=True)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(trashed, path)
+
+
+def _remove_files(sha256: str) -> None:
+    for _, trashed in _trash_paths(sha256):
+        trashed.unlink(missing_ok=True)
+
+
+async def _collect_blob(database: AsyncIOMotorDatabase, sha256: str, cutoff: datetime) -> bool:
+    """Delete one collectable blob; False when it was revived before the document went"""
+    collectable = {"id": sha256, "refs": {"$lte": 0}, "unreferenced_at": {"$lt": cutoff}}
+    # Blobs left marked by an interrupted collection are matched again and finished
+    result = await database.blobs.update_one(collectable, {"$set": {"deleting": True}})
+    if not result.matched_count:
+        return False
+    await asyncio.to_thread(_trash_files, sha256)
+
+    # Re-checked by the delete itself: an upload or a resource may have picked the blob up meanwhile
+    result = await database.blobs.delete_one({**collectable, "deleting": True})
+    if result.deleted_count:
+        await asyncio.to_thread(_remove_files, sha256)
+        return True
+    await asyncio.to_thread(_restore_files, sha256)
+    await database.blobs.update_one({"id": sha256, "deleting": True}, {"$unset": {"deleting": ""}})
+    return False
+
+
+async def collect_blobs(
+    database: AsyncIOMotorDatabase, grace_seconds: int = BLOB_GC_GRACE_SECONDS
+) -> Dict[str, int]:
+    """Delete blobs unreferenced for longer than the grace period; returns counts"""
+    cutoff = utcnow() - timedelta(seconds=grace_seconds)
+    collected = {"blobs": 0, "bytes": 0}
+    while True:
+        candidates = await database.blobs.find(
+            {"refs": {"$lte": 0}, "unreferenced_at": {"$lt": cutoff}}, {"_id": 0, "id": 1, "size": 1}
+        ).limit(BLOB_GC_BATCH_SIZE).to_list(None)
+        if not candidates:
+            return collected
+        for blob in candidates:
+            if await _collect_blob(database, blob["id"], cutoff):
+                collected["blobs"] += 1
+                collected["bytes"] += blob["size"]
+        if len(candidates) < BLOB_GC_BATCH_SIZE:
+            return collected
+
+
+@job_handler("collect_blobs")
+async def collect_blobs_job(database: AsyncIOMotorDatabase, job: dict) -> None:
+    collected = await collect_blobs(database)
+    logger.info("Collected %d unreferenced blobs (%d bytes)", collected["blobs"], collected["bytes"])
+
+
+async def blob_gc_loop(database: AsyncIOMotorDatabase) -> None:
+    """Collect unreferenced blobs every BLOB_GC_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL)
+        try:
+            collected = await collect_blobs(database)
+            if collected["blobs"]:
+                logger.info("Collected %d unreferenced blobs (%d bytes)", collected["blobs"], collected["bytes"])
+        except Exception:
+            logger.exception("Blob garbage collection failed")
+
+
+# ============================================================================
+# Thumbnails
+# ============================================================================
+
+def make_thumbnail(source: str, target: str, content_type: str) -> bool:
+    """Render a JPEG thumbnail of source (runs in a worker process); False when unsupported"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.part.jpg"
+    try:
+        if content_type.startswith("image/"):
+            if Image is None:
+                return False
+            with Image.open(source) as image:
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.convert("RGB").save(tmp, "JPEG", quality=80)
+        elif content_type == "application/pdf":
+            if fitz is None:
+                return False
+            with fitz.open(source) as pdf:
+                page = pdf[0]
+                zoom = THUMBNAIL_SIZE[0] / max(page.rect.width, 1)
+                page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).save(tmp)
+        elif content_type.startswith("video/"):
+            ffmpeg = shutil.which("ffmpeg")
+            if ffmpeg is None:
+                return False
+            subprocess.run(
+                [ffmpeg, "-y", "-loglevel", "error", "-ss", "1", "-i", source,
+                 "-frames:v", "1", "-vf", f"scale={THUMBNAIL_SIZE[0]}:-2", tmp],
+                check=True, timeout=120
+            )
+        else:
+            return False
+        os.replace(tmp, target)
+        return True
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def thumbnail_pool() -> ProcessPoolExecutor:
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        _thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+    return _thumbnail_pool
+
+
+def shutdown_thumbnail_pool() -> None:
+    global _thumbnail_pool
+    if _thumbnail_pool is not None:
+        _thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+        _thumbnail_pool = None
+
+
+@job_handler("generate_thumbnail")
+async def generate_thumbnail_job(database: AsyncIOMotorDatabase, job: dict) -> None:
+    sha256 = job["payload"]["sha256"]
+    blob = await database.blobs.find_one({"id": sha256})
+    if blob is None or not blob_path(sha256).exists():
+        return
+
+    made = await asyncio.get_running_loop().run_in_executor(
+        thumbnail_pool(), make_thumbnail, str(blob_path(sha256)), str(thumbnail_path(sha256)), blob["content_type"]
+    )
+    await database.blobs.update_one({"id": sha256}, {"$set": {"thumbnail": "ready" if made else "none"}})
+    if made:
+        # Resources created before the thumbnail was ready
+        result = await database.resources.update_many(
+            {"file_url": file_url(sha256), "thumbnail_url": None},
+            {"$set": {"thumbnail_url": thumbnail_url(sha256), "updated_at": utcnow()}}
+        )
+        if result.modified_count:
+            await collection_versions.bump(database, "resources")
+
+
+# ============================================================================
+# Serving
+# ============================================================================
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single `bytes=` range; None to serve the whole file"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Other units and multipart ranges are ignored, as RFC 7233 allows
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            suffix = int(last)
+            start, end = max(0, size - suffix), size - 1
+            if suffix == 0:
+                start = size
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+async def _read_range(path: Path, start: int, length: int) -> AsyncIterator[bytes]:
+    handle = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(handle.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(handle.read, min(UPLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
+
+
+def is_inline(content_type: str) -> bool:
+    return content_type in INLINE_TYPES or content_type.startswith(INLINE_TYPE_PREFIXES)
+
+
+def file_response(
+    request: Request, path: Path, content_type: str, etag: str, filename: Optional[str] = None
+) -> Response:
+    """Immutable, range-aware response for a content-addressed file"""
+    # The stored type comes from the uploader: only known-safe types are rendered by the browser
+    inline = is_inline(content_type)
+    if not inline:
+        content_type = "application/octet-stream"
+    disposition = "inline" if inline else "attachment"
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # The URL is the content hash: it can be cached forever
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Content-Disposition": f"{disposition}; filename*=UTF-8''{quote(filename)}" if filename else disposition,
+        "X-Content-Type-Options": "nosniff",
+        # Same-origin user content: no script, no forms, no access to the app's cookies or storage
+        "Content-Security-Policy": "sandbox",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = path.stat().st_size
+    byte_range = parse_range(request.headers["range"], size) if "range" in request.headers else None
+    if byte_range is None:
+        # FileResponse uses the server's zero-copy sendfile extension when available
+        return FileResponse(path, media_type=content_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _read_range(path, start, end - start + 1),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=content_type,
+        headers=headers
+    )
@@ -0,0 +1,94 @@
+"""
+Write-behind view counters.
+
+Detail routes record a view in memory instead of issuing an `$inc` per read.
+Buffered increments are summed per document and flushed periodically (or as
+soon as the buffer reaches its size ceiling) as one unordered `bulk_write` per
+collection. The app flushes once more on shutdown.
+
+Flushes do not bump collection versions: a view is not an edit, and bumping
+every few seconds would keep list ETags from ever matching while anything is
+being read. View counts in cached list pages are refreshed by the next real
+write; detail routes add the pending views to what they return.
+"""
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL = float(os.environ.get("VIEW_FLUSH_INTERVAL", "5"))
+VIEW_BUFFER_MAX_KEYS = int(os.environ.get("VIEW_BUFFER_MAX_KEYS", "10000"))
+
+
+class ViewCounter:
+    """Per-process buffer of pending view increments keyed by (collection, id)"""
+
+    def __init__(self, max_keys: int = VIEW_BUFFER_MAX_KEYS):
+        self.max_keys = max_keys
+        self.dropped = 0
+        self._pending: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._flush_requested = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, collection: str, doc_id: str) -> None:
+        """Count one view; never waits on the database"""
+        key = (collection, doc_id)
+        if key not in self._pending and len(self._pending) >= self.max_keys:
+            # Memory ceiling reached before the flush caught up: views are approximate, drop it
+            self.dropped += 1
+            self._flush_requested.set()
+            return
+        self._pending[key] += 1
+        if len(self._pending) >= self.max_keys:
+            self._flush_requested.set()
+
+    def pending(self, collection: str, doc_id: str) -> int:
+        """Views recorded here and not flushed yet"""
+        return self._pending.get((collection, doc_id), 0)
+
+    async def flush(self, database: AsyncIOMotorDatabase) -> int:
+        """Write buffered increments; returns the number of documents updated"""
+        async with self._lock:
+            batch, self._pending = self._pending, defaultdict(int)
+            per_collection: Dict[str, Dict[str, int]] = defaultdict(dict)
+            for (collection, doc_id), count in batch.items():
+                per_collection[collection][doc_id] = count
+
+            written = 0
+            for collection, counts in per_collection.items():
+                try:
+                    await database[collection].bulk_write([
+                        UpdateOne({"id": doc_id}, {"$inc": {"views": count}})
+                        for doc_id, count in counts.items()
+                    ], ordered=False)
+                except Exception:
+                    logger.exception("View counter flush failed for %s; keeping increments for retry", collection)
+                    for doc_id, count in counts.items():
+                        self._pending[(collection, doc_id)] += count
+                    continue
+                written += len(counts)
+            return written
+
+    async def run(self, database: AsyncIOMotorDatabase, interval: float = VIEW_FLUSH_INTERVAL) -> None:
+        """Flush every interval, or early when the buffer is full"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            if self._pending:
+                # Shielded so cancellation at shutdown never loses a batch mid-write
+                await asyncio.shield(self.flush(database))
+
+
+view_counter = ViewCounter()
@@ -7,6 +7,8 @@ Tests all endpoints with proper authentication and data validation
 import requests
 import json
 import sys
+import hashlib
+import uuid
 from typing import Dict, Any, Optional
 
 # Configuration
@@ -239,10 +241,10 @@ class UnivLoopAPITester:
             
             if response.status_code == 200:
                 data = response.json()
-                if isinstance(data, list):
-                    self.log_result("Get Resources", True, f"Retrieved {len(data)} resources")
+                if isinstance(data.get("items"), list) and "next_cursor" in data:
+                    self.log_result("Get Resources", True, f"Retrieved {len(data['items'])} resources")
                 else:
-                    self.log_result("Get Resources", False, f"Expected list, got: {type(data)}")
+                    self.log_result("Get Resources", False, f"Expected page envelope, got: {data}")
             else:
                 self.log_result("Get Resources", False, 
                               f"Status: {response.status_code}, Response: {response.text}")
@@ -306,10 +308,10 @@ class UnivLoopAPITester:
             
             if response.status_code == 200:
                 data = response.json()
-                if isinstance(data, list):
-                    self.log_result("Get Discussions", True, f"Retrieved {len(data)} discussions")
+                if isinstance(data.get("items"), list) and "next_cursor" in data:
+                    self.log_result("Get Discussions", True, f"Retrieved {len(data['items'])} discussions")
                 else:
-                    self.log_result("Get Discussions", False, f"Expected list, got: {type(data)}")
+                    self.log_result("Get Discussions", False, f"Expected page envelope, got: {data}")
             else:
                 self.log_result("Get Discussions", False, 
                               f"Status: {response.status_code}, Response: {response.text}")
@@ -345,6 +347,50 @@ class UnivLoopAPITester:
         except Exception as e:
             self.log_result("Add Comment", False, f"Exception: {str(e)}")
     
+    def test_get_comments(self):
+        """Test paginated comment loading for a discussion"""
+        if not self.test_data.get("discussion_id"):
+            self.log_result("Get Comments", False, "No discussion_id available")
+            return
+            
+        try:
+            discussion_id = self.test_data["discussion_id"]
+            response = self.make_request("GET", f"/discussions/{discussion_id}/comments?limit=1")
+            
+            if response.status_code == 200:
+                data = response.json()
+                if "items" in data and "next_cursor" in data and len(data["items"]) == 1:
+                    if data["items"][0].get("discussion_id") == discussion_id:
+                        self.log_result("Get Comments", True, "Retrieved first page of comments")
+                    else:
+                        self.log_result("Get Comments", False, f"Comment from another discussion: {data}")
+                else:
+                    self.log_result("Get Comments", False, f"Invalid response format: {data}")
+            else:
+                self.log_result("Get Comments", False, 
+                              f"Status: {response.status_code}, Response: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Get Comments", False, f"Exception: {str(e)}")
+    
+    def test_conditional_get(self):
+        """Test that a repeated subjects request revalidates to 304"""
+        try:
+            response = self.make_request("GET", "/subjects")
+            etag = response.headers.get("ETag")
+            if response.status_code != 200 or not etag:
+                self.log_result("Conditional GET", False, f"Status: {response.status_code}, ETag: {etag}")
+                return
+            
+            response = self.make_request("GET", "/subjects", headers={"If-None-Match": etag})
+            if response.status_code == 304:
+                self.log_result("Conditional GET", True, "Unchanged subjects answered with 304")
+            else:
+                self.log_result("Conditional GET", False, f"Expected 304, got {response.status_code}")
+                
+        except Exception as e:
+            self.log_result("Conditional GET", False, f"Exception: {str(e)}")
+    
     def test_get_statistics(self):
         """Test getting platform statistics"""
         try:
@@ -375,6 +421,125 @@ class UnivLoopAPITester:
         except Exception as e:
             self.log_result("Get Statistics", False, f"Exception: {str(e)}")
     
+    def test_search(self):
+        """Test full-text search over resources and discussions"""
+        try:
+            response = self.make_request("GET", "/search?q=detaille%20python&type=resource")
+            
+            if response.status_code == 200:
+                data = response.json()
+                ids = [r["id"] for r in data.get("results", [])]
+                if self.test_data.get("resource_id") in ids:
+                    self.log_result("Search", True, f"Found created resource among {data['total']} results")
+                else:
+                    self.log_result("Search", False, f"Created resource not in results: {data}")
+            else:
+                self.log_result("Search", False, 
+                              f"Status: {response.status_code}, Response: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Search", False, f"Exception: {str(e)}")
+    
+    def test_quiz_attempt(self):
+        """Test server-side quiz scoring and per-question statistics"""
+        try:
+            quiz_data = {
+                "title": "Quiz de test",
+                "subject_id": self.test_data["subject_id"],
+                "questions": [
+                    {"question": "2 + 2 ?", "options": ["3", "4"], "correct_answer": 1},
+                    {"question": "Capitale de la France ?", "options": ["Paris", "Lyon"], "correct_answer": 0}
+                ]
+            }
+            response = self.make_request("POST", "/quizzes", quiz_data, auth_required=True)
+            if response.status_code != 201:
+                self.log_result("Quiz Attempt", False, f"Create status: {response.status_code}, Response: {response.text}")
+                return
+            quiz_id = response.json()["id"]
+            
+            quiz = self.make_request("GET", f"/quizzes/{quiz_id}").json()
+            if any("correct_answer" in q for q in quiz["questions"]):
+                self.log_result("Quiz Attempt", False, "Quiz detail exposes correct answers")
+                return
+            
+            response = self.make_request("POST", f"/quizzes/{quiz_id}/attempt", {"answers": [1, 1]}, auth_required=True)
+            if response.status_code != 201 or response.json().get("score") != 1:
+                self.log_result("Quiz Attempt", False, f"Status: {response.status_code}, Response: {response.text}")
+                return
+            
+            stats = self.make_request("GET", f"/quizzes/{quiz_id}/stats", auth_required=True).json()
+            if stats.get("attempts") == 1 and stats["questions"][1]["option_counts"] == [0, 1]:
+                self.log_result("Quiz Attempt", True, f"Scored 1/2, average {stats['average_percent']}%")
+            else:
+                self.log_result("Quiz Attempt", False, f"Unexpected statistics: {stats}")
+                
+        except Exception as e:
+            self.log_result("Quiz Attempt", False, f"Exception: {str(e)}")
+    
+    def test_flashcard_review(self):
+        """Test scheduling a flashcard set and grading due cards in one batch"""
+        try:
+            flashcard_data = {
+                "title": "Flashcards de test",
+                "subject_id": self.test_data["subject_id"],
+                "cards": [{"front": "Bonjour", "back": "Hello"}, {"front": "Merci", "back": "Thanks"}]
+            }
+            response = self.make_request("POST", "/flashcards", flashcard_data, auth_required=True)
+            if response.status_code != 201:
+                self.log_result("Flashcard Review", False, f"Create status: {response.status_code}, Response: {response.text}")
+                return
+            flashcard_id = response.json()["id"]
+            
+            self.make_request("POST", f"/flashcards/{flashcard_id}/study", auth_required=True)
+            due = self.make_request("GET", "/flashcards/due?limit=500", auth_required=True).json()
+            reviews = [
+                {"flashcard_id": card["flashcard_id"], "card_index": card["card_index"], "grade": 4}
+                for card in due if card["flashcard_id"] == flashcard_id
+            ]
+            if len(reviews) != 2:
+                self.log_result("Flashcard Review", False, f"Expected 2 due cards, got: {due}")
+                return
+            
+            response = self.make_request("POST", "/flashcards/reviews", {"reviews": reviews}, auth_required=True)
+            if response.status_code == 200 and all(card["interval"] == 1 for card in response.json()):
+                self.log_result("Flashcard Review", True, "2 cards graded, next review in 1 day")
+            else:
+                self.log_result("Flashcard Review", False, 
+                              f"Status: {response.status_code}, Response: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Flashcard Review", False, f"Exception: {str(e)}")
+    
+    def test_upload_dedup(self):
+        """Test the hash-first upload check and that identical uploads share one file"""
+        try:
+            content = f"Notes de cours {uuid.uuid4()}".encode()
+            sha256 = hashlib.sha256(content).hexdigest()
+            check = {"sha256": sha256, "size": len(content)}
+            
+            response = self.make_request("POST", "/resources/upload/check", check, auth_required=True)
+            if response.status_code != 404:
+                self.log_result("Upload Dedup", False, f"Check before upload: {response.status_code}, Response: {response.text}")
+                return
+            
+            response = requests.post(
+                f"{self.base_url}/resources/upload?filename=notes.txt", data=content,
+                headers={"Content-Type": "text/plain", "Authorization": f"Bearer {self.token}"}, timeout=30
+            )
+            if response.status_code != 201 or response.json()["sha256"] != sha256:
+                self.log_result("Upload Dedup", False, f"Upload status: {response.status_code}, Response: {response.text}")
+                return
+            
+            response = self.make_request("POST", "/resources/upload/check", check, auth_required=True)
+            if response.status_code == 200 and response.json()["existed"]:
+                self.log_result("Upload Dedup", True, f"Second upload skipped, file at {response.json()['file_url']}")
+            else:
+                self.log_result("Upload Dedup", False, 
+                              f"Status: {response.status_code}, Response: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Upload Dedup", False, f"Exception: {str(e)}")
+    
     def test_get_notifications(self):
         """Test getting user notifications"""
         try:
@@ -382,10 +547,10 @@ class UnivLoopAPITester:
             
             if response.status_code == 200:
                 data = response.json()
-                if isinstance(data, list):
-                    self.log_result("Get Notifications", True, f"Retrieved {len(data)} notifications")
+                if isinstance(data.get("items"), list) and "next_cursor" in data:
+                    self.log_result("Get Notifications", True, f"Retrieved {len(data['items'])} notifications")
                 else:
-                    self.log_result("Get Notifications", False, f"Expected list, got: {type(data)}")
+                    self.log_result("Get Notifications", False, f"Expected page envelope, got: {data}")
             else:
                 self.log_result("Get Notifications", False, 
                               f"Status: {response.status_code}, Response: {response.text}")
@@ -393,6 +558,26 @@ class UnivLoopAPITester:
         except Exception as e:
             self.log_result("Get Notifications", False, f"Exception: {str(e)}")
     
+    def test_notification_stream(self):
+        """Test the server-sent notification stream (token passed as query parameter)"""
+        try:
+            response = requests.get(f"{self.base_url}/notifications/stream", params={"token": self.token},
+                                    stream=True, timeout=10)
+            
+            if response.status_code == 200 and response.headers.get("content-type", "").startswith("text/event-stream"):
+                first_line = next(response.iter_lines(decode_unicode=True))
+                if first_line.startswith("retry:"):
+                    self.log_result("Notification Stream", True, "Stream opened")
+                else:
+                    self.log_result("Notification Stream", False, f"Unexpected first line: {first_line}")
+            else:
+                self.log_result("Notification Stream", False, 
+                              f"Status: {response.status_code}, Response: {response.text[:200]}")
+            response.close()
+                
+        except Exception as e:
+            self.log_result("Notification Stream", False, f"Exception: {str(e)}")
+    
     def run_all_tests(self):
         """Run all tests in sequence"""
         print(f"🚀 Starting UnivLoop API Tests")
@@ -407,14 +592,21 @@ class UnivLoopAPITester:
             self.test_get_user_profile,
             self.test_auth_without_token,
             self.test_get_subjects,
+            self.test_conditional_get,
             self.test_create_resource,
             self.test_get_resources,
             self.test_like_resource,
             self.test_create_discussion,
             self.test_get_discussions,
             self.test_add_comment,
+            self.test_get_comments,
             self.test_get_statistics,
-            self.test_get_notifications
+            self.test_search,
+            self.test_quiz_attempt,
+            self.test_flashcard_review,
+            self.test_upload_dedup,
+            self.test_get_notifications,
+            self.test_notification_stream
         ]
         
         for test_method in test_methods:
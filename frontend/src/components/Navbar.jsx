@@ -24,24 +24,33 @@ const Navbar = () => {
   
   const unreadCount = notifications.filter(n => !n.read).length;
 
-  // Load notifications if user is authenticated
+  // Load notifications if user is authenticated, then receive new ones as they are pushed
   useEffect(() => {
+    if (!isAuthenticated) return undefined;
+
     const loadNotifications = async () => {
-      if (isAuthenticated) {
-        try {
-          const data = await notificationAPI.getAll();
-          setNotifications(data);
-        } catch (error) {
-          console.error('Failed to load notifications:', error);
-        }
+      try {
+        const data = await notificationAPI.getAll();
+        // Keep anything pushed while the list was loading
+        setNotifications(prev => [
+          ...prev.filter(n => !data.some(d => d.id === n.id)),
+          ...data
+        ]);
+      } catch (error) {
+        console.error('Failed to load notifications:', error);
       }
     };
 
-    loadNotifications();
-    
-    // Refresh notifications every 30 seconds
-    const interval = setInterval(loadNotifications, 30000);
-    return () => clearInterval(interval);
+    const unsubscribe = notificationAPI.subscribe(
+      (notification) => {
+        setNotifications(prev => (
+          prev.some(n => n.id === notification.id) ? prev : [notification, ...prev]
+        ));
+      },
+      // (Re)load the list each time the stream opens so nothing falls in between
+      loadNotifications
+    );
+    return unsubscribe;
   }, [isAuthenticated]);
 
   const navLinks = [
@@ -36,6 +36,8 @@ const Community = () => {
   const [selectedDiscussion, setSelectedDiscussion] = useState(null);
   const [viewDialogOpen, setViewDialogOpen] = useState(false);
   const [commentText, setCommentText] = useState('');
+  const [comments, setComments] = useState([]);
+  const [commentsCursor, setCommentsCursor] = useState(null);
   
   // Form state
   const [formData, setFormData] = useState({
@@ -127,8 +129,13 @@ const Community = () => {
 
   const handleViewDiscussion = async (discussion) => {
     try {
-      const fullDiscussion = await discussionAPI.getById(discussion.id);
+      const [fullDiscussion, commentsPage] = await Promise.all([
+        discussionAPI.getById(discussion.id),
+        discussionAPI.getComments(discussion.id)
+      ]);
       setSelectedDiscussion(fullDiscussion);
+      setComments(commentsPage.items);
+      setCommentsCursor(commentsPage.next_cursor);
       setViewDialogOpen(true);
     } catch (error) {
       toast({
@@ -139,6 +146,20 @@ const Community = () => {
     }
   };
 
+  const handleLoadMoreComments = async () => {
+    try {
+      const commentsPage = await discussionAPI.getComments(selectedDiscussion.id, { cursor: commentsCursor });
+      setComments(prev => [...prev, ...commentsPage.items]);
+      setCommentsCursor(commentsPage.next_cursor);
+    } catch (error) {
+      toast({
+        title: 'Erreur',
+        description: 'Impossible de charger les commentaires',
+        variant: 'destructive'
+      });
+    }
+  };
+
   const handleAddComment = async (e) => {
     e.preventDefault();
     
@@ -148,8 +169,12 @@ const Community = () => {
       const newComment = await discussionAPI.addComment(selectedDiscussion.id, { content: commentText });
       setSelectedDiscussion(prev => ({
         ...prev,
-        comments: [...prev.comments, newComment]
+        comment_count: prev.comment_count + 1
       }));
+      // Newest comment goes last; only show it once the thread is fully loaded
+      if (!commentsCursor) {
+        setComments(prev => [...prev, newComment]);
+      }
       setCommentText('');
       toast({
         title: 'Commentaire ajouté',
@@ -384,7 +409,7 @@ const Community = () => {
                       </span>
                       <span className="flex items-center gap-1">
                         <MessageSquare className="h-4 w-4" />
-                        {discussion.comments?.length || 0}
+                        {discussion.comment_count || 0}
                       </span>
                     </div>
                   </div>
@@ -436,11 +461,11 @@ const Community = () => {
                   {/* Comments Section */}
                   <div className="border-t pt-6">
                     <h3 className="font-semibold mb-4">
-                      Commentaires ({selectedDiscussion.comments?.length || 0})
+                      Commentaires ({selectedDiscussion.comment_count || 0})
                     </h3>
                     
                     <div className="space-y-4 mb-6">
-                      {selectedDiscussion.comments?.map((comment) => (
+                      {comments.map((comment) => (
                         <div key={comment.id} className="flex gap-3 p-3 bg-gray-50 rounded-lg">
                           <Avatar className="h-8 w-8">
                             <AvatarImage src={comment.author_avatar} />
@@ -457,6 +482,11 @@ const Community = () => {
                           </div>
                         </div>
                       ))}
+                      {commentsCursor && (
+                        <Button variant="outline" className="w-full" onClick={handleLoadMoreComments}>
+                          Charger plus de commentaires
+                        </Button>
+                      )}
                     </div>
                     
                     {isAuthenticated ? (
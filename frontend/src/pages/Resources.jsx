@@ -16,11 +16,11 @@ import { Label } from '../components/ui/label';
 import { Textarea } from '../components/ui/textarea';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
 import { useAuth } from '../contexts/AuthContext';
-import { resourceAPI, subjectAPI } from '../services/api';
+import { resourceAPI, subjectAPI, fileUrl } from '../services/api';
 import { useToast } from '../hooks/use-toast';
 
 const Resources = () => {
-  const { isAuthenticated, user } = useAuth();
+  const { isAuthenticated } = useAuth();
   const { toast } = useToast();
   const [resources, setResources] = useState([]);
   const [subjects, setSubjects] = useState([]);
@@ -39,6 +39,7 @@ const Resources = () => {
     thumbnail_url: ''
   });
   const [uploading, setUploading] = useState(false);
+  const [uploadProgress, setUploadProgress] = useState(null);
 
   // Load resources and subjects
   useEffect(() => {
@@ -106,6 +107,32 @@ const Resources = () => {
     }
   };
 
+  const handleFileSelected = async (e) => {
+    const file = e.target.files?.[0];
+    if (!file) return;
+
+    setUploading(true);
+    setUploadProgress(0);
+    try {
+      const result = await resourceAPI.upload(file, setUploadProgress);
+      setFormData(prev => ({
+        ...prev,
+        title: prev.title || file.name.replace(/\.[^.]+$/, ''),
+        file_url: result.file_url,
+        thumbnail_url: result.thumbnail_url || prev.thumbnail_url
+      }));
+    } catch (error) {
+      toast({
+        title: 'Erreur',
+        description: error.response?.data?.detail || "Impossible d'envoyer le fichier",
+        variant: 'destructive'
+      });
+    } finally {
+      setUploading(false);
+      setUploadProgress(null);
+    }
+  };
+
   const handleLike = async (resourceId) => {
     if (!isAuthenticated) {
       toast({
@@ -120,7 +147,7 @@ const Resources = () => {
       const result = await resourceAPI.like(resourceId);
       setResources(prev => prev.map(r => 
         r.id === resourceId 
-          ? { ...r, likes: result.likes, liked_by: result.liked ? [...r.liked_by, user.id] : r.liked_by.filter(id => id !== user.id) }
+          ? { ...r, likes: result.likes, liked_by_me: result.liked }
           : r
       ));
     } catch (error) {
@@ -232,15 +259,19 @@ const Resources = () => {
                   </div>
                   
                   <div className="space-y-2">
-                    <Label>URL du fichier (Cloudinary) *</Label>
+                    <Label>Fichier *</Label>
+                    <Input type="file" onChange={handleFileSelected} disabled={uploading} />
+                    {uploadProgress !== null && (
+                      <p className="text-xs text-gray-500">Envoi en cours... {uploadProgress}%</p>
+                    )}
                     <Input
                       value={formData.file_url}
                       onChange={(e) => setFormData({...formData, file_url: e.target.value})}
-                      placeholder="https://res.cloudinary.com/..."
+                      placeholder="https://..."
                       required
                     />
                     <p className="text-xs text-gray-500">
-                      Uploadez votre fichier sur Cloudinary et collez l'URL ici
+                      Choisissez un fichier à envoyer, ou collez l'URL d'un fichier déjà en ligne
                     </p>
                   </div>
                   
@@ -249,8 +280,11 @@ const Resources = () => {
                     <Input
                       value={formData.thumbnail_url}
                       onChange={(e) => setFormData({...formData, thumbnail_url: e.target.value})}
-                      placeholder="https://res.cloudinary.com/..."
+                      placeholder="https://..."
                     />
+                    <p className="text-xs text-gray-500">
+                      Générée automatiquement pour les images, PDF et vidéos envoyés
+                    </p>
                   </div>
                   
                   <div className="flex gap-2">
@@ -318,14 +352,14 @@ const Resources = () => {
         ) : (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
             {filteredResources.map((resource) => {
-              const isLiked = isAuthenticated && resource.liked_by?.includes(user?.id);
+              const isLiked = isAuthenticated && resource.liked_by_me;
               
               return (
                 <Card key={resource.id} className="hover:shadow-lg transition-shadow">
                   {resource.thumbnail_url && (
                     <div className="w-full h-48 overflow-hidden rounded-t-lg">
                       <img 
-                        src={resource.thumbnail_url} 
+                        src={fileUrl(resource.thumbnail_url)} 
                         alt={resource.title}
                         className="w-full h-full object-cover"
                       />
@@ -375,7 +409,7 @@ const Resources = () => {
                         className="w-full bg-blue-600 hover:bg-blue-700" 
                         asChild
                       >
-                        <a href={resource.file_url} target="_blank" rel="noopener noreferrer">
+                        <a href={fileUrl(resource.file_url)} target="_blank" rel="noopener noreferrer">
                           <Download className="h-4 w-4 mr-2" />
                           Télécharger
                         </a>
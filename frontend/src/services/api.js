@@ -10,6 +10,16 @@ const api = axios.create({
   },
 });
 
+// Uploaded files are served as /api/files/<sha256>; make such URLs absolute
+export const fileUrl = (url) => (url && url.startsWith('/api/') ? `${API_BASE_URL}${url}` : url);
+
+// Hex SHA-256 of a file; null where Web Crypto is unavailable (non-HTTPS origins)
+const sha256Hex = async (file) => {
+  if (!window.crypto?.subtle) return null;
+  const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+};
+
 // Add token to requests
 api.interceptors.request.use(
   (config) => {
@@ -106,11 +116,17 @@ export const subjectAPI = {
 // ============================================================================
 
 export const resourceAPI = {
-  getAll: async (filters = {}) => {
+  // List endpoints return { items, next_cursor }; pass next_cursor as `cursor` for the next page
+  getPage: async (filters = {}) => {
     const response = await api.get('/resources', { params: filters });
     return response.data;
   },
 
+  getAll: async (filters = {}) => {
+    const response = await api.get('/resources', { params: filters });
+    return response.data.items;
+  },
+
   getById: async (resourceId) => {
     const response = await api.get(`/resources/${resourceId}`);
     return response.data;
@@ -121,6 +137,36 @@ export const resourceAPI = {
     return response.data;
   },
 
+  // Hashes the file first and skips the transfer when the server already has it.
+  // Returns { sha256, size, content_type, filename, file_url, thumbnail_url, existed }
+  upload: async (file, onProgress) => {
+    const sha256 = await sha256Hex(file);
+    if (sha256) {
+      try {
+        const existing = await api.post('/resources/upload/check', { sha256, size: file.size });
+        if (onProgress) onProgress(100);
+        return existing.data;
+      } catch (error) {
+        if (error.response?.status !== 404) throw error;
+      }
+    }
+
+    const response = await api.post('/resources/upload', file, {
+      params: { filename: file.name },
+      headers: { 'Content-Type': file.type || 'application/octet-stream' },
+      onUploadProgress: onProgress
+        ? (event) => event.total && onProgress(Math.round((event.loaded * 100) / event.total))
+        : undefined,
+    });
+    return response.data;
+  },
+
+  // Returns { created, items: [{ index, id }], errors: [{ index, detail }] }
+  bulkCreate: async (items, ordered = false) => {
+    const response = await api.post('/resources/bulk', items, { params: { ordered } });
+    return response.data;
+  },
+
   update: async (resourceId, resourceData) => {
     const response = await api.put(`/resources/${resourceId}`, resourceData);
     return response.data;
@@ -142,11 +188,17 @@ export const resourceAPI = {
 // ============================================================================
 
 export const discussionAPI = {
-  getAll: async (filters = {}) => {
+  // List endpoints return { items, next_cursor }; pass next_cursor as `cursor` for the next page
+  getPage: async (filters = {}) => {
     const response = await api.get('/discussions', { params: filters });
     return response.data;
   },
 
+  getAll: async (filters = {}) => {
+    const response = await api.get('/discussions', { params: filters });
+    return response.data.items;
+  },
+
   getById: async (discussionId) => {
     const response = await api.get(`/discussions/${discussionId}`);
     return response.data;
@@ -167,6 +219,12 @@ export const discussionAPI = {
     return response.data;
   },
 
+  // Oldest first; returns { items, next_cursor }
+  getComments: async (discussionId, params = {}) => {
+    const response = await api.get(`/discussions/${discussionId}/comments`, { params });
+    return response.data;
+  },
+
   addComment: async (discussionId, commentData) => {
     const response = await api.post(`/discussions/${discussionId}/comments`, commentData);
     return response.data;
@@ -178,11 +236,17 @@ export const discussionAPI = {
 // ============================================================================
 
 export const quizAPI = {
-  getAll: async (filters = {}) => {
+  // List endpoints return { items, next_cursor }; pass next_cursor as `cursor` for the next page
+  getPage: async (filters = {}) => {
     const response = await api.get('/quizzes', { params: filters });
     return response.data;
   },
 
+  getAll: async (filters = {}) => {
+    const response = await api.get('/quizzes', { params: filters });
+    return response.data.items;
+  },
+
   getById: async (quizId) => {
     const response = await api.get(`/quizzes/${quizId}`);
     return response.data;
@@ -193,8 +257,28 @@ export const quizAPI = {
     return response.data;
   },
 
-  recordAttempt: async (quizId) => {
-    const response = await api.post(`/quizzes/${quizId}/attempt`);
+  // Returns { created, items: [{ index, id }], errors: [{ index, detail }] }
+  bulkCreate: async (items, ordered = false) => {
+    const response = await api.post('/quizzes/bulk', items, { params: { ordered } });
+    return response.data;
+  },
+
+  // answers: selected option index per question (null when skipped); scored server-side
+  submitAttempt: async (quizId, answers, durationSeconds = null) => {
+    const response = await api.post(`/quizzes/${quizId}/attempt`, {
+      answers,
+      duration_seconds: durationSeconds,
+    });
+    return response.data;
+  },
+
+  getMyAttempts: async (quizId, params = {}) => {
+    const response = await api.get(`/quizzes/${quizId}/attempts`, { params });
+    return response.data;
+  },
+
+  getStats: async (quizId) => {
+    const response = await api.get(`/quizzes/${quizId}/stats`);
     return response.data;
   },
 };
@@ -204,11 +288,17 @@ export const quizAPI = {
 // ============================================================================
 
 export const flashcardAPI = {
-  getAll: async (filters = {}) => {
+  // List endpoints return { items, next_cursor }; pass next_cursor as `cursor` for the next page
+  getPage: async (filters = {}) => {
     const response = await api.get('/flashcards', { params: filters });
     return response.data;
   },
 
+  getAll: async (filters = {}) => {
+    const response = await api.get('/flashcards', { params: filters });
+    return response.data.items;
+  },
+
   getById: async (flashcardId) => {
     const response = await api.get(`/flashcards/${flashcardId}`);
     return response.data;
@@ -218,6 +308,42 @@ export const flashcardAPI = {
     const response = await api.post('/flashcards', flashcardData);
     return response.data;
   },
+
+  // Returns { created, items: [{ index, id }], errors: [{ index, detail }] }
+  bulkCreate: async (items, ordered = false) => {
+    const response = await api.post('/flashcards/bulk', items, { params: { ordered } });
+    return response.data;
+  },
+
+  // Spaced repetition: schedule a set, fetch due cards, grade a session in one request
+  study: async (flashcardId) => {
+    const response = await api.post(`/flashcards/${flashcardId}/study`);
+    return response.data;
+  },
+
+  getDue: async (limit = 50) => {
+    const response = await api.get('/flashcards/due', { params: { limit } });
+    return response.data;
+  },
+
+  // reviews: [{ flashcard_id, card_index, grade }] with grade from 0 (forgotten) to 5 (perfect)
+  submitReviews: async (reviews) => {
+    const response = await api.post('/flashcards/reviews', { reviews });
+    return response.data;
+  },
+};
+
+// ============================================================================
+// FEED API
+// ============================================================================
+
+export const feedAPI = {
+  // Returns { items: [{ type, item }], next_cursor }; pass next_cursor as `cursor` for the next page.
+  // Optional `audience` reads a single timeline, e.g. 'faculty:Sciences' or 'subject:<id>'
+  getPage: async (params = {}) => {
+    const response = await api.get('/feed', { params });
+    return response.data;
+  },
 };
 
 // ============================================================================
@@ -225,9 +351,14 @@ export const flashcardAPI = {
 // ============================================================================
 
 export const notificationAPI = {
+  getPage: async (params = {}) => {
+    const response = await api.get('/notifications', { params });
+    return response.data;
+  },
+
   getAll: async () => {
     const response = await api.get('/notifications');
-    return response.data;
+    return response.data.items;
   },
 
   markAsRead: async (notificationId) => {
@@ -235,10 +366,57 @@ export const notificationAPI = {
     return response.data;
   },
 
+  markAllAsRead: async () => {
+    const response = await api.put('/notifications/read-all');
+    return response.data;
+  },
+
   delete: async (notificationId) => {
     const response = await api.delete(`/notifications/${notificationId}`);
     return response.data;
   },
+
+  // Server-sent events. EventSource cannot set headers, so each connection is opened with a
+  // single-use ticket exchanged for the token; on errors a new ticket is fetched and the
+  // stream resumes after the last event received.
+  subscribe: (onNotification, onOpen) => {
+    let source = null;
+    let retryTimer = null;
+    let lastEventId = null;
+    let closed = false;
+
+    const connect = async () => {
+      try {
+        const { data } = await api.post('/notifications/stream-ticket');
+        if (closed) return;
+        const params = new URLSearchParams({ ticket: data.ticket });
+        if (lastEventId) params.set('last_event_id', lastEventId);
+        source = new EventSource(`${API_BASE_URL}/api/notifications/stream?${params}`);
+      } catch (error) {
+        if (!closed) retryTimer = setTimeout(connect, 5000);
+        return;
+      }
+      source.addEventListener('notification', (event) => {
+        lastEventId = event.lastEventId || lastEventId;
+        onNotification(JSON.parse(event.data));
+      });
+      if (onOpen) {
+        source.addEventListener('open', onOpen);
+      }
+      // The ticket is used up: reconnect with a new one instead of letting the browser retry
+      source.addEventListener('error', () => {
+        source.close();
+        if (!closed) retryTimer = setTimeout(connect, 5000);
+      });
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  },
 };
 
 // ============================================================================
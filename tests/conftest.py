@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+# Backend modules import each other as top-level modules (see backend/server.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest
+
+
+@pytest.fixture
+def database():
+    """In-memory Motor database, decoding dates like mongo.create_client does"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test"]
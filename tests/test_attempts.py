@@ -0,0 +1,69 @@
+import pytest
+from fastapi import HTTPException
+
+from attempts import build_statistics, score_attempt, stats_increments
+
+QUESTIONS = [
+    {"question": "2 + 2 ?", "options": ["3", "4", "5"], "correct_answer": 1, "explanation": "Addition"},
+    {"question": "Capitale ?", "options": ["Paris", "Lyon"], "correct_answer": 0},
+]
+
+
+def test_answers_are_scored_against_stored_correct_answers():
+    results = score_attempt(QUESTIONS, [1, 1])
+
+    assert [r["correct"] for r in results] == [True, False]
+    assert results[0]["explanation"] == "Addition"
+    assert results[1]["correct_answer"] == 0
+
+
+def test_skipped_question_is_wrong():
+    results = score_attempt(QUESTIONS, [None, 0])
+
+    assert [r["correct"] for r in results] == [False, True]
+
+
+@pytest.mark.parametrize("answers", [[1], [1, 0, 0], [3, 0], [-1, 0]])
+def test_invalid_answers_are_rejected(answers):
+    with pytest.raises(HTTPException) as exc:
+        score_attempt(QUESTIONS, answers)
+    assert exc.value.status_code == 400
+
+
+def test_increments_skip_unanswered_questions():
+    increments = stats_increments(score_attempt(QUESTIONS, [2, None]))
+
+    assert increments == {
+        "attempts": 1,
+        "score_sum": 0,
+        "questions.0.answered": 1,
+        "questions.0.correct": 0,
+        "questions.0.options.2": 1,
+    }
+
+
+def test_statistics_are_read_from_counters():
+    quiz = {"id": "q1", "questions": QUESTIONS}
+    stats_doc = {
+        "attempts": 4,
+        "score_sum": 6,
+        "questions": {
+            "0": {"answered": 4, "correct": 3, "options": {"1": 3, "2": 1}},
+            "1": {"answered": 3, "correct": 3, "options": {"0": 3}},
+        },
+    }
+
+    stats = build_statistics(quiz, stats_doc)
+
+    assert stats["attempts"] == 4
+    assert stats["average_score"] == 1.5
+    assert stats["average_percent"] == 75.0
+    assert stats["questions"][0] == {"answered": 4, "correct": 3, "correct_rate": 0.75, "option_counts": [0, 3, 1]}
+    assert stats["questions"][1]["option_counts"] == [3, 0]
+
+
+def test_statistics_before_first_attempt():
+    stats = build_statistics({"id": "q1", "questions": QUESTIONS}, None)
+
+    assert stats["attempts"] == 0
+    assert stats["questions"][1] == {"answered": 0, "correct": 0, "correct_rate": 0.0, "option_counts": [0, 0]}
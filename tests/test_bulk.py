@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+import bulk
+from bulk import bulk_result, insert_items, read_items, validate_items
+from models import FlashcardCreate
+
+
+class FakeRequest:
+    def __init__(self, body, content_type="application/json", chunk_size=7):
+        self.headers = {"content-type": content_type}
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def body(self):
+        return self._body
+
+    async def stream(self):
+        for start in range(0, len(self._body), self._chunk_size):
+            yield self._body[start:start + self._chunk_size]
+
+
+class FakeCollection:
+    def __init__(self, fail_at=()):
+        self.fail_at = set(fail_at)
+        self.inserted = []
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for position, doc in enumerate(docs):
+            if position in self.fail_at:
+                errors.append({"index": position, "errmsg": "duplicate key"})
+                if ordered:
+                    break
+            else:
+                self.inserted.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+def test_ndjson_is_parsed_across_chunks_with_invalid_lines_reported():
+    body = b'{"title": "a", "subject_id": "s", "cards": []}\n\nnot json\n{"title": "b"}\n'
+    items = asyncio.run(read_items(FakeRequest(body, "application/x-ndjson")))
+    valid, errors = validate_items(items, FlashcardCreate)
+
+    assert [index for index, _ in valid] == [0]
+    assert errors[0] == {"index": 1, "detail": "Invalid JSON"}
+    assert errors[1]["index"] == 2 and "subject_id" in errors[1]["detail"]
+
+
+@pytest.mark.parametrize("body", [b"{}", b"[]", b"nope"])
+def test_json_body_must_be_a_non_empty_array(body):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(read_items(FakeRequest(body)))
+    assert exc.value.status_code == 400
+
+
+def test_item_limit(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_MAX_ITEMS", 2)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(read_items(FakeRequest(b"{}\n{}\n{}\n", "application/x-ndjson")))
+    assert exc.value.status_code == 413
+
+
+def test_unordered_insert_reports_only_failed_items():
+    docs = [(0, {"id": "a"}), (2, {"id": "b"}), (3, {"id": "c"})]
+    inserted, errors = asyncio.run(insert_items(FakeCollection(fail_at={1}), docs, ordered=False))
+
+    assert bulk_result(inserted, errors) == {
+        "created": 2,
+        "items": [{"index": 0, "id": "a"}, {"index": 3, "id": "c"}],
+        "errors": [{"index": 2, "detail": "duplicate key"}],
+    }
+
+
+def test_ordered_insert_stops_at_first_failure():
+    docs = [(0, {"id": "a"}), (1, {"id": "b"}), (2, {"id": "c"})]
+    inserted, errors = asyncio.run(insert_items(FakeCollection(fail_at={1}), docs, ordered=True))
+
+    assert [index for index, _ in inserted] == [0]
+    assert [error["index"] for error in errors] == [1, 2]
+
+
+def test_ordered_insert_stops_at_first_invalid_item():
+    items = [
+        {"title": "a", "subject_id": "s", "cards": []},
+        {"title": "invalid"},
+        {"title": "c", "subject_id": "s", "cards": []},
+    ]
+    valid, errors = validate_items(items, FlashcardCreate)
+    docs = [(index, {"id": payload.title}) for index, payload in valid]
+    collection = FakeCollection()
+
+    inserted, insert_errors = asyncio.run(insert_items(collection, docs, ordered=True, rejected=errors))
+    assert collection.inserted == [{"id": "a"}]
+    result = bulk_result(inserted, errors + insert_errors)
+    assert result["created"] == 1
+    assert [(error["index"], error["detail"]) for error in result["errors"]][1:] == [
+        (2, "Not inserted: an earlier item failed")
+    ]
+
+    # Unordered, the valid items around the invalid one are still written
+    inserted, insert_errors = asyncio.run(insert_items(FakeCollection(), docs, ordered=False, rejected=errors))
+    assert [index for index, _ in inserted] == [0, 2] and insert_errors == []
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_body_size_limit(monkeypatch, content_type):
+    monkeypatch.setattr(bulk, "BULK_MAX_BYTES", 16)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(read_items(FakeRequest(b'[{"title": "a long enough body"}]', content_type)))
+    assert exc.value.status_code == 413
+
+    request = FakeRequest(b"[{}]")
+    request.headers["content-length"] = "17"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(read_items(request))
+    assert exc.value.status_code == 413
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from auth import UserCache, create_access_token, decode_access_token, token_cache
+from cache import CacheBackend, InMemoryCacheBackend, TTLCache
+from models import User
+
+
+def make_user(**overrides):
+    now = datetime.now(timezone.utc)
+    fields = {"id": "u1", "name": "Marie", "email": "marie@example.com", "created_at": now, "updated_at": now}
+    fields.update(overrides)
+    return User(**fields)
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_backends_must_implement_the_interface():
+    class GetOnly(CacheBackend):
+        async def get(self, key):
+            return None
+
+    for backend in (CacheBackend, GetOnly):
+        with pytest.raises(TypeError):
+            backend()
+
+
+def test_user_cache_round_trip_and_invalidation():
+    async def scenario():
+        user_cache = UserCache(InMemoryCacheBackend())
+        user = make_user()
+        await user_cache.set(user)
+        assert await user_cache.get("u1") is user
+        await user_cache.invalidate("u1")
+        assert await user_cache.get("u1") is None
+    asyncio.run(scenario())
+
+
+def test_user_cache_revalidates_serialized_values():
+    class JsonBackend(InMemoryCacheBackend):
+        stores_objects = False
+
+    async def scenario():
+        user_cache = UserCache(JsonBackend())
+        await user_cache.set(make_user(name="Paul"))
+        cached = await user_cache.get("u1")
+        assert isinstance(cached, User) and cached.name == "Paul"
+    asyncio.run(scenario())
+
+
+def test_decoded_tokens_are_memoized():
+    token = create_access_token({"sub": "u1"})
+    token_cache.delete(token)
+    assert decode_access_token(token).user_id == "u1"
+    assert token_cache.get(token).user_id == "u1"
@@ -0,0 +1,131 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+from compression import CompressionMiddleware, PrecompressedStaticFiles, negotiate, precompress
+from conditional import ETagMiddleware
+
+ITEMS = [{"id": str(i), "title": f"Ressource {i}", "description": "Notes de cours " * 5} for i in range(100)]
+
+app = FastAPI()
+app.add_middleware(ETagMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get("/list")
+async def list_items():
+    return ITEMS
+
+
+@app.get("/small")
+async def small():
+    return {"value": 1}
+
+
+@app.get("/ndjson")
+async def ndjson():
+    lines = (f'{{"id": {i}, "title": "Ressource {i}"}}\n'.encode() for i in range(500))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.get("/events")
+async def events():
+    return StreamingResponse(iter([b"data: 1\n\n" * 500]), media_type="text/event-stream")
+
+
+client = TestClient(app)
+
+
+def test_negotiate():
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, br;q=0") is None
+    assert negotiate("*") == ("br" if compression.brotli else "gzip")
+
+
+def test_negotiate_prefers_brotli():
+    if compression.brotli is None:
+        pytest.skip("brotli is not installed")
+    assert negotiate("gzip, deflate, br") == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5") == "gzip"
+
+
+def test_large_json_is_compressed_with_a_weak_etag():
+    response = client.get("/list", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].startswith('W/"')
+    assert int(response.headers["content-length"]) < len(response.content) / 4
+    assert response.json() == ITEMS
+
+    # The weakened ETag still validates
+    again = client.get("/list", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_small_and_unaccepted_responses_are_sent_as_is():
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+
+    identity = client.get("/list", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.json() == ITEMS
+
+
+def test_streamed_bodies_are_compressed_incrementally():
+    response = client.get("/ndjson", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.text.splitlines()) == 500
+
+
+def test_event_streams_are_not_compressed():
+    response = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_precompressed_static_files(tmp_path):
+    script = b"console.log('UnivLoop');\n" * 200
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "main.3f2a9c1e.js").write_bytes(script)
+    (tmp_path / "index.html").write_bytes(b"<html>" + b"<div></div>" * 200 + b"</html>")
+    files, _, _ = precompress(tmp_path)
+    assert files == (4 if compression.brotli else 2)
+
+    static_app = FastAPI()
+    static_app.mount("/", PrecompressedStaticFiles(directory=tmp_path, html=True))
+    static_client = TestClient(static_app)
+
+    response = static_client.get("/static/main.3f2a9c1e.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert int(response.headers["content-length"]) == len(gzip.compress(script, 9, mtime=0))
+    assert response.content == script
+
+    index = static_client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in index.headers
+    assert index.headers["cache-control"] == "no-cache"
+
+
+def test_client_routes_fall_back_to_index(tmp_path):
+    (tmp_path / "index.html").write_bytes(b"<html><div id='root'></div></html>")
+    static_app = FastAPI()
+    static_app.mount("/", PrecompressedStaticFiles(directory=tmp_path, html=True))
+    static_client = TestClient(static_app)
+
+    for deep_link in ("/resources/42", "/profile", "/quizzes/abc/play"):
+        response = static_client.get(deep_link)
+        assert response.status_code == 200
+        assert response.content == b"<html><div id='root'></div></html>"
+        assert response.headers["cache-control"] == "no-cache"
+
+    # Missing assets and API paths stay 404
+    assert static_client.get("/static/main.0000000000.js").status_code == 404
+    assert static_client.get("/api/unknown").status_code == 404
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from conditional import ETagMiddleware, check_validators, make_etag
+
+MODIFIED = datetime(2024, 3, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+ETAG = make_etag("doc", 1)
+
+app = FastAPI()
+app.add_middleware(ETagMiddleware)
+calls = []
+
+
+@app.get("/validated")
+async def validated(request: Request, response: Response):
+    not_modified = check_validators(request, response, ETAG, MODIFIED)
+    if not_modified:
+        return not_modified
+    calls.append("validated")
+    return {"value": 1}
+
+
+@app.get("/plain")
+async def plain():
+    return {"value": 2}
+
+
+@app.get("/stream")
+async def stream():
+    return StreamingResponse(iter([b"data: 1\n\n"]), media_type="text/event-stream")
+
+
+client = TestClient(app)
+
+
+def test_validators_answer_304_without_running_the_route():
+    first = client.get("/validated")
+    assert first.headers["etag"] == ETAG
+    assert first.headers["last-modified"] == "Fri, 01 Mar 2024 12:30:15 GMT"
+
+    calls.clear()
+    assert client.get("/validated", headers={"If-None-Match": ETAG}).status_code == 304
+    assert client.get("/validated", headers={"If-None-Match": f'"other", W/{ETAG}'}).status_code == 304
+    assert client.get("/validated", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+    assert calls == []
+
+    assert client.get("/validated", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert client.get("/validated", headers={"If-Modified-Since": "Fri, 01 Mar 2024 12:30:14 GMT"}).status_code == 200
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    response = client.get("/validated", headers={
+        "If-None-Match": '"other"', "If-Modified-Since": "Fri, 01 Mar 2024 12:30:15 GMT"
+    })
+    assert response.status_code == 200
+
+
+def test_middleware_tags_json_bodies():
+    first = client.get("/plain")
+    assert first.headers["etag"].startswith('"')
+    again = client.get("/plain", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+
+
+def test_middleware_leaves_streams_alone():
+    response = client.get("/stream")
+    assert "etag" not in response.headers
+    assert response.text == "data: 1\n\n"
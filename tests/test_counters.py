@@ -0,0 +1,85 @@
+import asyncio
+
+from counters import decrement_comment_counts, increment_user_counter, reconcile_user_counters
+from migrations import MIGRATIONS
+
+
+async def seed(database):
+    await database.users.insert_many([
+        {"id": "alice", "resources_count": 0, "discussions_count": 0, "comments_count": 0},
+        {"id": "bob", "resources_count": 0, "discussions_count": 0, "comments_count": 0},
+    ])
+    await database.discussions.insert_many([
+        {"id": "d1", "author_id": "alice", "comment_count": 3},
+        {"id": "d2", "author_id": "bob", "comment_count": 1},
+    ])
+    await database.comments.insert_many([
+        {"id": "c1", "discussion_id": "d1", "author_id": "alice"},
+        {"id": "c2", "discussion_id": "d1", "author_id": "bob"},
+        {"id": "c3", "discussion_id": "d1", "author_id": "bob"},
+        {"id": "c4", "discussion_id": "d2", "author_id": "bob"},
+    ])
+    await database.resources.insert_many([{"id": "r1", "author_id": "alice"}, {"id": "r2", "author_id": "alice"}])
+    for user_id, field, amount in [
+        ("alice", "resources_count", 2), ("alice", "discussions_count", 1), ("alice", "comments_count", 1),
+        ("bob", "discussions_count", 1), ("bob", "comments_count", 3),
+    ]:
+        await increment_user_counter(database, user_id, field, amount)
+
+
+async def counters(database, collection, field):
+    return {doc["id"]: doc[field] for doc in await database[collection].find({}, {"_id": 0}).to_list(None)}
+
+
+def test_comment_deletes_decrement_user_and_discussion_counts(database):
+    async def scenario():
+        await seed(database)
+        deleted = await database.comments.find({"id": {"$in": ["c2", "c3", "c4"]}}, {"_id": 0}).to_list(None)
+        await database.comments.delete_many({"id": {"$in": ["c2", "c3", "c4"]}})
+        await decrement_comment_counts(database, deleted)
+        return await counters(database, "users", "comments_count"), await counters(database, "discussions", "comment_count")
+
+    users, discussions = asyncio.run(scenario())
+    assert users == {"alice": 1, "bob": 0}
+    assert discussions == {"d1": 1, "d2": 0}
+
+
+def test_reconcile_restores_drifted_counters(database):
+    async def scenario():
+        await seed(database)
+        assert await reconcile_user_counters(database) == 0
+
+        # A crash between a write and its $inc, or a lost decrement
+        await increment_user_counter(database, "alice", "resources_count", 5)
+        await increment_user_counter(database, "bob", "comments_count", -2)
+        assert await reconcile_user_counters(database) == 2
+        return await database.users.find({}, {"_id": 0}).sort("id", 1).to_list(None)
+
+    assert asyncio.run(scenario()) == [
+        {"id": "alice", "resources_count": 2, "discussions_count": 1, "comments_count": 1},
+        {"id": "bob", "resources_count": 0, "discussions_count": 1, "comments_count": 3},
+    ]
+
+
+def test_user_counters_migration_initializes_existing_users(database):
+    async def scenario():
+        await database.users.insert_many([{"id": "alice"}, {"id": "bob"}, {"id": "carol"}])
+        await database.resources.insert_many([{"id": "r1", "author_id": "alice"}])
+        await database.discussions.insert_many([{"id": "d1", "author_id": "bob"}])
+        await database.comments.insert_many([
+            {"id": "c1", "discussion_id": "d1", "author_id": "alice"},
+            {"id": "c2", "discussion_id": "d1", "author_id": "alice"},
+        ])
+        first = await MIGRATIONS["user_counters"](database, 2)
+        second = await MIGRATIONS["user_counters"](database, 2)
+        users = await database.users.find({}, {"_id": 0}).to_list(None)
+        return first, second, users
+
+    first, second, users = asyncio.run(scenario())
+    assert first == {"users": 3}
+    assert second == {"users": 0}
+    assert users == [
+        {"id": "alice", "resources_count": 1, "discussions_count": 0, "comments_count": 2},
+        {"id": "bob", "resources_count": 0, "discussions_count": 1, "comments_count": 0},
+        {"id": "carol", "resources_count": 0, "discussions_count": 0, "comments_count": 0},
+    ]
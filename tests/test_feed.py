@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+
+from feed import merge_timelines, timeline_keys
+from pagination import encode_cursor
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def entry(doc_id, minutes, doc_type="resource"):
+    return {"type": doc_type, "id": doc_id, "created_at": T0 + timedelta(minutes=minutes)}
+
+
+GLOBAL = [entry("g3", 30), entry("shared", 20), entry("g1", 10)]
+FACULTY = [entry("f2", 25), entry("shared", 20), entry("f1", 5, "discussion")]
+
+
+def test_timelines_are_merged_newest_first_without_duplicates():
+    page, next_cursor = merge_timelines([GLOBAL, FACULTY], None, 10)
+
+    assert [e["id"] for e in page] == ["g3", "f2", "shared", "g1", "f1"]
+    assert next_cursor is None
+
+
+def test_merged_feed_is_paginated_with_keyset_cursor():
+    first, cursor = merge_timelines([GLOBAL, FACULTY], None, 2)
+    second, cursor2 = merge_timelines([GLOBAL, FACULTY], cursor, 2)
+    third, cursor3 = merge_timelines([GLOBAL, FACULTY], cursor2, 2)
+
+    assert [e["id"] for e in first] == ["g3", "f2"]
+    assert cursor == encode_cursor(first[-1])
+    assert [e["id"] for e in second] == ["shared", "g1"]
+    assert [e["id"] for e in third] == ["f1"]
+    assert cursor3 is None
+
+
+def test_public_content_goes_to_every_author_audience_and_its_subject():
+    keys = timeline_keys(["global", "faculty:Sciences"], subject_id="s1")
+    assert keys == ["global", "faculty:Sciences", "subject:s1"]
+
+
+def test_group_discussion_goes_to_its_group_only():
+    keys = timeline_keys(["global", "faculty:Sciences"], subject_id="s1", group_audience="faculty:Sciences")
+    assert keys == ["faculty:Sciences"]
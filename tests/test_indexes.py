@@ -0,0 +1,78 @@
+"""
+Index registry tests.
+
+These run against the MongoDB configured in backend/.env (or MONGO_URL) on a
+throwaway database, and are skipped when no server is reachable.
+"""
+import asyncio
+import functools
+import os
+from pathlib import Path
+
+import pytest
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import INDEXES, QUERY_PLANS, check_query_plans, ensure_indexes, explain_query
+
+load_dotenv(Path(__file__).resolve().parent.parent / "backend" / ".env")
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = os.environ.get("DB_NAME", "univloop_db") + "_index_test"
+
+
+@functools.lru_cache(maxsize=None)
+def mongo_available() -> bool:
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+
+def run_with_db(test):
+    if not mongo_available():
+        pytest.skip("MongoDB is not reachable")
+
+    async def runner():
+        client = AsyncIOMotorClient(MONGO_URL)
+        await client.drop_database(TEST_DB_NAME)
+        try:
+            await test(client[TEST_DB_NAME])
+        finally:
+            await client.drop_database(TEST_DB_NAME)
+            client.close()
+    asyncio.run(runner())
+
+
+def test_ensure_indexes_is_idempotent():
+    async def test(database):
+        built = await ensure_indexes(database)
+        assert len(built) == sum(len(models) for models in INDEXES.values())
+        assert await ensure_indexes(database) == []
+    run_with_db(test)
+
+
+@pytest.mark.parametrize("name,collection,query,sort", QUERY_PLANS, ids=[plan[0] for plan in QUERY_PLANS])
+def test_route_query_uses_index(name, collection, query, sort):
+    async def test(database):
+        await ensure_indexes(database)
+        stages = await explain_query(database, collection, query, sort)
+        assert "IXSCAN" in stages, stages
+        assert "COLLSCAN" not in stages and "SORT" not in stages, stages
+    run_with_db(test)
+
+
+def test_check_query_plans_reports_missing_index():
+    async def test(database):
+        await ensure_indexes(database)
+        assert await check_query_plans(database) == []
+
+        await database.resources.drop_index("subject_id_1_created_at_-1_id_-1")
+        regressions = await check_query_plans(database)
+        assert "resources by subject" in [name for name, _ in regressions]
+    run_with_db(test)
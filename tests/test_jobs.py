@@ -0,0 +1,108 @@
+import asyncio
+from datetime import timedelta
+
+import jobs
+from jobs import OUTBOX_COLLECTION, claim_job, enqueue_job, job_handler, run_job
+from mongo import utcnow
+
+@job_handler("test_succeeds")
+async def succeeds(database, job):
+    pass
+
+
+@job_handler("test_fails")
+async def fails(database, job):
+    raise ValueError("boom")
+
+
+async def outbox_job(database, job_id):
+    return await database[OUTBOX_COLLECTION].find_one({"id": job_id}, {"_id": 0})
+
+
+def test_claim_leases_the_oldest_runnable_job(database):
+    async def scenario():
+        first = await enqueue_job(database, "test_succeeds", {})
+        await enqueue_job(database, "test_succeeds", {})
+        job = await claim_job(database)
+        assert job["id"] == first
+        assert job["status"] == "running"
+        assert job["attempts"] == 1
+        assert job["locked_until"] > utcnow() + timedelta(seconds=jobs.JOB_LEASE_SECONDS - 5)
+
+        second = await claim_job(database)
+        assert second["id"] != first
+        # Both leased: nothing left to claim
+        assert await claim_job(database) is None
+
+    asyncio.run(scenario())
+
+
+def test_running_job_is_reclaimed_after_its_lease_expires(database):
+    async def scenario():
+        job_id = await enqueue_job(database, "test_succeeds", {})
+        await claim_job(database)
+        assert await claim_job(database) is None
+
+        # The worker holding it died: the lease runs out
+        await database[OUTBOX_COLLECTION].update_one(
+            {"id": job_id}, {"$set": {"locked_until": utcnow() - timedelta(seconds=1)}}
+        )
+        job = await claim_job(database)
+        assert job["id"] == job_id
+        assert job["attempts"] == 2
+
+        await run_job(database, job)
+        assert (await outbox_job(database, job_id))["status"] == "done"
+
+    asyncio.run(scenario())
+
+
+def test_failures_back_off_exponentially(database):
+    async def scenario():
+        job_id = await enqueue_job(database, "test_fails", {})
+        for attempt in (1, 2, 3):
+            # Make the retry runnable now instead of waiting for the backoff
+            await database[OUTBOX_COLLECTION].update_one({"id": job_id}, {"$set": {"run_at": utcnow()}})
+            job = await claim_job(database)
+            assert job["attempts"] == attempt
+
+            before = utcnow()
+            await run_job(database, job)
+            stored = await outbox_job(database, job_id)
+            assert stored["status"] == "pending"
+            assert stored["last_error"] == "boom"
+            assert stored["locked_until"] is None
+            delay = (stored["run_at"] - before).total_seconds()
+            expected = jobs.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+            assert expected <= delay < expected + 1
+
+    asyncio.run(scenario())
+
+
+def test_job_fails_permanently_after_max_attempts(database, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 2)
+
+    async def scenario():
+        job_id = await enqueue_job(database, "test_fails", {})
+        for _ in range(2):
+            await database[OUTBOX_COLLECTION].update_one({"id": job_id}, {"$set": {"run_at": utcnow()}})
+            await run_job(database, await claim_job(database))
+
+        stored = await outbox_job(database, job_id)
+        assert stored["status"] == "failed"
+        assert stored["attempts"] == 2
+        # Failed jobs are never claimed again
+        assert await claim_job(database) is None
+
+    asyncio.run(scenario())
+
+
+def test_unknown_kind_is_recorded_as_an_error(database):
+    async def scenario():
+        job_id = await enqueue_job(database, "no_such_kind", {})
+        await run_job(database, await claim_job(database))
+        stored = await outbox_job(database, job_id)
+        assert stored["status"] == "pending"
+        assert stored["last_error"] == "No handler registered for job kind 'no_such_kind'"
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+import asyncio
+
+from indexes import INDEXES
+from likes import add_like, liked_ids, reconcile_like_counts, remove_like, toggle_like
+from migrations import MIGRATIONS
+
+
+async def seed(database):
+    await database.resource_likes.create_indexes(INDEXES["resource_likes"])
+    await database.resources.insert_many([
+        {"id": "r1", "author_id": "alice", "title": "Cours 1", "likes": 0},
+        {"id": "r2", "author_id": "alice", "title": "Cours 2", "likes": 0},
+    ])
+
+
+def test_double_like_and_double_unlike_are_no_ops(database):
+    async def scenario():
+        await seed(database)
+        first, added = await add_like(database, "r1", "bob")
+        assert added and first["likes"] == 1
+        again, added = await add_like(database, "r1", "bob")
+        assert not added and again["likes"] == 1
+
+        first, removed = await remove_like(database, "r1", "bob")
+        assert removed and first["likes"] == 0
+        again, removed = await remove_like(database, "r1", "bob")
+        assert not removed and again["likes"] == 0
+        return await database.resource_likes.count_documents({})
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_missing_resource_keeps_no_like(database):
+    async def scenario():
+        await seed(database)
+        assert await add_like(database, "missing", "bob") == (None, False)
+        return await database.resource_likes.count_documents({})
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_liked_ids_reflects_state(database):
+    async def scenario():
+        await seed(database)
+        assert await liked_ids(database, "bob", []) == set()
+        await toggle_like(database, "r1", "bob")
+        await toggle_like(database, "r2", "bob")
+        await toggle_like(database, "r2", "carol")
+        assert await liked_ids(database, "bob", ["r1", "r2", "r3"]) == {"r1", "r2"}
+        resource, liked = await toggle_like(database, "r2", "bob")
+        assert not liked and resource["likes"] == 1
+        return await liked_ids(database, "bob", ["r1", "r2"])
+
+    assert asyncio.run(scenario()) == {"r1"}
+
+
+def test_resource_likes_migration_is_idempotent(database):
+    async def scenario():
+        await database.resource_likes.create_indexes(INDEXES["resource_likes"])
+        await database.resources.insert_many([
+            {"id": "r1", "likes": 5, "liked_by": ["bob", "carol", "bob"]},
+            {"id": "r2", "likes": 1, "liked_by": []},
+        ])
+        # A like made through the new code before the migration ran
+        await database.resource_likes.insert_one({"resource_id": "r1", "user_id": "bob", "created_at": None})
+        first = await MIGRATIONS["resource_likes"](database, 1)
+        second = await MIGRATIONS["resource_likes"](database, 1)
+        resources = await database.resources.find({}, {"_id": 0, "id": 1, "likes": 1, "liked_by": 1}).to_list(None)
+        return first, second, resources, await database.resource_likes.count_documents({})
+
+    first, second, resources, likes = asyncio.run(scenario())
+    assert first["resources"] == 2
+    assert second == {"resources": 0, "resource_likes": 0}
+    assert resources == [{"id": "r1", "likes": 2}, {"id": "r2", "likes": 0}]
+    assert likes == 2
+
+
+def test_reconcile_repairs_like_counts(database):
+    async def scenario():
+        await seed(database)
+        await add_like(database, "r1", "bob")
+        await add_like(database, "r1", "carol")
+        # A crash between the like insert and its $inc
+        await database.resource_likes.insert_one({"resource_id": "r2", "user_id": "bob", "created_at": None})
+        await database.resources.update_one({"id": "r1"}, {"$inc": {"likes": 3}})
+        fixed = await reconcile_like_counts(database)
+        resources = await database.resources.find({}, {"_id": 0, "id": 1, "likes": 1}).to_list(None)
+        return fixed, resources, await reconcile_like_counts(database)
+
+    fixed, resources, again = asyncio.run(scenario())
+    assert fixed == 2
+    assert resources == [{"id": "r1", "likes": 2}, {"id": "r2", "likes": 1}]
+    assert again == 0
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from migrations import MIGRATIONS
+
+STORED = datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc)
+
+
+async def seed(database):
+    await database.users.insert_many([
+        {"id": "u1", "created_at": "2024-03-01T12:30:15.250000+00:00", "updated_at": STORED},
+        {"id": "u2", "created_at": STORED, "updated_at": STORED},
+    ])
+    await database.resources.insert_one(
+        {"id": "r1", "created_at": "2024-03-01T12:30:15", "updated_at": "2024-03-01T14:30:15+02:00"}
+    )
+    await database.discussions.insert_one(
+        {"id": "d1", "created_at": "2024-03-02T09:00:00+00:00", "updated_at": STORED, "last_comment_at": None}
+    )
+    await database.outbox.insert_one({
+        "id": "j1", "run_at": "2024-03-03T10:00:00+00:00", "locked_until": None,
+        "created_at": "2024-03-03T10:00:00+00:00", "updated_at": "2024-03-03T10:00:00+00:00"
+    })
+
+
+async def snapshot(database):
+    return {
+        collection: await database[collection].find({}, {"_id": 0}).sort("id", 1).to_list(None)
+        for collection in ("users", "resources", "discussions", "outbox")
+    }
+
+
+def test_dates_to_bson_converts_strings_once(database):
+    async def scenario():
+        await seed(database)
+        first = await MIGRATIONS["dates_to_bson"](database, 2)
+        after_first = await snapshot(database)
+        second = await MIGRATIONS["dates_to_bson"](database, 2)
+        return first, after_first, second, await snapshot(database)
+
+    first, after_first, second, after_second = asyncio.run(scenario())
+    assert {k: v for k, v in first.items() if v} == {"users": 1, "resources": 1, "discussions": 1, "outbox": 1}
+    assert not any(second.values())
+    assert after_second == after_first
+
+    dates = [
+        value for docs in after_first.values() for doc in docs
+        for key, value in doc.items() if key != "id" and value is not None
+    ]
+    assert len(dates) == 11
+    assert all(isinstance(value, datetime) and value.utcoffset() == timedelta(0) for value in dates)
+
+    users = {doc["id"]: doc for doc in after_first["users"]}
+    assert users["u1"]["created_at"] == datetime(2024, 3, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+    assert users["u2"]["created_at"] == STORED
+    resource = after_first["resources"][0]
+    # Naive strings are UTC; offsets are converted
+    assert resource["created_at"] == datetime(2024, 3, 1, 12, 30, 15, tzinfo=timezone.utc)
+    assert resource["updated_at"] == datetime(2024, 3, 1, 12, 30, 15, tzinfo=timezone.utc)
+
+
+def embedded(comment_id, minutes, author_id="u1"):
+    created_at = (STORED + timedelta(minutes=minutes)).isoformat()
+    return {"id": comment_id, "author_id": author_id, "content": comment_id, "created_at": created_at}
+
+
+def test_split_discussion_comments_resumes_and_merges_new_comments(database):
+    async def scenario():
+        await database.discussions.insert_many([
+            # A comment was added through the new code before the migration ran
+            {"id": "d1", "comments": [embedded("c1", 1), embedded("c2", 2)],
+             "comment_count": 1, "last_comment_at": STORED + timedelta(minutes=30)},
+            {"id": "d2", "comments": [embedded("c3", 3), embedded("c4", 40, "u2")], "comment_count": 0},
+            {"id": "d3", "comments": []},
+        ])
+        await database.comments.insert_one(
+            {"id": "new", "discussion_id": "d1", "author_id": "u2", "created_at": STORED + timedelta(minutes=30)}
+        )
+        # An interrupted run: d2's comments were copied, the discussion was not updated
+        await database.comments.insert_one({**embedded("c3", 3), "discussion_id": "d2", "created_at": STORED})
+
+        first = await MIGRATIONS["split_discussion_comments"](database, 2)
+        second = await MIGRATIONS["split_discussion_comments"](database, 2)
+        discussions = await database.discussions.find({}, {"_id": 0}).sort("id", 1).to_list(None)
+        comments = await database.comments.find({}, {"_id": 0, "id": 1, "discussion_id": 1}).sort("id", 1).to_list(None)
+        return first, second, discussions, comments
+
+    first, second, discussions, comments = asyncio.run(scenario())
+    assert first == {"discussions": 3, "comments": 4}
+    assert second == {"discussions": 0, "comments": 0}
+    assert discussions == [
+        {"id": "d1", "comment_count": 3, "last_comment_at": STORED + timedelta(minutes=30)},
+        {"id": "d2", "comment_count": 2, "last_comment_at": STORED + timedelta(minutes=40)},
+        {"id": "d3", "comment_count": 0},
+    ]
+    # Upserts by id: the comment copied by the interrupted run is not duplicated
+    assert [(c["id"], c["discussion_id"]) for c in comments] == [
+        ("c1", "d1"), ("c2", "d1"), ("c3", "d2"), ("c4", "d2"), ("new", "d1")
+    ]
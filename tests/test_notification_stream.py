@@ -0,0 +1,75 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import notifications
+from models import User
+from notifications import (
+    NotificationHub, create_stream_ticket, notification_hub, notification_stream, redeem_stream_ticket
+)
+
+
+def make_user(user_id, faculty=None):
+    joined = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return User(id=user_id, name=user_id, email=f"{user_id}@example.com", faculty=faculty,
+                created_at=joined, updated_at=joined)
+
+
+def event(event_id, actor_id, audience="global"):
+    return {"id": event_id, "audience": audience, "actor_id": actor_id, "type": "resource",
+            "title": "Nouvelle ressource", "message": "m", "link": None,
+            "created_at": datetime(2024, 2, 1, tzinfo=timezone.utc)}
+
+
+def test_hub_routes_by_key_and_stops_feeding_stalled_subscribers():
+    hub = NotificationHub(queue_size=1)
+    alice = hub.subscribe(make_user("alice", faculty="Sciences"))
+    bob = hub.subscribe(make_user("bob"))
+
+    hub.publish("faculty:Sciences", {"id": "1"})
+    assert alice.queue.qsize() == 1 and bob.queue.empty()
+
+    hub.publish("global", {"id": "2"})
+    assert alice.overflowed and bob.queue.qsize() == 1
+
+    hub.unsubscribe(alice)
+    hub.unsubscribe(bob)
+    assert not hub._subscribers
+
+
+def test_stream_pushes_events_from_others_only():
+    async def scenario():
+        stream = notification_stream(None, make_user("alice"))
+        assert (await stream.__anext__()).startswith("retry:")
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        notification_hub.publish("global", event("own", "alice"))
+        notification_hub.publish("global", event("e1", "bob"))
+        message = await asyncio.wait_for(pending, timeout=1)
+        await stream.aclose()
+        return message
+
+    message = asyncio.run(scenario())
+    lines = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    assert lines["event"] == "notification"
+    data = json.loads(lines["data"])
+    assert data["id"] == "e1" and data["user_id"] == "alice" and data["read"] is False
+    assert not notification_hub._subscribers
+
+
+def test_stream_tickets_are_single_use_and_expire(database, monkeypatch):
+    user = make_user("u1")
+
+    async def scenario():
+        ticket = await create_stream_ticket(database, user)
+        stored = await database.stream_tickets.find_one({})
+        assert stored["ticket"] != ticket and stored["user_id"] == "u1"
+        assert await redeem_stream_ticket(database, ticket) == "u1"
+        assert await redeem_stream_ticket(database, ticket) is None
+        assert await redeem_stream_ticket(database, "forged") is None
+
+        monkeypatch.setattr(notifications, "STREAM_TICKET_TTL", -1)
+        expired = await create_stream_ticket(database, user)
+        return await redeem_stream_ticket(database, expired)
+
+    assert asyncio.run(scenario()) is None
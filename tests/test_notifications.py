@@ -0,0 +1,137 @@
+import asyncio
+from datetime import timedelta
+
+import notifications
+from models import User
+from mongo import utcnow
+from notifications import dismiss, list_notifications, mark_all_read, mark_read
+
+NOW = utcnow()
+
+
+def make_user(user_id="reader", **fields):
+    created_at = fields.pop("created_at", NOW - timedelta(days=30))
+    return User(
+        id=user_id, name=user_id, email=f"{user_id}@example.org",
+        created_at=created_at, updated_at=created_at, **fields
+    )
+
+
+READER = make_user(department="Informatique")
+
+
+def event(event_id, minutes_ago, audience="global", actor_id="author"):
+    return {
+        "id": event_id, "audience": audience, "actor_id": actor_id, "type": "resource",
+        "title": "Nouvelle ressource", "message": event_id, "link": None,
+        "created_at": NOW - timedelta(minutes=minutes_ago)
+    }
+
+
+def targeted(notification_id, minutes_ago, user_id="reader"):
+    return {
+        "id": notification_id, "user_id": user_id, "type": "like", "title": "J'aime",
+        "message": notification_id, "link": None, "read": False,
+        "created_at": NOW - timedelta(minutes=minutes_ago)
+    }
+
+
+def ids(items):
+    return [item["id"] for item in items]
+
+
+def test_merges_targeted_and_visible_events_newest_first(database):
+    async def scenario():
+        await database.events.insert_many([
+            event("global", 1),
+            event("own", 2, actor_id="reader"),
+            event("department", 3, audience="department:Informatique"),
+            event("other-department", 4, audience="department:Droit"),
+            event("before-signup", 60 * 24 * 31),
+        ])
+        await database.notifications.insert_many([targeted("like", 5), targeted("not-mine", 6, user_id="someone")])
+        return await list_notifications(database, READER, limit=10)
+
+    items = asyncio.run(scenario())
+    # Own events, other audiences and events older than the account are not shown
+    assert ids(items) == ["global", "department", "like"]
+    assert not any(item["read"] for item in items)
+    assert all(item["user_id"] == "reader" for item in items)
+
+
+def test_pages_past_dismissed_events(database):
+    async def scenario():
+        await database.events.insert_many([event(f"e{i}", i) for i in range(12)])
+        for i in range(8):
+            await dismiss(database, READER, f"e{i}")
+        return await list_notifications(database, READER, limit=4)
+
+    # The first two pages of events are all dismissed: a third round fills the page
+    assert ids(asyncio.run(scenario())) == ["e8", "e9", "e10", "e11"]
+
+
+def test_event_scan_is_bounded(database, monkeypatch):
+    monkeypatch.setattr(notifications, "MAX_EVENT_SCAN_ROUNDS", 2)
+
+    async def scenario():
+        await database.events.insert_many([event(f"e{i}", i) for i in range(12)])
+        for i in range(8):
+            await dismiss(database, READER, f"e{i}")
+        return await list_notifications(database, READER, limit=4)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_mark_read(database):
+    async def scenario():
+        await database.events.insert_many([event("visible", 1), event("elsewhere", 2, audience="faculty:Droit")])
+        await database.notifications.insert_one(targeted("like", 3))
+        assert await mark_read(database, READER, "visible")
+        assert await mark_read(database, READER, "like")
+        # Events outside the user's audiences and unknown ids are not found
+        assert not await mark_read(database, READER, "elsewhere")
+        assert not await mark_read(database, READER, "missing")
+        return await list_notifications(database, READER, limit=10)
+
+    items = asyncio.run(scenario())
+    assert [(item["id"], item["read"]) for item in items] == [("visible", True), ("like", True)]
+
+
+def test_mark_all_read_keeps_dismissals(database):
+    async def scenario():
+        await database.events.insert_many([event("old", 3), event("dismissed", 2), event("read", 1)])
+        await database.notifications.insert_one(targeted("like", 4))
+        await dismiss(database, READER, "dismissed")
+        await mark_read(database, READER, "read")
+        await mark_all_read(database, READER)
+
+        # Read receipts are folded into the cursor; the dismissal is kept
+        receipts = await database.event_receipts.find({"user_id": "reader"}, {"_id": 0}).to_list(None)
+        assert receipts == [{"user_id": "reader", "event_id": "dismissed", "dismissed": True}]
+
+        await database.events.insert_one(event("newer", -1))
+        return await list_notifications(database, READER, limit=10)
+
+    items = asyncio.run(scenario())
+    assert [(item["id"], item["read"]) for item in items] == [
+        ("newer", False), ("read", True), ("old", True), ("like", True)
+    ]
+
+
+def test_dismiss(database):
+    async def scenario():
+        await database.events.insert_one(event("broadcast", 1))
+        await database.notifications.insert_one(targeted("like", 2))
+        assert await dismiss(database, READER, "broadcast")
+        assert await dismiss(database, READER, "like")
+        assert not await dismiss(database, READER, "like")
+        # The event itself stays for everyone else
+        other = make_user("other")
+        return (
+            await list_notifications(database, READER, limit=10),
+            await list_notifications(database, other, limit=10),
+        )
+
+    mine, theirs = asyncio.run(scenario())
+    assert mine == []
+    assert ids(theirs) == ["broadcast"]
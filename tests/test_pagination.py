@@ -0,0 +1,76 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from mongo import utcnow
+from pagination import KEYSET_SORT, THREAD_SORT, apply_cursor, decode_cursor, encode_cursor, keyset_filter, paginate
+
+NOW = utcnow()
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"id": "r-42", "created_at": NOW, "title": "ignored"})
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (NOW, "r-42")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    "e30",  # {}
+    "WzEsMl0",  # [1,2]
+    "WyJub3QgYSBkYXRlIiwieCJd",  # ["not a date","x"]
+    "WyIyMDI0LTAxLTAxIl0",  # ["2024-01-01"]
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_no_cursor_keeps_the_route_filter():
+    assert keyset_filter(None) == {}
+    assert apply_cursor({"subject_id": "math"}, None) == {"subject_id": "math"}
+    cursor = encode_cursor({"id": "x", "created_at": NOW})
+    assert apply_cursor({}, cursor) == keyset_filter(cursor)
+
+
+async def pages(collection, query, sort, limit):
+    seen, cursor = [], None
+    while True:
+        page_query = apply_cursor(query, cursor, ascending=sort == THREAD_SORT)
+        docs = await collection.find(page_query).sort(sort).limit(limit + 1).to_list(None)
+        docs, cursor = paginate(docs, limit)
+        seen.append([doc["id"] for doc in docs])
+        if cursor is None:
+            return seen
+
+
+def test_ties_on_created_at_across_page_boundaries(database):
+    # Five documents share one timestamp: pages split them on id, none is skipped or repeated
+    docs = [{"id": f"t{i}", "created_at": NOW, "subject_id": "math"} for i in range(5)]
+    docs += [{"id": "older", "created_at": NOW - timedelta(seconds=1), "subject_id": "math"}]
+
+    async def scenario():
+        await database.items.insert_many(docs)
+        return await pages(database.items, {}, KEYSET_SORT, 2), await pages(database.items, {}, THREAD_SORT, 4)
+
+    newest_first, oldest_first = asyncio.run(scenario())
+    assert newest_first == [["t4", "t3"], ["t2", "t1"], ["t0", "older"]]
+    assert oldest_first == [["older", "t0", "t1", "t2"], ["t3", "t4"]]
+
+
+def test_apply_cursor_keeps_the_route_filter(database):
+    docs = [
+        {"id": f"d{i}", "created_at": NOW - timedelta(minutes=i), "subject_id": "math" if i % 2 else "eco"}
+        for i in range(8)
+    ]
+
+    async def scenario():
+        await database.items.insert_many(docs)
+        return await pages(database.items, {"subject_id": "math"}, KEYSET_SORT, 2)
+
+    assert asyncio.run(scenario()) == [["d1", "d3"], ["d5", "d7"]]
+    cursor = encode_cursor(docs[1])
+    assert apply_cursor({"subject_id": "math"}, cursor) == {"$and": [{"subject_id": "math"}, keyset_filter(cursor)]}
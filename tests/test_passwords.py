@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from passwords import PasswordPool
+
+
+def test_hash_verify_and_metrics():
+    pool = PasswordPool(workers=1, max_pending=4)
+
+    async def scenario():
+        hashed = await pool.hash("secret")
+        return hashed, await pool.verify_and_update("secret", hashed), await pool.verify_and_update("nope", hashed)
+
+    hashed, (valid, new_hash), (invalid, _) = asyncio.run(scenario())
+    assert valid and new_hash is None and not invalid
+    metrics = pool.metrics()
+    assert metrics["completed"] == 3 and metrics["pending"] == 0 and metrics["rejected"] == 0
+    pool.shutdown()
+
+
+def test_outdated_cost_is_rehashed_on_verify():
+    pool = PasswordPool(workers=1, max_pending=4)
+    weak_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+
+    valid, new_hash = asyncio.run(pool.verify_and_update("secret", weak_hash))
+    assert valid and new_hash is not None and new_hash != weak_hash
+    pool.shutdown()
+
+
+def test_requests_beyond_the_queue_bound_are_rejected():
+    pool = PasswordPool(workers=1, max_pending=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.hash("a"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as excinfo:
+            await pool.hash("b")
+        await first
+        return excinfo.value.status_code
+
+    assert asyncio.run(scenario()) == 503
+    assert pool.metrics()["rejected"] == 1
+    pool.shutdown()
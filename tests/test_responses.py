@@ -0,0 +1,79 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from models import (
+    Comment, Discussion, Flashcard, FlashcardSummary, Quiz, QuizSummary, Resource, ResourceSummary
+)
+from responses import FastJSONResponse, ModelShape, page_response
+
+NOW = datetime(2024, 5, 2, 8, 15, 30, 123000, tzinfo=timezone.utc)
+BASE = {"_id": "mongo-id", "created_at": NOW, "updated_at": NOW, "author_id": "u1", "author_name": "Ana"}
+
+# Minimal documents (defaults left to the model) and full ones (every field stored)
+DOCUMENTS = [
+    (Resource, {**BASE, "id": "r1", "title": "Cours", "subject_id": "s1", "type": "pdf", "file_url": "/u/a.pdf"}),
+    (Resource, {**BASE, "id": "r2", "title": "Cours é", "description": "d", "subject_id": "s1", "type": "video",
+                "file_url": "/u/b.mp4", "thumbnail_url": "/t.png", "likes": 3, "views": 9, "liked_by": ["u2"],
+                "author_avatar": "/a.png", "extra": "ignored"}),
+    (Discussion, {**BASE, "id": "d1", "title": "Question", "content": "?"}),
+    (Discussion, {**BASE, "id": "d2", "title": "Q", "content": "c", "subject_id": "s1", "subject_name": "Maths",
+                  "group_type": "faculty", "comment_count": 2, "last_comment_at": NOW, "views": 4, "solved": True,
+                  "comments": [{"id": "legacy"}]}),
+    (Comment, {"_id": "x", "id": "c1", "discussion_id": "d1", "author_id": "u1", "author_name": "Ana",
+               "content": "ok", "created_at": NOW}),
+    (Quiz, {**BASE, "id": "q1", "title": "Quiz", "subject_id": "s1", "duration": 10, "difficulty": "easy",
+            "questions": [{"question": "1+1", "options": ["1", "2"], "correct_answer": 1}]}),
+    (Flashcard, {**BASE, "id": "f1", "title": "Cartes", "subject_id": "s1",
+                 "cards": [{"front": "a", "back": "b"}], "views": 2}),
+    (ResourceSummary, {**BASE, "id": "r3", "title": "Cours", "subject_id": "s1", "type": "pdf",
+                       "file_url": "/u/a.pdf", "liked_by_me": True}),
+    (QuizSummary, {**BASE, "id": "q2", "title": "Quiz", "subject_id": "s1", "duration": 10,
+                   "difficulty": "easy", "question_count": 3}),
+    (FlashcardSummary, {**BASE, "id": "f2", "title": "Cartes", "subject_id": "s1", "card_count": 12}),
+]
+
+
+@pytest.mark.parametrize("model, doc", DOCUMENTS)
+def test_fast_path_matches_model_serialization(model, doc):
+    fast = FastJSONResponse(ModelShape(model).dump(doc)).body
+    assert fast == model(**doc).model_dump_json().encode()
+
+
+@pytest.mark.parametrize("model", [Resource, Discussion, Comment, Quiz, Flashcard, ResourceSummary,
+                                   QuizSummary, FlashcardSummary])
+def test_projection_covers_exactly_the_model_fields(model):
+    projection = ModelShape(model).projection
+    assert projection.pop("_id") == 0
+    assert set(projection) == set(model.model_fields)
+
+
+def test_missing_required_field_falls_back_to_model_validation():
+    with pytest.raises(ValueError):
+        ModelShape(Comment).dump({"id": "c1"})
+
+
+def test_page_keeps_route_headers_but_not_length():
+    class RouteResponse:
+        headers = {"etag": '"v1"', "content-length": "0"}
+
+    page = page_response(ModelShape(Comment), [DOCUMENTS[4][1]], "next", RouteResponse())
+    assert page.headers["etag"] == '"v1"'
+    assert int(page.headers["content-length"]) == len(page.body)
+    assert json.loads(page.body)["next_cursor"] == "next"
+
+
+def test_sparse_fieldset_keeps_model_order_and_id():
+    shape = ModelShape(QuizSummary).only("title, question_count")
+    assert shape.projection == {"_id": 0, "created_at": 1, "id": 1, "title": 1, "question_count": 1}
+    assert list(shape.dump({"id": "q", "title": "Quiz", "question_count": 2, "created_at": NOW})) == [
+        "id", "title", "question_count"
+    ]
+
+
+def test_sparse_fieldset_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as excinfo:
+        ModelShape(QuizSummary).only("title,questions")
+    assert excinfo.value.status_code == 400
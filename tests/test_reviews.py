@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+from reviews import INITIAL_EASE, MIN_EASE, schedule
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+NEW_CARD = {"ease": INITIAL_EASE, "interval": 0, "repetitions": 0, "lapses": 0}
+
+
+def review(state, *grades):
+    for grade in grades:
+        state = {**state, **schedule(state, grade, NOW)}
+    return state
+
+
+def test_intervals_grow_with_successful_reviews():
+    state = review(NEW_CARD, 4)
+    assert state["interval"] == 1
+    state = review(state, 4)
+    assert state["interval"] == 6
+    state = review(state, 4)
+    assert state["interval"] == 15  # grade 4 keeps the ease at 2.5
+    assert state["repetitions"] == 3
+    assert state["due_at"] == NOW + timedelta(days=state["interval"])
+
+
+def test_perfect_recall_raises_ease_and_hard_recall_lowers_it():
+    assert review(NEW_CARD, 5)["ease"] > INITIAL_EASE
+    assert review(NEW_CARD, 3)["ease"] < INITIAL_EASE
+
+
+def test_lapse_resets_the_card():
+    state = review(NEW_CARD, 5, 5, 5, 1)
+
+    assert state["repetitions"] == 0
+    assert state["interval"] == 1
+    assert state["lapses"] == 1
+    assert state["last_reviewed_at"] == NOW
+
+
+def test_ease_has_a_floor():
+    assert review(NEW_CARD, 0, 0, 0, 0, 0, 0, 0)["ease"] == MIN_EASE
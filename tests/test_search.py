@@ -0,0 +1,109 @@
+import asyncio
+
+import search
+from mongo import utcnow
+from search import TOMBSTONES_COLLECTION, SearchIndex, fold, sync_search_index, tokenize, unindex_document
+
+
+def test_fold_strips_accents_and_case():
+    assert fold("Mathématiques") == "mathematiques"
+    assert fold("Économie") == "economie"
+
+
+def test_tokenize_drops_stop_words_and_plurals():
+    assert tokenize("Les bases de données") == ["base", "donnee"]
+    assert tokenize("Les journaux régionaux") == ["journal", "regional"]
+
+
+def build_index():
+    index = SearchIndex()
+    index.add("resource", "r1", "Cours de Mathématiques", "Analyse et algèbre linéaire", subject_id="math")
+    index.add("resource", "r2", "Introduction à l'économie", "Microéconomie et marchés", subject_id="eco")
+    index.add("discussion", "d1", "Question sur l'algèbre", "Comment diagonaliser une matrice ?", subject_id="math")
+    index.add("discussion", "d2", "Examen d'économie", "Les mathématiques sont-elles utiles en économie ?", subject_id="eco")
+    return index
+
+
+def test_accent_insensitive_match():
+    index = build_index()
+    total, hits = index.search("economie")
+    assert total == 2
+    assert {doc_id for _, _, doc_id in hits} == {"r2", "d2"}
+
+
+def test_title_match_ranks_first():
+    index = build_index()
+    _, hits = index.search("algebre ")
+    assert [doc_id for _, _, doc_id in hits] == ["d1", "r1"]
+
+
+def test_prefix_expansion_of_last_word():
+    index = build_index()
+    _, hits = index.search("math")
+    assert {doc_id for _, _, doc_id in hits} == {"r1", "d2"}
+
+
+def test_type_and_subject_filters():
+    index = build_index()
+    _, hits = index.search("economie", doc_types=["discussion"])
+    assert [doc_id for _, _, doc_id in hits] == ["d2"]
+    _, hits = index.search("algebre", subject_id="eco")
+    assert hits == []
+
+
+def test_pagination():
+    index = build_index()
+    total, first = index.search("economie", limit=1)
+    _, second = index.search("economie", offset=1, limit=1)
+    assert total == 2
+    assert first[0][2] != second[0][2]
+
+
+def test_update_and_remove():
+    index = build_index()
+    index.add("resource", "r1", "Cours de physique", "Mécanique", subject_id="phys")
+    assert index.search("algebre ")[1][0][2] == "d1"
+    assert len(index.search("algebre ")[1]) == 1
+    index.remove("discussion", "d1")
+    assert index.search("algebre")[0] == 0
+    assert "algebre" not in index.postings
+    assert len(index) == 3
+
+
+def test_sync_applies_other_workers_writes_and_deletes(database, monkeypatch):
+    monkeypatch.setattr(search, "search_index", SearchIndex())
+    monkeypatch.setattr(search, "_last_sync", None)
+
+    async def scenario():
+        await database.resources.insert_many([
+            {"id": "r1", "title": "Cours d'algèbre", "description": "Matrices", "updated_at": utcnow()},
+            {"id": "r2", "title": "Algèbre linéaire", "description": "Espaces vectoriels", "updated_at": utcnow()},
+        ])
+        assert await sync_search_index(database) == 2
+
+        # Another worker deletes r1 and adds r3; this worker only sees them through the sync
+        await database.resources.delete_one({"id": "r1"})
+        await database[TOMBSTONES_COLLECTION].insert_one(
+            {"doc_type": "resource", "doc_id": "r1", "deleted_at": utcnow()}
+        )
+        await database.resources.insert_one(
+            {"id": "r3", "title": "Exercices d'algèbre", "description": None, "updated_at": utcnow()}
+        )
+        await sync_search_index(database)
+        return search.search_index.search("algebre")
+
+    total, hits = asyncio.run(scenario())
+    assert total == 2
+    assert {doc_id for _, _, doc_id in hits} == {"r2", "r3"}
+
+
+def test_unindex_document_leaves_a_tombstone(database, monkeypatch):
+    monkeypatch.setattr(search, "search_index", SearchIndex())
+    search.index_document("discussion", {"id": "d1", "title": "Algèbre", "content": "Matrices"})
+
+    async def scenario():
+        await unindex_document(database, "discussion", "d1")
+        return await database[TOMBSTONES_COLLECTION].find({}, {"_id": 0, "doc_type": 1, "doc_id": 1}).to_list(None)
+
+    assert asyncio.run(scenario()) == [{"doc_type": "discussion", "doc_id": "d1"}]
+    assert len(search.search_index) == 0
@@ -0,0 +1,54 @@
+import asyncio
+
+from stats import StatisticsService
+
+
+class FakeCollection:
+    def __init__(self, count):
+        self.count = count
+
+    async def estimated_document_count(self):
+        return self.count
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        return FakeCollection(0)
+
+
+def test_totals_are_adjusted_locally_and_replaced_on_sync():
+    service = StatisticsService(max_staleness=300)
+    database = FakeDatabase(resources=FakeCollection(10), users=FakeCollection(3))
+
+    stats = asyncio.run(service.get(database))
+    assert stats.total_resources == 10 and stats.total_users == 3
+
+    service.adjust("resources")
+    service.adjust("users", -1)
+    stats = asyncio.run(service.get(FakeDatabase()))
+    assert stats.total_resources == 11 and stats.total_users == 2
+
+    asyncio.run(service.sync(database))
+    assert asyncio.run(service.get(database)).total_resources == 10
+
+
+def test_stale_totals_are_resynced_on_read():
+    service = StatisticsService(max_staleness=0)
+    asyncio.run(service.get(FakeDatabase(quizzes=FakeCollection(1))))
+    assert asyncio.run(service.get(FakeDatabase(quizzes=FakeCollection(4)))).total_quizzes == 4
+
+
+def test_etag_follows_the_totals_served():
+    service = StatisticsService(max_staleness=300)
+    database = FakeDatabase(resources=FakeCollection(10))
+
+    etag, stats = asyncio.run(service.snapshot(database))
+    # Writes elsewhere do not change the tag until this process's totals change
+    database["resources"] = FakeCollection(12)
+    assert asyncio.run(service.snapshot(database)) == (etag, stats)
+
+    asyncio.run(service.sync(database))
+    synced_etag, synced = asyncio.run(service.snapshot(database))
+    assert synced_etag != etag and synced.total_resources == 12
+    service.adjust("resources")
+    assert asyncio.run(service.snapshot(database))[0] not in (etag, synced_etag)
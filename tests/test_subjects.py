@@ -0,0 +1,64 @@
+import asyncio
+
+import subjects
+from conditional import CollectionVersions
+from subjects import SubjectCatalog
+
+
+class FakeSubjects:
+    def __init__(self, docs):
+        self.docs = docs
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return next((dict(d) for d in self.docs if d["id"] == query["id"]), None)
+
+
+class FakeDatabase:
+    def __init__(self, docs):
+        self.subjects = FakeSubjects(docs)
+
+
+def test_lookups_are_served_from_memory_after_a_miss():
+    catalog = SubjectCatalog()
+    database = FakeDatabase([{"id": "s1", "name": "Maths"}])
+
+    assert asyncio.run(catalog.get(database, "s1"))["name"] == "Maths"
+    assert asyncio.run(catalog.get(database, "s1"))["name"] == "Maths"
+    assert asyncio.run(catalog.get(database, "missing")) is None
+    assert database.subjects.lookups == 2
+
+
+def test_added_subjects_need_no_lookup():
+    catalog = SubjectCatalog()
+    database = FakeDatabase([])
+    catalog.add({"_id": object(), "id": "s2", "name": "Physique"})
+
+    assert asyncio.run(catalog.get(database, "s2")) == {"id": "s2", "name": "Physique"}
+    assert database.subjects.lookups == 0
+
+
+def test_snapshot_reloads_when_the_collection_moved_on(database, monkeypatch):
+    collection_versions = CollectionVersions()
+    monkeypatch.setattr(subjects, "collection_versions", collection_versions)
+
+    async def scenario():
+        catalog = SubjectCatalog()
+        await database.subjects.insert_one({"id": "s1", "name": "Maths"})
+        first_etag, first = await catalog.snapshot(database)
+        assert await catalog.snapshot(database) == (first_etag, first)
+
+        # Another worker adds a subject and bumps the version; this catalog has not polled yet
+        await database.subjects.insert_one({"id": "s2", "name": "Physique"})
+        await collection_versions.bump(database, "subjects")
+        second_etag, second = await catalog.snapshot(database)
+        assert second_etag != first_etag
+        assert [s["id"] for s in second] == ["s1", "s2"]
+
+        # A subject added in process changes the tag with the body
+        catalog.add({"id": "s3", "name": "Chimie"})
+        third_etag, third = await catalog.snapshot(database)
+        assert third_etag != second_etag and len(third) == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import uploads
+from uploads import (
+    blob_id, blob_path, collect_blobs, file_response, find_upload, missing_blobs, parse_range, receive_file,
+    release_blobs, retain_blobs, store_upload
+)
+
+
+class FakeRequest:
+    def __init__(self, body, content_length=None, chunk_size=5, headers=None):
+        self.headers = {"content-length": str(content_length if content_length is not None else len(body))}
+        self.headers.update(headers or {})
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self._body), self._chunk_size):
+            yield self._body[start:start + self._chunk_size]
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 8)
+    return tmp_path
+
+
+def test_parse_range_forms():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+    assert parse_range("bytes=50-5000", 100) == (50, 99)
+
+
+def test_parse_range_ignores_unsupported_ranges():
+    assert parse_range("items=0-9", 100) is None
+    assert parse_range("bytes=0-9,20-29", 100) is None
+    assert parse_range("bytes=a-b", 100) is None
+
+
+def test_parse_range_unsatisfiable():
+    for header in ("bytes=100-", "bytes=20-10", "bytes=-0"):
+        with pytest.raises(HTTPException) as exc:
+            parse_range(header, 100)
+        assert exc.value.status_code == 416
+        assert exc.value.headers["Content-Range"] == "bytes */100"
+
+
+def test_receive_file_hashes_the_streamed_body(upload_dir):
+    body = b"some lecture notes " * 10
+    sha256, size, tmp_path = asyncio.run(receive_file(FakeRequest(body)))
+    assert sha256 == hashlib.sha256(body).hexdigest()
+    assert size == len(body)
+    assert tmp_path.read_bytes() == body
+
+    uploads._commit_file(tmp_path, sha256)
+    assert blob_path(sha256).read_bytes() == body
+    assert not tmp_path.exists()
+
+
+def test_receive_file_rejects_oversized_bodies(upload_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_BYTES", 20)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(receive_file(FakeRequest(b"x" * 50)))
+    assert exc.value.status_code == 413
+
+    # A wrong Content-Length does not get past the limit either
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(receive_file(FakeRequest(b"x" * 50, content_length=10)))
+    assert exc.value.status_code == 413
+    assert list((upload_dir / "tmp").iterdir()) == []
+
+
+def test_receive_file_rejects_empty_bodies(upload_dir):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(receive_file(FakeRequest(b"")))
+    assert exc.value.status_code == 400
+
+
+class FakeBlobs:
+    def __init__(self):
+        self.operations = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+
+    async def update_many(self, query, update):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.blobs = FakeBlobs()
+
+
+def test_blob_id_only_matches_uploaded_files():
+    sha = "ab" * 32
+    assert blob_id(f"/api/files/{sha}") == sha
+    assert blob_id(f"https://api.example.org/api/files/{sha}") == sha
+    assert blob_id(f"/api/files/{sha}/thumbnail") is None
+    assert blob_id("https://res.cloudinary.com/demo/notes.pdf") is None
+    assert blob_id(None) is None
+
+
+def test_refs_are_counted_once_per_blob():
+    database = FakeDatabase()
+    first, second = "ab" * 32, "cd" * 32
+    asyncio.run(retain_blobs(database, [
+        f"/api/files/{first}", f"/api/files/{second}", f"/api/files/{first}", "https://example.org/x.pdf"
+    ]))
+    increments = {op._filter["id"]: op._doc["$inc"]["refs"] for op in database.blobs.operations}
+    assert increments == {first: 2, second: 1}
+
+    database = FakeDatabase()
+    asyncio.run(release_blobs(database, [f"/api/files/{first}"]))
+    assert [op._doc["$inc"]["refs"] for op in database.blobs.operations] == [-1]
+
+
+@pytest.mark.parametrize("content_type", ["text/html", "text/html; charset=utf-8", "image/svg+xml"])
+def test_active_content_is_not_accepted(upload_dir, content_type):
+    request = FakeRequest(b"<script>alert(document.cookie)</script>", headers={"content-type": content_type})
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(store_upload(None, request, "page.html", "user"))
+    assert error.value.status_code == 415
+    assert not (upload_dir / "tmp").exists()
+
+
+def is_sandboxed(response):
+    return (response.headers["x-content-type-options"] == "nosniff"
+            and response.headers["content-security-policy"] == "sandbox")
+
+
+@pytest.mark.parametrize("content_type", ["text/html", "image/svg+xml", "application/zip"])
+def test_files_of_other_types_are_downloads(upload_dir, content_type):
+    # Blobs stored before active types were refused are still served safely
+    path = upload_dir / "blob"
+    path.write_bytes(b"<svg onload='alert(1)'></svg>")
+    response = file_response(FakeRequest(b""), path, content_type, '"etag"', "x.svg")
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["content-disposition"] == "attachment; filename*=UTF-8''x.svg"
+    assert is_sandboxed(response)
+
+
+def test_safe_types_are_inline_and_sandboxed(upload_dir):
+    path = upload_dir / "blob"
+    path.write_bytes(b"notes")
+    response = file_response(FakeRequest(b""), path, "text/plain", '"etag"')
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["content-disposition"] == "inline"
+    assert is_sandboxed(response)
+
+    partial = file_response(FakeRequest(b"", headers={"range": "bytes=0-1"}), path, "video/mp4", '"etag"')
+    assert partial.status_code == 206
+    assert partial.headers["content-type"] == "video/mp4"
+    assert is_sandboxed(partial)
+
+    not_modified = file_response(FakeRequest(b"", headers={"if-none-match": '"etag"'}), path, "text/html", '"etag"')
+    assert not_modified.status_code == 304
+    assert is_sandboxed(not_modified)
+
+
+BODY = b"notes de cours"
+SHA = hashlib.sha256(BODY).hexdigest()
+
+
+async def seed_collectable_blob(database, upload_dir):
+    blob_path(SHA).parent.mkdir(parents=True)
+    blob_path(SHA).write_bytes(BODY)
+    await database.blobs.insert_one({
+        "id": SHA, "size": len(BODY), "content_type": "text/plain", "filename": "notes.txt",
+        "uploaded_by": "alice", "thumbnail": "none", "refs": 0,
+        "unreferenced_at": uploads.utcnow() - timedelta(days=2), "created_at": uploads.utcnow() - timedelta(days=2)
+    })
+
+
+def upload(database):
+    request = FakeRequest(BODY, headers={"content-type": "text/plain"})
+    return store_upload(database, request, "notes.txt", "bob")
+
+
+def test_collect_blobs_deletes_unreferenced_blobs(database, upload_dir):
+    async def scenario():
+        await seed_collectable_blob(database, upload_dir)
+        collected = await collect_blobs(database, grace_seconds=3600)
+        return collected, await database.blobs.count_documents({})
+
+    assert asyncio.run(scenario()) == ({"blobs": 1, "bytes": len(BODY)}, 0)
+    assert not blob_path(SHA).exists()
+    assert not any((upload_dir / "trash").iterdir())
+
+
+@pytest.mark.parametrize("upload_at", ["before_trash", "after_trash"])
+def test_upload_during_collection_keeps_the_blob(database, upload_dir, monkeypatch, upload_at):
+    trash_files = uploads._trash_files
+    results = []
+
+    def interleaved(sha256):
+        # The upload runs while the collector is between marking the blob and deleting it
+        if upload_at == "after_trash":
+            trash_files(sha256)
+        assert asyncio.run(find_upload(database, SHA, len(BODY))) is None
+        results.append(asyncio.run(upload(database)))
+        if upload_at == "before_trash":
+            trash_files(sha256)
+
+    monkeypatch.setattr(uploads, "_trash_files", interleaved)
+
+    async def scenario():
+        await seed_collectable_blob(database, upload_dir)
+        collected = await collect_blobs(database, grace_seconds=3600)
+        return collected, await database.blobs.find_one({"id": SHA}, {"_id": 0})
+
+    collected, blob = asyncio.run(scenario())
+    assert collected == {"blobs": 0, "bytes": 0}
+    assert results[0]["existed"] and results[0]["file_url"] == f"/api/files/{SHA}"
+    assert "deleting" not in blob and blob["unreferenced_at"] > uploads.utcnow() - timedelta(minutes=1)
+    assert blob_path(SHA).read_bytes() == BODY
+    assert not any((upload_dir / "trash").iterdir())
+
+
+def test_blobs_being_collected_are_missing(database, upload_dir):
+    async def scenario():
+        await seed_collectable_blob(database, upload_dir)
+        await database.blobs.update_one({"id": SHA}, {"$set": {"deleting": True}})
+        return await missing_blobs(database, [f"/api/files/{SHA}"]), await find_upload(database, SHA, len(BODY))
+
+    assert asyncio.run(scenario()) == ({SHA}, None)
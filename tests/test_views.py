@@ -0,0 +1,62 @@
+import asyncio
+
+from conditional import VERSIONS_COLLECTION
+from views import ViewCounter
+
+
+class FakeCollection:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.writes = []
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail:
+            raise RuntimeError("down")
+        self.writes.append({r._filter["id"]: r._doc["$inc"]["views"] for r in requests})
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+def test_views_are_summed_per_document_and_flushed_once():
+    counter = ViewCounter(max_keys=100)
+    database = FakeDatabase()
+    for _ in range(3):
+        counter.record("resources", "r1")
+    counter.record("resources", "r2")
+    counter.record("discussions", "d1")
+
+    assert counter.pending("resources", "r1") == 3
+    assert asyncio.run(counter.flush(database)) == 3
+    assert database["resources"].writes == [{"r1": 3, "r2": 1}]
+    assert database["discussions"].writes == [{"d1": 1}]
+    assert len(counter) == 0
+    # Views leave collection versions, and so list ETags, alone
+    assert VERSIONS_COLLECTION not in database
+
+
+def test_failed_flush_keeps_increments():
+    counter = ViewCounter(max_keys=100)
+    database = FakeDatabase(resources=FakeCollection(fail=True))
+    counter.record("resources", "r1")
+    counter.record("flashcards", "f1")
+
+    assert asyncio.run(counter.flush(database)) == 1
+    assert counter.pending("resources", "r1") == 1
+    assert counter.pending("flashcards", "f1") == 0
+
+
+def test_buffer_is_bounded():
+    counter = ViewCounter(max_keys=2)
+    counter.record("resources", "r1")
+    counter.record("resources", "r2")
+    counter.record("resources", "r3")
+    counter.record("resources", "r1")
+
+    assert len(counter) == 2
+    assert counter.dropped == 1
+    assert counter.pending("resources", "r1") == 2
+    assert counter._flush_requested.is_set()